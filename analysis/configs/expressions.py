@@ -0,0 +1,313 @@
+import ast
+from collections import Counter
+from typing import Any, Dict, Iterable, Mapping, Optional, Set
+
+# names that config expressions are allowed to read. Their values are provided at
+# evaluation time through an ExpressionNamespace
+ALLOWED_NAMES = {
+    "events",
+    "objects",
+    "np",
+    "ak",
+    "year",
+    "dataset",
+    "goldenjson",
+    "hlt_paths",
+    "delta_r_mask",
+    "jetvetomaps_mask",
+    "get_lumi_mask",
+    "get_trigger_mask",
+    "get_trigger_match_mask",
+    "get_metfilters_mask",
+    "get_stitching_mask",
+    "get_hemcleaning_mask",
+}
+# module names. Attribute chains rooted at them (np.abs, ak.num) are not cached
+MODULE_NAMES = {"np", "ak"}
+# module functions (and constants) that config expressions are allowed to use
+MODULE_ATTRIBUTES = {
+    "np": {
+        "abs", "sqrt", "exp", "log", "sin", "cos", "tan", "sinh", "cosh", "tanh",
+        "arctan2", "hypot", "minimum", "maximum", "where", "isin", "isfinite",
+        "logical_and", "logical_or", "logical_not", "ones_like", "zeros_like", "pi",
+    },
+    "ak": {
+        "num", "count", "sum", "prod", "any", "all", "min", "max", "argmin", "argmax",
+        "argsort", "sort", "firsts", "flatten", "fill_none", "is_none", "pad_none",
+        "mask", "where", "ones_like", "zeros_like", "combinations", "cartesian",
+        "local_index",
+    },
+}
+
+ALLOWED_NODES = (
+    ast.Expression,
+    ast.BoolOp,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Compare,
+    ast.Call,
+    ast.keyword,
+    ast.Attribute,
+    ast.Subscript,
+    ast.Slice,
+    ast.Name,
+    ast.Constant,
+    ast.Tuple,
+    ast.List,
+    ast.Load,
+    ast.boolop,
+    ast.operator,
+    ast.unaryop,
+    ast.cmpop,
+)
+
+
+def _is_chain(node: ast.AST) -> bool:
+    """
+    check if 'node' is an access chain like objects['dimuons'].p4.mass: attribute access
+    and constant subscripts on top of a name, with at least one attribute access
+    """
+    has_attribute = False
+    while isinstance(node, (ast.Attribute, ast.Subscript)):
+        if isinstance(node, ast.Attribute):
+            has_attribute = True
+        elif not isinstance(node.slice, ast.Constant):
+            return False
+        node = node.value
+    return has_attribute and isinstance(node, ast.Name) and node.id not in MODULE_NAMES
+
+
+def _iter_chains(tree: ast.AST) -> Iterable[str]:
+    """yield the source of every access chain (and sub-chain) in 'tree'"""
+    for node in ast.walk(tree):
+        if _is_chain(node):
+            yield ast.unparse(node)
+
+
+class _CSETransformer(ast.NodeTransformer):
+    """replace shared access chains with '_cse(<chain source>)' calls"""
+
+    def __init__(self, shared, exclude=None):
+        self.shared = shared
+        self.exclude = exclude
+
+    def _visit_chain(self, node):
+        if _is_chain(node):
+            key = ast.unparse(node)
+            if key in self.shared and key != self.exclude:
+                call = ast.Call(
+                    func=ast.Name(id="_cse", ctx=ast.Load()),
+                    args=[ast.Constant(value=key)],
+                    keywords=[],
+                )
+                return ast.copy_location(call, node)
+        return self.generic_visit(node)
+
+    visit_Attribute = _visit_chain
+    visit_Subscript = _visit_chain
+
+
+class Expression:
+    """
+    Config expression parsed and compiled once
+
+    The source string is validated against a whitelist of AST nodes, names and np/ak
+    functions, so typos and unsupported syntax fail when the config is built. This is
+    not a sandbox: configs must come from trusted sources. Access chains shared with other
+    expressions of the same group (see 'compile_expressions') are evaluated once
+    per ExpressionNamespace and reused.
+
+    Attributes:
+    -----------
+        source:
+            expression string
+        shared:
+            access chains cached across the expressions of the group
+        names:
+            names read by the expression
+        calls:
+            names of the functions called by the expression
+        event_collections:
+            NanoAOD collections accessed as 'events.<collection>'
+        event_fields:
+            event fields accessed as 'events.<collection>.<field>' ('<collection>' if the
+            collection is not accessed through a field)
+        event_calls:
+            names of the functions the events array is passed to
+        reads_events:
+            whether the events array is used in any other way (so the fields it reads are unknown)
+    """
+
+    def __init__(self, source: str, shared: Iterable[str] = ()):
+        self.source = source
+        self.shared = frozenset(shared)
+        tree = ast.parse(source, mode="eval")
+        self._validate(tree)
+
+        self.names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+        self.calls = {
+            node.func.id
+            for node in ast.walk(tree)
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+        }
+        self.event_collections = {
+            node.attr
+            for node in ast.walk(tree)
+            if isinstance(node, ast.Attribute)
+            and isinstance(node.value, ast.Name)
+            and node.value.id == "events"
+        }
+        self._set_event_fields(tree)
+
+        used = self.shared.intersection(_iter_chains(tree))
+        self.code = self._compile(tree)
+        self.subexpressions = {
+            key: self._compile(ast.parse(key, mode="eval"), exclude=key) for key in used
+        }
+
+    def _set_event_fields(self, tree: ast.AST) -> None:
+        parents = {
+            child: node for node in ast.walk(tree) for child in ast.iter_child_nodes(node)
+        }
+        self.event_fields, self.event_calls, self.reads_events = set(), set(), False
+        for node in ast.walk(tree):
+            if not (isinstance(node, ast.Name) and node.id == "events"):
+                continue
+            parent = parents.get(node)
+            if isinstance(parent, ast.Attribute):
+                field = parents.get(parent)
+                if isinstance(field, ast.Attribute) and field.value is parent:
+                    self.event_fields.add(f"{parent.attr}.{field.attr}")
+                else:
+                    self.event_fields.add(parent.attr)
+                continue
+            call = parents.get(parent) if isinstance(parent, ast.keyword) else parent
+            if (
+                isinstance(call, ast.Call)
+                and call.func is not node
+                and isinstance(call.func, ast.Name)
+            ):
+                self.event_calls.add(call.func.id)
+            else:
+                self.reads_events = True
+
+    def _validate(self, tree: ast.AST) -> None:
+        for node in ast.walk(tree):
+            if not isinstance(node, ALLOWED_NODES):
+                raise ValueError(
+                    f"'{type(node).__name__}' is not allowed in expression '{self.source}'"
+                )
+            if isinstance(node, ast.Name) and node.id not in ALLOWED_NAMES:
+                raise ValueError(f"name '{node.id}' is not allowed in expression '{self.source}'")
+            if isinstance(node, ast.Attribute) and node.attr.startswith("_"):
+                raise ValueError(
+                    f"attribute '{node.attr}' is not allowed in expression '{self.source}'"
+                )
+            if (
+                isinstance(node, ast.Attribute)
+                and isinstance(node.value, ast.Name)
+                and node.value.id in MODULE_ATTRIBUTES
+                and node.attr not in MODULE_ATTRIBUTES[node.value.id]
+            ):
+                raise ValueError(
+                    f"'{node.value.id}.{node.attr}' is not allowed in expression '{self.source}'"
+                )
+
+    def _compile(self, tree: ast.AST, exclude: str = None):
+        tree = _CSETransformer(self.shared, exclude).visit(tree)
+        return compile(ast.fix_missing_locations(tree), f"<{self.source}>", "eval")
+
+    def evaluate(self, namespace: "ExpressionNamespace") -> Any:
+        """
+        evaluate the expression
+
+        Parameters:
+        -----------
+            namespace:
+                ExpressionNamespace with the values of the names read by the expression
+        """
+        cache = namespace.cache
+
+        def _cse(key):
+            if key not in cache:
+                cache[key] = eval(self.subexpressions[key], scope)
+            return cache[key]
+
+        scope = {"__builtins__": {}, **namespace.variables, "_cse": _cse}
+        return eval(self.code, scope)
+
+    def __reduce__(self):
+        # code objects are not picklable: rebuild from the source
+        return (Expression, (self.source, tuple(self.shared)))
+
+    def __str__(self):
+        return self.source
+
+    def __repr__(self):
+        return f"Expression({self.source!r})"
+
+
+class ExpressionNamespace:
+    """
+    Values of the names read by config expressions, plus the cache of the shared access
+    chains. A namespace must not outlive the state it describes: build a new one
+    whenever 'objects' or 'events' change.
+    """
+
+    def __init__(self, **variables):
+        self.variables = variables
+        self.cache = {}
+
+
+def get_event_fields(
+    expression: Expression, functions: Mapping[str, Any]
+) -> Optional[Set[str]]:
+    """
+    return the event fields read by an expression: its own 'events.<collection>.<field>'
+    accesses plus the fields declared by the functions it passes the events array to (see
+    'analysis.selections.reads_event_fields'). Returns None if the fields are unknown, i.e.
+    the events array is passed to a function without declared fields or used otherwise
+
+    Parameters:
+    -----------
+        expression:
+            Expression object
+        functions:
+            functions that the expression can call {name: function}
+    """
+    if expression.reads_events:
+        return None
+    event_fields = set(expression.event_fields)
+    for name in expression.event_calls:
+        declared = getattr(functions.get(name), "event_fields", None)
+        if declared is None:
+            return None
+        event_fields |= declared
+    return event_fields
+
+
+def compile_expressions(sources: Dict[Any, str]) -> Dict[Any, Expression]:
+    """
+    compile a group of expressions evaluated against the same state, caching the
+    access chains (like objects['dimuons'].p4) that appear more than once in the group
+
+    Parameters:
+    -----------
+        sources:
+            dictionary with expression strings
+    """
+    trees = {key: ast.parse(source, mode="eval") for key, source in sources.items()}
+    counts = Counter(chain for tree in trees.values() for chain in _iter_chains(tree))
+    shared = {chain for chain, count in counts.items() if count > 1}
+    return {key: Expression(source, shared) for key, source in sources.items()}
+
+
+def expressions_to_source(obj: Any) -> Any:
+    """replace Expression objects with their source strings in (nested) dicts and lists"""
+    if isinstance(obj, Expression):
+        return obj.source
+    if isinstance(obj, dict):
+        return {key: expressions_to_source(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [expressions_to_source(value) for value in obj]
+    return obj
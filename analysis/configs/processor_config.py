@@ -1,4 +1,5 @@
 import yaml
+from analysis.configs.expressions import expressions_to_source
 
 class ProcessorConfig:
     """
@@ -23,8 +24,8 @@ class ProcessorConfig:
         return {
             "goldenjson": self.goldenjson,
             "hlt_paths": self.hlt_paths,
-            "object_selection": self.object_selection,
-            "event_selection": self.event_selection,
+            "object_selection": expressions_to_source(self.object_selection),
+            "event_selection": expressions_to_source(self.event_selection),
             "histogram_config": self.histogram_config.to_dict(),
         }
 
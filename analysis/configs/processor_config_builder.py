@@ -1,7 +1,23 @@
+import ast
 import yaml
 import importlib.resources
 from analysis.histograms import HistogramConfig
 from analysis.configs.processor_config import ProcessorConfig
+from analysis.configs.expressions import compile_expressions
+
+
+def is_expression(cut) -> bool:
+    """check if an object cut (or field) is an expression reading 'events' or 'objects' (otherwise it is a working point)"""
+    if not isinstance(cut, str):
+        return False
+    try:
+        tree = ast.parse(cut, mode="eval")
+    except SyntaxError:
+        return False
+    return any(
+        isinstance(node, ast.Name) and node.id in ("events", "objects")
+        for node in ast.walk(tree)
+    )
 
 
 class ProcessorConfigBuilder:
@@ -11,22 +27,34 @@ class ProcessorConfigBuilder:
             self.config = yaml.safe_load(file)
             
     def build_processor_config(self):
+        event_selection = self.parse_event_selection()
+        histogram_config = self.parse_histogram_config()
+        self.compile_event_expressions(event_selection, histogram_config)
         return ProcessorConfig(
             goldenjson=self.config["golden_json"],
             hlt_paths=self.config["hlt_paths"],
             object_selection=self.parse_object_selection(),
-            event_selection=self.parse_event_selection(),
-            histogram_config=self.parse_histogram_config()
+            event_selection=event_selection,
+            histogram_config=histogram_config
         )
             
     def parse_object_selection(self):
         object_selection = {}
         for object_name in self.config['object_selection']:
-            object_selection[object_name] = {"field": self.config['object_selection'][object_name]["field"]}
-            if self.config['object_selection'][object_name]["cuts"]:
+            field = self.config['object_selection'][object_name]["field"]
+            cuts = self.config['object_selection'][object_name]["cuts"] or {}
+            # the field and the cuts of an object are evaluated against the same 'objects' state,
+            # so they are compiled together to share common subexpressions
+            sources = {("cuts", cut_name): cut for cut_name, cut in cuts.items() if is_expression(cut)}
+            if is_expression(field):
+                sources[("field",)] = field
+            expressions = compile_expressions(sources)
+
+            object_selection[object_name] = {"field": expressions.get(("field",), field)}
+            if cuts:
                 object_selection[object_name]["cuts"] = {}
-                for cut_name, cut in self.config['object_selection'][object_name]["cuts"].items():
-                    object_selection[object_name]["cuts"][cut_name] = cut
+                for cut_name, cut in cuts.items():
+                    object_selection[object_name]["cuts"][cut_name] = expressions.get(("cuts", cut_name), cut)
         return object_selection
     
     def parse_event_selection(self):
@@ -36,4 +64,19 @@ class ProcessorConfigBuilder:
         return event_selection
     
     def parse_histogram_config(self):
-        return HistogramConfig(**self.config["histogram_config"])
\ No newline at end of file
+        return HistogramConfig(**self.config["histogram_config"])
+
+    def compile_event_expressions(self, event_selection, histogram_config):
+        """
+        compile event selections and histogram expressions. Both are evaluated after the
+        object selection, so they are compiled together to share common subexpressions
+        """
+        sources = {("selections", name): cut for name, cut in event_selection["selections"].items()}
+        for name, axis in histogram_config.axes.items():
+            sources[("axes", name)] = axis.expression
+        expressions = compile_expressions(sources)
+        event_selection["selections"] = {
+            name: expressions[("selections", name)] for name in event_selection["selections"]
+        }
+        for name, axis in histogram_config.axes.items():
+            axis.expression = expressions[("axes", name)]
@@ -10,4 +10,11 @@ from analysis.corrections.l1prefiring import add_l1prefiring_weight
 from analysis.corrections.rochester import apply_rochester_corrections
 from analysis.corrections.tau_energy import apply_tau_energy_scale_corrections
 from analysis.corrections.met import apply_met_phi_corrections
-from analysis.corrections.met import update_met_jet_veto
\ No newline at end of file
+from analysis.corrections.met import update_met_jet_veto
+from analysis.corrections.met import propagate_object_corrections_to_met
+from analysis.corrections.registry import (
+    correction_registry,
+    get_correction_set,
+    warm_correction_sets,
+)
+from analysis.corrections.variations import get_weight_variations, JET_MET_SHIFTS
@@ -2,7 +2,6 @@ import re
 import json
 import glob
 import pathlib
-import correctionlib
 import numpy as np
 import awkward as ak
 import importlib.resources
@@ -10,7 +9,7 @@ from coffea import util
 from typing import Type
 from coffea.analysis_tools import Weights
 from analysis.working_points import working_points
-from analysis.corrections.utils import get_pog_json
+from analysis.corrections.registry import get_correction_set
 
 
 class BTagCorrector:
@@ -106,9 +105,7 @@ class BTagCorrector:
             self._efflookup = util.load(str(filename))
 
         # define correction set
-        self._cset = correctionlib.CorrectionSet.from_file(
-            get_pog_json(json_name="btag", year=year)
-        )
+        self._cset = get_correction_set(json_name="btag", year=year)
 
         # select bc and light jets
         # hadron flavor definition: 5=b, 4=c, 0=udsg
@@ -8,7 +8,8 @@ from typing import Type
 from pathlib import Path
 from .utils import unflat_sf
 from coffea.analysis_tools import Weights
-from analysis.corrections.utils import pog_years, get_pog_json
+from analysis.corrections.utils import pog_years
+from analysis.corrections.registry import get_correction_set
 
 
 # ----------------------------------
@@ -59,9 +60,7 @@ class ElectronCorrector:
         self.weights = weights
 
         # define correction set
-        self.cset = correctionlib.CorrectionSet.from_file(
-            get_pog_json(json_name="electron", year=year)
-        )
+        self.cset = get_correction_set(json_name="electron", year=year)
         self.year = year
         self.pog_year = pog_years[year]
 
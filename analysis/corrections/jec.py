@@ -5,6 +5,50 @@ import awkward as ak
 import importlib.resources
 from typing import Tuple
 from coffea.nanoevents.methods.base import NanoEventsArray
+from analysis.corrections.registry import correction_registry
+
+
+def load_jec_factories(year: str) -> dict:
+    """
+    load the jet and MET factories of a given year
+
+    Uses the per-year 'mc_jec_compiled_<year>.pkl.gz' file when available, otherwise
+    falls back to the combined 'mc_jec_compiled.pkl.gz' file and keeps only the
+    factories of the requested year
+
+    Parameters:
+    -----------
+        year:
+            Year of the dataset {'2016preVFP', '2016postVFP', '2017', '2018'}
+    """
+    year_file = f"mc_jec_compiled_{year}.pkl.gz"
+    if importlib.resources.is_resource("analysis.data", year_file):
+        with importlib.resources.path("analysis.data", year_file) as path:
+            with gzip.open(path) as fin:
+                return cloudpickle.load(fin)
+
+    with importlib.resources.path("analysis.data", "mc_jec_compiled.pkl.gz") as path:
+        with gzip.open(path) as fin:
+            factories = cloudpickle.load(fin)
+    return {
+        "jet_factory": factories["jet_factory"][year],
+        "met_factory": factories["met_factory"],
+    }
+
+
+def get_jec_factories(year: str) -> dict:
+    """
+    returns the jet and MET factories of a given year. The factories are
+    deserialized once per process and cached in the correction registry
+
+    Parameters:
+    -----------
+        year:
+            Year of the dataset {'2016preVFP', '2016postVFP', '2017', '2018'}
+    """
+    return correction_registry.get(
+        key=("jec", year), loader=lambda: load_jec_factories(year)
+    )
 
 
 # Recomendations https://twiki.cern.ch/twiki/bin/viewauth/CMS/JECDataMC#Recommended_for_MC
@@ -13,7 +57,7 @@ def apply_jet_corrections(events: NanoEventsArray, year: str) -> None:
     Apply JEC/JER corrections to jets (propagate to MET)
 
     We use the script data/scripts/build_jec.py to create the 'mc_jec_compiled.pkl.gz'
-    file with jet and MET factories
+    and 'mc_jec_compiled_<year>.pkl.gz' files with jet and MET factories
 
     Parameters:
     -----------
@@ -23,9 +67,7 @@ def apply_jet_corrections(events: NanoEventsArray, year: str) -> None:
             Year of the dataset {'2016preVFP', '2016postVFP', '2017', '2018'}
     """
     # load jet and MET factories with JEC/JER corrections
-    with importlib.resources.path("analysis.data", "mc_jec_compiled.pkl.gz") as path:
-        with gzip.open(path) as fin:
-            factories = cloudpickle.load(fin)
+    factories = get_jec_factories(year)
 
     def add_jec_variables(jets: ak.Array, event_rho: ak.Array):
         """add some variables to the jet collection"""
@@ -38,7 +80,7 @@ def apply_jet_corrections(events: NanoEventsArray, year: str) -> None:
         return jets
 
     # get corrected jets
-    events["Jet"] = factories["jet_factory"][year].build(
+    events["Jet"] = factories["jet_factory"].build(
         add_jec_variables(events.Jet, events.fixedGridRhoFastjetAll),
         events.caches[0],
     )
@@ -1,11 +1,11 @@
 import yaml
-import correctionlib
 import numpy as np
 import awkward as ak
 from pathlib import Path
 from coffea.nanoevents.methods import candidate
 from analysis.corrections.met import corrected_polar_met
-from analysis.corrections.utils import get_pog_json, get_jer_cset, get_era
+from analysis.corrections.utils import get_jer_cset, get_era
+from analysis.corrections.registry import get_correction_set
 from analysis.selections.object_selections import delta_r_mask
 
 
@@ -137,7 +137,7 @@ class JERCorrector:
                 jec level {L1, L2, L3, compound}
         """
         # get correction set
-        cset = correctionlib.CorrectionSet.from_file(get_pog_json("jerc", self.year))
+        cset = get_correction_set("jerc", self.year)
         if level == "compound":
             cset = cset.compound
         # get correction file name by jec level and era
@@ -1,9 +1,8 @@
-import correctionlib
 import numpy as np
 import awkward as ak
 from typing import Type
 from coffea.analysis_tools import Weights
-from analysis.corrections.utils import get_pog_json
+from analysis.corrections.registry import get_correction_set
 
 
 def jetvetomaps_mask(jets: ak.Array, year: str, mapname: str = "jetvetomap"):
@@ -20,7 +19,7 @@ def jetvetomaps_mask(jets: ak.Array, year: str, mapname: str = "jetvetomap"):
         "2017": "Summer19UL17_V1",
         "2018": "Summer19UL18_V1",
     }
-    cset = correctionlib.CorrectionSet.from_file(get_pog_json("jetvetomaps", year))
+    cset = get_correction_set("jetvetomaps", year)
 
     j, n = ak.flatten(jets), ak.num(jets)
     jet_eta_mask = np.abs(j.eta) < 5.19
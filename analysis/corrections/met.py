@@ -1,8 +1,7 @@
-import correctionlib
 import numpy as np
 import awkward as ak
 from typing import Tuple
-from analysis.corrections.utils import get_pog_json
+from analysis.corrections.registry import get_correction_set
 from analysis.corrections.jetvetomaps import jetvetomaps_mask
 
 
@@ -27,9 +26,7 @@ def apply_met_phi_corrections(
     --------
         corrected MET pt and phi
     """
-    cset = correctionlib.CorrectionSet.from_file(
-        get_pog_json(json_name="met", year=year)
-    )
+    cset = get_correction_set(json_name="met", year=year)
     events["MET", "pt_raw"] = ak.ones_like(events.MET.pt) * events.MET.pt
     events["MET", "phi_raw"] = ak.ones_like(events.MET.phi) * events.MET.phi
 
@@ -125,4 +122,30 @@ def update_met_jet_veto(events, year) -> None:
 
     # update MET fields
     events["MET", "pt"] = new_met_pt
-    events["MET", "phi"] = new_met_phi
\ No newline at end of file
+    events["MET", "phi"] = new_met_phi
+
+def propagate_object_corrections_to_met(events, collections=("Muon", "Tau")) -> None:
+    """
+    propagate the pT corrections of some objects to MET. It uses the 'pt_raw'
+    and 'pt' fields of each collection to update the MET 'pt' and 'phi' fields.
+    Collections without a 'pt_raw' field (not corrected) are skipped
+
+    Parameters:
+    -----------
+        events:
+            Events array
+        collections:
+            names of the corrected collections {'Muon', 'Tau'}
+    """
+    for collection in collections:
+        if "pt_raw" not in events[collection].fields:
+            continue
+        corrected_met_pt, corrected_met_phi = corrected_polar_met(
+            met_pt=events.MET.pt,
+            met_phi=events.MET.phi,
+            other_phi=events[collection].phi,
+            other_pt_old=events[collection].pt_raw,
+            other_pt_new=events[collection].pt,
+        )
+        events["MET", "pt"] = corrected_met_pt
+        events["MET", "phi"] = corrected_met_phi
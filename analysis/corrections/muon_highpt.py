@@ -1,5 +1,4 @@
 import json
-import correctionlib
 import numpy as np
 import awkward as ak
 from typing import Type
@@ -7,7 +6,8 @@ from pathlib import Path
 from .utils import unflat_sf
 from coffea.analysis_tools import Weights
 from analysis.selections import trigger_match
-from analysis.corrections.utils import pog_years, get_pog_json
+from analysis.corrections.utils import pog_years
+from analysis.corrections.registry import get_correction_set
 
 
 # https://twiki.cern.ch/twiki/bin/view/CMS/MuonUL2016
@@ -87,9 +87,7 @@ class MuonHighPtCorrector:
         self.weights = weights
 
         # define correction set
-        self.cset = correctionlib.CorrectionSet.from_file(
-            get_pog_json(json_name="muon_highpt", year=year)
-        )
+        self.cset = get_correction_set(json_name="muon_highpt", year=year)
         self.year = year
         self.pog_year = pog_years[year]
 
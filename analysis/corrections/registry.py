@@ -0,0 +1,107 @@
+import threading
+import correctionlib
+from typing import Any, Callable, Dict, Hashable, List
+from analysis.corrections.utils import get_pog_json
+
+
+class CorrectionRegistry:
+    """
+    Process-wide cache of correction evaluators.
+
+    Objects are built once per worker process by a loader function and then
+    shared by every chunk (and every systematic shift) processed by that worker.
+    Loading is guarded by a per-key lock, so concurrent callers asking for the
+    same key wait for a single load instead of parsing the same file twice.
+    """
+
+    def __init__(self) -> None:
+        self._objects: Dict[Hashable, Any] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        return the object stored at 'key', building it with 'loader' on first use
+
+        Parameters:
+        -----------
+            key:
+                hashable identifier of the object (e.g. (json_name, year))
+            loader:
+                callable with no arguments that builds the object
+        """
+        with self._lock:
+            if key in self._objects:
+                self.hits += 1
+                return self._objects[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                if key in self._objects:
+                    self.hits += 1
+                    return self._objects[key]
+            obj = loader()
+            with self._lock:
+                self._objects[key] = obj
+                self.misses += 1
+        return obj
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._objects
+
+    def stats(self) -> Dict[str, Any]:
+        """return hit/miss counters and the keys currently loaded"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "keys": list(self._objects),
+            }
+
+    def clear(self) -> None:
+        """drop every cached object and reset the counters"""
+        with self._lock:
+            self._objects.clear()
+            self._key_locks.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+correction_registry = CorrectionRegistry()
+
+
+def get_correction_set(json_name: str, year: str) -> correctionlib.CorrectionSet:
+    """
+    returns the (cached) correctionlib evaluator of a POG json file
+
+    Parameters:
+    -----------
+        json_name:
+            json name {muon, muon_highpt, electron, tau, pileup, btag, met, pujetid, jetvetomaps, jerc}
+        year:
+            dataset year {'2016preVFP', '2016postVFP' '2017', '2018'}
+    """
+    return correction_registry.get(
+        key=("pog", json_name, year),
+        loader=lambda: correctionlib.CorrectionSet.from_file(
+            get_pog_json(json_name=json_name, year=year)
+        ),
+    )
+
+
+def warm_correction_sets(json_names: List[str], year: str) -> None:
+    """
+    load a list of POG json files into the registry ahead of processing
+
+    Parameters:
+    -----------
+        json_names:
+            list of json names (see get_correction_set)
+        year:
+            dataset year {'2016preVFP', '2016postVFP' '2017', '2018'}
+    """
+    for json_name in json_names:
+        get_correction_set(json_name, year)
@@ -1,17 +1,135 @@
+import os
+import hashlib
+import tempfile
 import numpy as np
 import awkward as ak
+import importlib.resources
+from pathlib import Path
 from analysis.corrections.met import corrected_polar_met
+from analysis.corrections.registry import correction_registry
 from coffea.lookup_tools import txt_converters, rochester_lookup
 
 
+def flatten_rochester_tables(tables, prefix: str = "") -> dict:
+    """
+    flatten the nested output of 'convert_rochester_file' into a {key: array} dict
+    that can be stored in a .npz file
+
+    Dict keys and tuple positions are encoded in the key path ('int:0', 'str:M',
+    'tuple:1'), and leaves are tagged as '#array', '#list' or '#scalar' so that
+    'unflatten_rochester_tables' can rebuild the original python types
+    """
+    flat = {}
+    if isinstance(tables, (dict, tuple)):
+        items = tables.items() if isinstance(tables, dict) else enumerate(tables)
+        for key, value in items:
+            segment = f"{type(key).__name__}:{key}"
+            if isinstance(tables, tuple):
+                segment = f"tuple:{key}"
+            path = f"{prefix}/{segment}" if prefix else segment
+            flat.update(flatten_rochester_tables(value, path))
+    elif isinstance(tables, list):
+        flat[f"{prefix}#list"] = np.asarray(tables)
+    elif isinstance(tables, np.ndarray):
+        flat[f"{prefix}#array"] = tables
+    else:
+        flat[f"{prefix}#scalar"] = np.asarray(tables)
+    return flat
+
+
+def unflatten_rochester_tables(flat) -> dict:
+    """rebuild the nested rochester tables from the output of 'flatten_rochester_tables'"""
+    tables = {}
+    for flat_key in flat:
+        path, kind = flat_key.rsplit("#", 1)
+        value = flat[flat_key]
+        if kind == "list":
+            value = value.tolist()
+        elif kind == "scalar":
+            value = value.item()
+        node = tables
+        segments = path.split("/")
+        for segment in segments[:-1]:
+            node = node.setdefault(segment, {})
+        node[segments[-1]] = value
+
+    def convert(node):
+        if not isinstance(node, dict):
+            return node
+        items = {}
+        for segment, value in node.items():
+            key_type, key = segment.split(":", 1)
+            items[int(key) if key_type in ("int", "tuple") else key] = convert(value)
+        if all(segment.startswith("tuple:") for segment in node):
+            return tuple(items[i] for i in range(len(items)))
+        return items
+
+    return convert(tables)
+
+
+def load_rochester_tables(year: str) -> dict:
+    """
+    returns the converted rochester tables of a given year
+
+    The tables are read from a binary cache ('RoccoR<year>UL.npz', next to the
+    RoccoR text file) which is rebuilt whenever the sha256 hash of the text file
+    changes
+
+    Parameters:
+    -----------
+        year:
+            Year of the dataset {'2016preVFP', '2016postVFP', '2017', '2018'}
+    """
+    with importlib.resources.path("analysis.data", f"RoccoR{year}UL.txt") as path:
+        txt_path = Path(path)
+    npz_path = txt_path.with_suffix(".npz")
+    txt_hash = hashlib.sha256(txt_path.read_bytes()).hexdigest()
+
+    if npz_path.exists():
+        with np.load(npz_path) as cache:
+            if str(cache["sha256"]) == txt_hash:
+                return unflatten_rochester_tables(
+                    {key: cache[key] for key in cache.files if key != "sha256"}
+                )
+
+    tables = txt_converters.convert_rochester_file(str(txt_path), loaduncs=True)
+    try:
+        # write to a temporary file first so concurrent jobs never read a partial cache
+        fd, tmp_path = tempfile.mkstemp(dir=npz_path.parent, suffix=".npz")
+    except OSError:
+        # read-only data directory: keep going without the binary cache
+        return tables
+    try:
+        with os.fdopen(fd, "wb") as fout:
+            np.savez(fout, sha256=txt_hash, **flatten_rochester_tables(tables))
+        os.replace(tmp_path, npz_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return tables
+
+
+def get_rochester_lookup(year: str):
+    """
+    returns the rochester lookup of a given year. The lookup is built once per
+    process and cached in the correction registry
+
+    Parameters:
+    -----------
+        year:
+            Year of the dataset {'2016preVFP', '2016postVFP', '2017', '2018'}
+    """
+    return correction_registry.get(
+        key=("rochester", year),
+        loader=lambda: rochester_lookup.rochester_lookup(load_rochester_tables(year)),
+    )
+
+
 def apply_rochester_corrections(
     events: ak.Array, is_mc: bool, year: str = "2017", variation: str = "nominal"
 ):
     # https://twiki.cern.ch/twiki/bin/viewauth/CMS/RochcorMuon
-    rochester_data = txt_converters.convert_rochester_file(
-        f"analysis/data/RoccoR{year}UL.txt", loaduncs=True
-    )
-    rochester = rochester_lookup.rochester_lookup(rochester_data)
+    rochester = get_rochester_lookup(year)
 
     # define muon pt_raw field
     events["Muon", "pt_raw"] = ak.ones_like(events.Muon.pt) * events.Muon.pt
@@ -1,6 +1,5 @@
 import json
 import copy
-import correctionlib
 import numpy as np
 import awkward as ak
 import importlib.resources
@@ -9,7 +8,8 @@ from pathlib import Path
 from .utils import unflat_sf
 from coffea.analysis_tools import Weights
 from analysis.working_points import working_points
-from analysis.corrections.utils import pog_years, get_pog_json
+from analysis.corrections.utils import pog_years
+from analysis.corrections.registry import get_correction_set
 
 
 """
@@ -86,9 +86,7 @@ class TauCorrector:
         self.variation = variation
 
         # define correction set_id
-        self.cset = correctionlib.CorrectionSet.from_file(
-            get_pog_json(json_name="tau", year=self.year)
-        )
+        self.cset = get_correction_set(json_name="tau", year=self.year)
         self.pog_year = pog_years[year]
         """
         Check: https://github.com/cms-tau-pog/TauFW/blob/43bc39474b689d9712107d53a953b38c3cd9d43e/PicoProducer/python/analysis/ModuleETau.py#L270 
@@ -1,8 +1,7 @@
 import copy
-import correctionlib
 import numpy as np
 import awkward as ak
-from analysis.corrections.utils import get_pog_json
+from analysis.corrections.registry import get_correction_set
 from analysis.corrections.met import corrected_polar_met
 
 # ----------------------------------------------------------------------------------- #
@@ -62,9 +61,7 @@ def apply_tau_energy_scale_corrections(
     genmatch = ak.fill_none(taus_filter.genPartFlav, 2)
 
     # define correction set
-    cset = correctionlib.CorrectionSet.from_file(
-        get_pog_json(json_name="tau", year=year)
-    )
+    cset = get_correction_set(json_name="tau", year=year)
     # define shifts
     shifts = {"nominal": "nom", "tau_up": "up", "tau_down": "down"}
     if variation not in shifts:
@@ -1,6 +1,8 @@
+import os
 import re
 import json
 import gzip
+import hashlib
 import cloudpickle
 import correctionlib
 import numpy as np
@@ -8,6 +10,7 @@ import awkward as ak
 import importlib.resources
 from coffea import util
 from typing import Type, Tuple
+from pathlib import Path
 from coffea.lookup_tools import extractor
 from coffea.analysis_tools import Weights
 from coffea.nanoevents.methods.base import NanoEventsArray
@@ -75,9 +78,10 @@ def unflat_sf(sf: ak.Array, in_limit_mask: ak.Array, n: ak.Array):
     return ak.fill_none(ak.prod(ak.unflatten(sf, n), axis=1), value=1)
 
 
-def get_jer_cset(jer_ptres_tag: str, jer_sf_tag: str, year: str):
+def build_jer_cset(jer_ptres_tag: str, jer_sf_tag: str, year: str) -> CorrectionSet:
     """
-    returns correction set for jet smearing
+    returns a CorrectionSet (schema object) with the JER pt resolution and scale factor
+    corrections, plus a 'JERSmear' correction for jet smearing
 
     taken from: https://github.com/cms-nanoAOD/correctionlib/issues/130
 
@@ -164,8 +168,87 @@ def get_jer_cset(jer_ptres_tag: str, jer_sf_tag: str, year: str):
         }
     )
     cset.corrections.append(res)
-    ceval = cset.to_evaluator()
-    return ceval
+    return cset
+
+
+
+
+def get_jer_cset_path(jer_ptres_tag: str, jer_sf_tag: str, year: str) -> Path:
+    """
+    returns the path of the pre-filtered JER json file. The file name includes a hash of
+    the tags and of the size/modification time of the source POG file, so a new POG
+    release is picked up automatically
+
+    Parameters:
+    -----------
+        jer_ptres_tag:
+            tag for jer pt resolution
+        jer_sf_tag:
+            tag for jer scale factor
+        year:
+            dataset year
+    """
+    pog_json = get_pog_json("jerc", year)
+    pog_stat = os.stat(pog_json)
+    key = f"{pog_json}:{pog_stat.st_size}:{pog_stat.st_mtime_ns}:{jer_ptres_tag}:{jer_sf_tag}"
+    key_hash = hashlib.sha256(key.encode()).hexdigest()[:16]
+    with importlib.resources.path("analysis.data", "__init__.py") as path:
+        cache_dir = Path(path).parent / "jer_cache"
+    return cache_dir / f"{year}_{jer_sf_tag}_{key_hash}.json"
+
+
+def load_jer_cset(jer_ptres_tag: str, jer_sf_tag: str, year: str):
+    """
+    returns the compiled JER correction set, reading the pre-filtered json file when
+    available and building (and saving) it from the full POG file otherwise
+
+    Parameters:
+    -----------
+        jer_ptres_tag:
+            tag for jer pt resolution
+        jer_sf_tag:
+            tag for jer scale factor
+        year:
+            dataset year
+    """
+    cset_path = get_jer_cset_path(jer_ptres_tag, jer_sf_tag, year)
+    if cset_path.exists():
+        return correctionlib.CorrectionSet.from_file(str(cset_path))
+
+    cset_json = build_jer_cset(jer_ptres_tag, jer_sf_tag, year).json(exclude_unset=True)
+    try:
+        cset_path.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first so concurrent jobs never read a partial file
+        tmp_path = cset_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(cset_json)
+        os.replace(tmp_path, cset_path)
+    except OSError:
+        # read-only data directory: keep going without the disk cache
+        pass
+    return correctionlib.CorrectionSet.from_string(cset_json)
+
+
+def get_jer_cset(jer_ptres_tag: str, jer_sf_tag: str, year: str):
+    """
+    returns correction set for jet smearing. The correction set is built once per
+    process and (year, tags) and cached in the correction registry
+
+    Parameters:
+    -----------
+        jer_ptres_tag:
+            tag for jer pt resolution
+        jer_sf_tag:
+            tag for jer scale factor
+        year:
+            dataset year
+    """
+    # imported here since the registry module imports this one
+    from analysis.corrections.registry import correction_registry
+
+    return correction_registry.get(
+        key=("jer", year, jer_ptres_tag, jer_sf_tag),
+        loader=lambda: load_jer_cset(jer_ptres_tag, jer_sf_tag, year),
+    )
 
 
 def get_era(input_str):
@@ -0,0 +1,37 @@
+from typing import List
+
+# Jet/MET shifts, filled as variations of the nominal weights
+JET_MET_SHIFTS = ["JESUp", "JESDown", "JERUp", "JERDown", "UESUp", "UESDown"]
+
+
+def get_weight_variations(object_selection: dict, year: str) -> List[str]:
+    """
+    returns the names of the weight variations added by the correctors, in the order
+    they are added to the weights container
+
+    Parameters:
+    -----------
+        object_selection:
+            object selection config (used to get the working points of the correctors)
+        year:
+            dataset year {'2016preVFP', '2016postVFP', '2017', '2018'}
+    """
+    muon_cuts = object_selection["muons"]["cuts"]
+    tau_cuts = object_selection["taus"]["cuts"]
+    highpt = muon_cuts["muons_id"] == "highpt"
+
+    weights = []
+    if year in ("2016preVFP", "2016postVFP", "2017"):
+        weights.append("l1prefiring")
+    weights.append("pileup")
+    weights.append(f"electron_id_{object_selection['electrons']['cuts']['electrons_id']}")
+    weights.extend(["electron_RecoAbove20", "electron_RecoBelow20"])
+    weights.append("muon_reco")
+    weights.append("muon_highptid" if highpt else f"muon_id_{muon_cuts['muons_id']}")
+    weights.append(f"muon_iso_{muon_cuts['muons_iso']}")
+    weights.append("muon_highpt_triggeriso" if highpt else "muon_triggeriso")
+    weights.append(f"tau_vs_electron_{tau_cuts['taus_vs_ele']}")
+    weights.append(f"tau_vs_muon_{tau_cuts['taus_vs_mu']}")
+    weights.append(f"tau_vs_jet_{tau_cuts['taus_vs_jet']}_pt")
+    weights.extend(["pujetid", "btag_bc", "btag_light"])
+    return [f"{weight}{shift}" for weight in weights for shift in ("Up", "Down")]
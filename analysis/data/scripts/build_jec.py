@@ -102,6 +102,16 @@ def save_factory(jet_factory, met_factory, name):
             },
             fout,
         )
+    # per-year files, so that processors only deserialize the factory they use
+    for year, year_jet_factory in jet_factory.items():
+        with gzip.open(f"{data_path}/{name}_jec_compiled_{year}.pkl.gz", "wb") as fout:
+            cloudpickle.dump(
+                {
+                    "jet_factory": year_jet_factory,
+                    "met_factory": met_factory,
+                },
+                fout,
+            )
 
 if __name__ == "__main__":
     save_factory(*get_mc_factories(), name="mc")
\ No newline at end of file
@@ -1 +1,9 @@
-from analysis.filesets.utils import divide_list
\ No newline at end of file
+from analysis.filesets.utils import divide_list
+from analysis.filesets.file_index import FileIndex, read_file_metadata
+from analysis.filesets.partition import (
+    partition_by_events,
+    get_file_metadata,
+    get_sumw,
+    get_sumw_files,
+    get_work_items,
+)
@@ -0,0 +1,245 @@
+import os
+import json
+import sqlite3
+import uproot
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+
+FILE_INDEX_PATH = Path(__file__).parent / "file_index.db"
+# bump when the 'files' table changes: older indexes are rebuilt
+SCHEMA_VERSION = 2
+COLUMNS = [
+    "path",
+    "uuid",
+    "mtime",
+    "entries",
+    "compressed_bytes",
+    "uncompressed_bytes",
+    "branches",
+    "gen_event_sumw",
+    "gen_event_count",
+]
+
+
+def get_mtime(path: str) -> Optional[float]:
+    """modification time of a local file (None for remote files)"""
+    if "://" in path or not os.path.exists(path):
+        return None
+    return os.stat(path).st_mtime
+
+
+def read_runs_sumw(runs) -> Dict[str, Optional[float]]:
+    """
+    read the sum of generator weights and the number of generated events from a NanoAOD
+    'Runs' tree. Data files (without generator information) return None values
+
+    Parameters:
+    -----------
+        runs:
+            uproot 'Runs' TTree
+    """
+    # early NanoAOD versions append a '_' to the generator branches
+    for suffix in ("", "_"):
+        if f"genEventSumw{suffix}" in runs.keys():
+            arrays = runs.arrays(
+                [f"genEventSumw{suffix}", f"genEventCount{suffix}"], library="np"
+            )
+            return {
+                "genEventSumw": float(arrays[f"genEventSumw{suffix}"].sum()),
+                "genEventCount": float(arrays[f"genEventCount{suffix}"].sum()),
+            }
+    return {"genEventSumw": None, "genEventCount": None}
+
+
+def read_file_metadata(path: str) -> Dict[str, Any]:
+    """
+    read the metadata of a NanoAOD file: UUID, number of entries, compressed and
+    uncompressed size and branch names of the 'Events' tree, and generator weights
+    from the 'Runs' tree
+
+    Parameters:
+    -----------
+        path:
+            path (or xrootd url) to a NanoAOD root file
+    """
+    with uproot.open(path) as f:
+        events = f["Events"]
+        branches = events.values(recursive=True)
+        metadata = {
+            "path": path,
+            "uuid": f.file.uuid.hex,
+            "mtime": get_mtime(path),
+            "entries": events.num_entries,
+            "compressed_bytes": sum(branch.compressed_bytes for branch in branches),
+            "uncompressed_bytes": sum(branch.uncompressed_bytes for branch in branches),
+            "branches": events.keys(recursive=True),
+        }
+        runs = read_runs_sumw(f["Runs"])
+    metadata["gen_event_sumw"] = runs["genEventSumw"]
+    metadata["gen_event_count"] = runs["genEventCount"]
+    return metadata
+
+
+class FileIndex:
+    """
+    Local SQLite index of per-file NanoAOD metadata, keyed by file path.
+
+    Each file is opened once; later lookups of the same path are served from the index
+    (a primary key lookup). Entries of local files are invalidated when their
+    modification time changes, and 'scan' with refresh=True re-reads remote files,
+    replacing the entries whose UUID changed.
+
+    Parameters:
+    -----------
+        path:
+            path to the SQLite database (created if it does not exist)
+    """
+
+    def __init__(self, path=FILE_INDEX_PATH):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        with self.connect() as connection:
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                connection.execute("DROP TABLE IF EXISTS runs")
+                connection.execute("DROP TABLE IF EXISTS files")
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    uuid TEXT,
+                    mtime REAL,
+                    entries INTEGER,
+                    compressed_bytes INTEGER,
+                    uncompressed_bytes INTEGER,
+                    branches TEXT,
+                    gen_event_sumw REAL,
+                    gen_event_count REAL
+                )
+                """
+            )
+
+    @contextmanager
+    def connect(self):
+        """open a connection that commits on success and is always closed"""
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def lookup(self, path: str) -> Optional[Dict[str, Any]]:
+        """
+        return the indexed metadata of a file, or None if the file is not indexed or its
+        entry is outdated
+
+        Parameters:
+        -----------
+            path:
+                path (or xrootd url) to a NanoAOD root file
+        """
+        with self._lock, self.connect() as connection:
+            row = connection.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM files WHERE path = ?", (path,)
+            ).fetchone()
+        if row is None:
+            return None
+        metadata = dict(zip(COLUMNS, row))
+        if metadata["mtime"] is not None and metadata["mtime"] != get_mtime(path):
+            return None
+        metadata["branches"] = json.loads(metadata["branches"])
+        return metadata
+
+    def store(self, metadata: Dict[str, Any]) -> None:
+        """add (or replace) the metadata of a file"""
+        row = dict(metadata, branches=json.dumps(metadata["branches"]))
+        with self._lock, self.connect() as connection:
+            connection.execute(
+                f"INSERT OR REPLACE INTO files VALUES ({', '.join('?' * len(COLUMNS))})",
+                [row[column] for column in COLUMNS],
+            )
+
+    def get_file(self, path: str) -> Dict[str, Any]:
+        """
+        return the metadata of a file, reading the file on first use
+
+        Parameters:
+        -----------
+            path:
+                path (or xrootd url) to a NanoAOD root file
+        """
+        metadata = self.lookup(path)
+        if metadata is None:
+            metadata = read_file_metadata(path)
+            self.store(metadata)
+        return metadata
+
+    def scan(
+        self, paths: Iterable[str], workers: int = 8, refresh: bool = False
+    ) -> Dict[str, int]:
+        """
+        index a list of files, opening them in parallel. Returns the number of files
+        read, already indexed and replaced (with a different UUID)
+
+        Parameters:
+        -----------
+            paths:
+                paths (or xrootd urls) to NanoAOD root files
+            workers:
+                number of files opened concurrently
+            refresh:
+                if True, re-read indexed files and replace the entries whose UUID changed
+        """
+        paths = list(paths)
+        indexed = {path: self.lookup(path) for path in paths}
+        to_read = [
+            path for path, metadata in indexed.items() if refresh or metadata is None
+        ]
+        summary = {"read": len(to_read), "cached": len(paths) - len(to_read), "updated": 0}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for metadata in pool.map(read_file_metadata, to_read):
+                previous = indexed[metadata["path"]]
+                if previous is not None and previous["uuid"] != metadata["uuid"]:
+                    summary["updated"] += 1
+                self.store(metadata)
+        return summary
+
+    def get_entries(self, paths: Iterable[str]) -> Dict[str, int]:
+        """
+        return the number of entries of each file {path: entries}
+
+        Parameters:
+        -----------
+            paths:
+                paths (or xrootd urls) to NanoAOD root files
+        """
+        return {path: self.get_file(path)["entries"] for path in paths}
+
+    def get_branches(self, path: str) -> List[str]:
+        """return the branch names of the 'Events' tree of a file"""
+        return self.get_file(path)["branches"]
+
+    def get_sumw(self, paths: Iterable[str]) -> Dict[str, Optional[float]]:
+        """
+        return the total 'genEventSumw' and 'genEventCount' of a list of files
+        (None values for Data files)
+
+        Parameters:
+        -----------
+            paths:
+                paths (or xrootd urls) to NanoAOD root files
+        """
+        total = {"genEventSumw": 0.0, "genEventCount": 0.0}
+        for path in paths:
+            metadata = self.get_file(path)
+            if metadata["gen_event_sumw"] is None:
+                return {"genEventSumw": None, "genEventCount": None}
+            total["genEventSumw"] += metadata["gen_event_sumw"]
+            total["genEventCount"] += metadata["gen_event_count"]
+        return total
@@ -3,6 +3,7 @@ import yaml
 import json
 import argparse
 from pathlib import Path
+from file_index import FileIndex
 from coffea.dataset_tools.dataset_query import DataDiscoveryCLI
 
 
@@ -93,6 +94,13 @@ def main(args):
         with open(f"fileset_{args.year}_NANO_lxplus.json", "w") as json_file:
             json.dump(new_dataset, json_file, indent=4, sort_keys=True)
 
+        if not args.no_scan:
+            # index the metadata (entries, uuid, sizes, branches) of every file
+            file_index = FileIndex()
+            for dataset_key, root_files in new_dataset.items():
+                summary = file_index.scan(root_files, workers=args.workers)
+                print(f"{dataset_key}: {summary['read']} files indexed")
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -103,5 +111,17 @@ if __name__ == "__main__":
         default="2017",
         help="year of the data {2016preVFP, 2016postVFP, 2017, 2018}",
     )
+    parser.add_argument(
+        "--no_scan",
+        action="store_true",
+        help="do not index the metadata of the fileset files",
+    )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        default=8,
+        help="number of files opened concurrently when indexing (default 8)",
+    )
     args = parser.parse_args()
     main(args)
\ No newline at end of file
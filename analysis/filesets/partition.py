@@ -0,0 +1,202 @@
+import math
+import uuid
+from typing import Any, Dict, List, Optional, Union
+from coffea.processor.executor import WorkItem
+
+# a partition item is either a whole file (path) or an entry range [path, entry_start, entry_stop]
+Item = Union[str, list]
+# file index columns passed to the jobs
+JOB_METADATA_COLUMNS = ["uuid", "entries", "gen_event_sumw", "gen_event_count"]
+
+
+def split_file(path: str, nentries: int, events_per_job: int) -> List[list]:
+    """split a file into entry ranges of (roughly) equal size, at most 'events_per_job' each"""
+    nranges = math.ceil(nentries / events_per_job)
+    bounds = [round(i * nentries / nranges) for i in range(nranges + 1)]
+    return [[path, start, stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def pack(sizes: Dict[str, int], capacity: int) -> List[List[str]]:
+    """
+    first-fit decreasing bin packing. Returns the list of bins (lists of item keys)
+
+    Parameters:
+    -----------
+        sizes:
+            size of each item {key: size}
+        capacity:
+            target size of each bin
+    """
+    bins, loads = [], []
+    for key in sorted(sizes, key=lambda key: sizes[key], reverse=True):
+        for i, load in enumerate(loads):
+            if load + sizes[key] <= capacity:
+                bins[i].append(key)
+                loads[i] += sizes[key]
+                break
+        else:
+            bins.append([key])
+            loads.append(sizes[key])
+    return bins
+
+
+def partition_by_events(
+    entries: Dict[str, Dict[str, int]], events_per_job: int
+) -> List[Dict[str, List[Item]]]:
+    """
+    partition datasets into jobs of roughly 'events_per_job' events
+
+    Files with more entries than 'events_per_job' are split into entry ranges, and the
+    remaining files of each dataset are packed together. Datasets with less than
+    'events_per_job' events are kept whole and packed into shared jobs
+
+    Parameters:
+    -----------
+        entries:
+            number of entries of each file of each dataset {dataset: {path: entries}}
+        events_per_job:
+            target number of events per job
+
+    Returns:
+    --------
+        list of job filesets {dataset: [items]}
+    """
+    partitions = []
+    small_datasets = {}
+    for dataset, file_entries in entries.items():
+        total = sum(file_entries.values())
+        if total <= events_per_job:
+            small_datasets[dataset] = total
+            continue
+        whole_files = {}
+        for path, nentries in file_entries.items():
+            if nentries > events_per_job:
+                for item in split_file(path, nentries, events_per_job):
+                    partitions.append({dataset: [item]})
+            else:
+                whole_files[path] = nentries
+        for paths in pack(whole_files, events_per_job):
+            partitions.append({dataset: paths})
+
+    for datasets in pack(small_datasets, events_per_job):
+        partitions.append({dataset: list(entries[dataset]) for dataset in datasets})
+    return partitions
+
+
+def get_item_path(item: Item) -> str:
+    """return the file path of a partition item"""
+    return item if isinstance(item, str) else item[0]
+
+
+def get_sumw_files(items: List[Item]) -> List[str]:
+    """
+    return the files whose 'Runs' tree must be counted by a job: whole files and files
+    whose first entry range belongs to the job, so split files are counted once
+    """
+    return [
+        get_item_path(item)
+        for item in items
+        if isinstance(item, str) or item[1] == 0
+    ]
+
+
+def get_file_metadata(
+    partition_fileset: Dict[str, List[Item]], file_index
+) -> Dict[str, Dict[str, Any]]:
+    """
+    return the metadata used by a job for each of its files {path: metadata}: UUID,
+    number of entries and generator weights. It is resolved at submit time and passed
+    to the job, so jobs do not open the file index
+
+    Parameters:
+    -----------
+        partition_fileset:
+            job fileset {dataset: [items]}
+        file_index:
+            FileIndex object with the metadata of each file
+    """
+    file_metadata = {}
+    for items in partition_fileset.values():
+        for item in items:
+            path = get_item_path(item)
+            if path not in file_metadata:
+                metadata = file_index.get_file(path)
+                file_metadata[path] = {
+                    column: metadata[column] for column in JOB_METADATA_COLUMNS
+                }
+    return file_metadata
+
+
+def get_job_file(file_metadata: Dict[str, Dict[str, Any]], path: str) -> Dict[str, Any]:
+    """return the metadata of a job file, failing if it was not resolved at submit time"""
+    if path not in file_metadata:
+        raise KeyError(
+            f"{path} has no metadata in the job arguments. Rebuild the job files with submit_condor.py"
+        )
+    return file_metadata[path]
+
+
+def get_sumw(
+    items: List[Item], file_metadata: Dict[str, Dict[str, Any]]
+) -> Dict[str, Optional[float]]:
+    """
+    return the total 'genEventSumw' and 'genEventCount' counted by a job (see
+    'get_sumw_files'). None values for Data files: a Data job whose entry ranges do not
+    start its files counts no file, and must not report a sum of 0
+
+    Parameters:
+    -----------
+        items:
+            items of a dataset of the job
+        file_metadata:
+            metadata of the job files {path: metadata}
+    """
+    for item in items:
+        if get_job_file(file_metadata, get_item_path(item))["gen_event_sumw"] is None:
+            return {"genEventSumw": None, "genEventCount": None}
+    total = {"genEventSumw": 0.0, "genEventCount": 0.0}
+    for path in get_sumw_files(items):
+        total["genEventSumw"] += file_metadata[path]["gen_event_sumw"]
+        total["genEventCount"] += file_metadata[path]["gen_event_count"]
+    return total
+
+
+def get_work_items(
+    partition_fileset: Dict[str, List[Item]],
+    file_metadata: Dict[str, Dict[str, Any]],
+    chunksize: int = 100000,
+) -> List[WorkItem]:
+    """
+    build the coffea work items (chunks) of a job fileset with whole files and entry ranges
+
+    Parameters:
+    -----------
+        partition_fileset:
+            job fileset {dataset: [items]}
+        file_metadata:
+            number of entries and UUID of each file {path: metadata} (see 'get_file_metadata')
+        chunksize:
+            maximum number of events per chunk
+    """
+    work_items = []
+    for dataset, items in partition_fileset.items():
+        for item in items:
+            path = get_item_path(item)
+            info = get_job_file(file_metadata, path)
+            start, stop = (0, info["entries"]) if isinstance(item, str) else item[1:]
+            if stop == start:
+                continue
+            nchunks = max(math.ceil((stop - start) / chunksize), 1)
+            bounds = [start + round(i * (stop - start) / nchunks) for i in range(nchunks + 1)]
+            for entry_start, entry_stop in zip(bounds[:-1], bounds[1:]):
+                work_items.append(
+                    WorkItem(
+                        dataset=dataset,
+                        filename=path,
+                        treename="Events",
+                        entrystart=entry_start,
+                        entrystop=entry_stop,
+                        fileuuid=uuid.UUID(info["uuid"]).bytes,
+                    )
+                )
+    return work_items
@@ -0,0 +1,53 @@
+import json
+import argparse
+from pathlib import Path
+from file_index import FileIndex
+
+
+def main(args):
+    # open the fileset of the year
+    with open(f"{Path.cwd()}/fileset_{args.year}_NANO_lxplus.json", "r") as f:
+        fileset = json.load(f)
+    datasets = args.datasets or list(fileset)
+
+    file_index = FileIndex()
+    for dataset in datasets:
+        summary = file_index.scan(
+            fileset[dataset], workers=args.workers, refresh=args.refresh
+        )
+        print(
+            f"{dataset}: {summary['read']} files read, {summary['cached']} already indexed, "
+            f"{summary['updated']} updated"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--year",
+        dest="year",
+        type=str,
+        default="2017",
+        help="year of the data {2016preVFP, 2016postVFP, 2017, 2018}",
+    )
+    parser.add_argument(
+        "--datasets",
+        dest="datasets",
+        nargs="*",
+        default=None,
+        help="datasets to be scanned (default all datasets of the fileset)",
+    )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        default=8,
+        help="number of files opened concurrently (default 8)",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="re-read indexed files and replace the entries whose UUID changed",
+    )
+    args = parser.parse_args()
+    main(args)
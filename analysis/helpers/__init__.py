@@ -1 +1,6 @@
-from analysis.helpers.output_directory_builder import get_output_directory
\ No newline at end of file
+from analysis.helpers.output_directory_builder import get_output_directory
+from analysis.helpers.columns import (
+    get_required_columns,
+    is_required_branch,
+    RequiredColumnsNanoAODSchema,
+)
@@ -0,0 +1,143 @@
+import ast
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+from coffea.nanoevents import NanoAODSchema
+from analysis.configs.expressions import Expression
+
+ANALYSIS_PATH = Path(__file__).parent.parent
+# modules whose code reads NanoAOD collections on behalf of the processors
+DEPENDENCY_MODULES = ["corrections", "selections", "working_points"]
+# event-level branches read by coffea itself
+BASE_BRANCHES = ["run", "luminosityBlock", "event"]
+
+
+def get_event_collections(source: str) -> Set[str]:
+    """
+    statically collect the NanoAOD collections (or event-level branches) read from an
+    events array in a python source: 'events.Muon', 'self.events.Jet' and
+    'events["Muon", "pt"]' all read the 'Muon'/'Jet' collections
+
+    Parameters:
+    -----------
+        source:
+            python source code
+    """
+    collections = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Attribute):
+            value, name = node.value, node.attr
+        elif isinstance(node, ast.Subscript):
+            value, key = node.value, node.slice
+            if isinstance(key, ast.Tuple) and key.elts:
+                key = key.elts[0]
+            if not (isinstance(key, ast.Constant) and isinstance(key.value, str)):
+                continue
+            name = key.value
+        else:
+            continue
+        is_events = (isinstance(value, ast.Name) and value.id == "events") or (
+            isinstance(value, ast.Attribute) and value.attr == "events"
+        )
+        if is_events:
+            collections.add(name)
+    return collections
+
+
+def iter_expressions(obj) -> Iterable[Expression]:
+    """yield the Expression objects of (nested) config dicts and lists"""
+    if isinstance(obj, Expression):
+        yield obj
+    elif isinstance(obj, dict):
+        for value in obj.values():
+            yield from iter_expressions(value)
+    elif isinstance(obj, list):
+        for value in obj:
+            yield from iter_expressions(value)
+
+
+def get_required_columns(processor_config, processor: str = "ztojets") -> Dict[str, List[str]]:
+    """
+    statically collect the NanoAOD columns needed by a processor: collections read by the
+    processor, corrector, selection and working point modules, and by the config
+    expressions. Collections referenced through NanoAOD cross-references (e.g. Jet -> GenJet)
+    are included, and the HLT collection is restricted to the config trigger paths
+
+    Parameters:
+    -----------
+        processor_config:
+            ProcessorConfig object
+        processor:
+            processor name {ztojets}
+    """
+    sources = [ANALYSIS_PATH / "processors" / f"{processor}.py"]
+    for module in DEPENDENCY_MODULES:
+        sources.extend(sorted((ANALYSIS_PATH / module).glob("*.py")))
+    collections = set()
+    for source in sources:
+        collections |= get_event_collections(source.read_text())
+
+    expressions = iter_expressions(
+        [
+            processor_config.object_selection,
+            processor_config.event_selection,
+            [axis.expression for axis in processor_config.histogram_config.axes.values()],
+        ]
+    )
+    for expression in expressions:
+        collections |= expression.event_collections
+
+    # add the targets of the cross-references of every required collection
+    while True:
+        targets = {
+            target
+            for branch, target in NanoAODSchema.all_cross_references.items()
+            if branch.split("_")[0] in collections
+        }
+        if targets <= collections:
+            break
+        collections |= targets
+
+    branches = list(BASE_BRANCHES)
+    if "HLT" in collections:
+        collections.discard("HLT")
+        branches.extend(f"HLT_{hlt_path}" for hlt_path in processor_config.hlt_paths)
+    return {"collections": sorted(collections), "branches": sorted(branches)}
+
+
+def is_required_branch(branch: str, required_columns: Dict[str, List[str]]) -> bool:
+    """
+    check if a NanoAOD branch belongs to the required columns
+
+    Parameters:
+    -----------
+        branch:
+            branch name (e.g. 'Muon_pt', 'nMuon', 'genWeight')
+        required_columns:
+            output of 'get_required_columns'
+    """
+    if branch in required_columns["branches"]:
+        return True
+    collection = branch.split("_")[0]
+    if branch.startswith("n") and branch[1:] in required_columns["collections"]:
+        return True
+    return collection in required_columns["collections"]
+
+
+class RequiredColumnsNanoAODSchema(NanoAODSchema):
+    """
+    NanoAODSchema that only exposes the branches of 'required_columns', so nothing else is
+    read or decompressed. 'required_columns' is a class attribute (set it before running
+    the job) since coffea passes schemas by reference to the worker processes
+    """
+
+    required_columns = None
+
+    def __init__(self, base_form, *args, **kwargs):
+        if self.required_columns is not None:
+            base_form = dict(base_form)
+            base_form["contents"] = {
+                branch: form
+                for branch, form in base_form["contents"].items()
+                if is_required_branch(branch, self.required_columns)
+            }
+        super().__init__(base_form, *args, **kwargs)
@@ -0,0 +1,42 @@
+import time
+from typing import Any, Dict
+
+
+class ColumnCache:
+    """
+    Lazily evaluated histogram variables
+
+    Each histogram expression is evaluated (at most) once over the full event array,
+    and every category takes a masked view of the cached columns. The time spent
+    computing each variable is recorded in 'timings'
+
+    Parameters:
+    -----------
+        histogram_config:
+            HistogramConfig object with the (compiled) axis expressions
+        namespace:
+            ExpressionNamespace used to evaluate the expressions
+    """
+
+    def __init__(self, histogram_config, namespace):
+        self.histogram_config = histogram_config
+        self.namespace = namespace
+        self.columns: Dict[str, Any] = {}
+        self.timings: Dict[str, float] = {}
+
+    def get(self, variable: str):
+        """return the full-array column of a variable, evaluating it on first use"""
+        if variable not in self.columns:
+            t0 = time.perf_counter()
+            self.columns[variable] = self.histogram_config.axes[
+                variable
+            ].expression.evaluate(self.namespace)
+            self.timings[variable] = time.perf_counter() - t0
+        return self.columns[variable]
+
+    def masked(self, mask) -> Dict[str, Any]:
+        """return a {variable: column[mask]} map with all histogram variables"""
+        return {
+            variable: self.get(variable)[mask]
+            for variable in self.histogram_config.axes
+        }
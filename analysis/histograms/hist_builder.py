@@ -2,8 +2,21 @@ import hist
 
 
 class HistBuilder:
-    def __init__(self, processor_config):
+    def __init__(self, processor_config, variations=None):
+        """
+        Factory of empty histograms. The axes are built once from the histogram config
+        and every call to 'build_histogram' returns a new set of empty histograms
+
+        Parameters:
+        -----------
+            processor_config:
+                ProcessorConfig object
+            variations:
+                list of variation names. If given, the 'variation' axis has a fixed set
+                of categories; otherwise it grows as new variations are filled
+        """
         self.processor_config = processor_config
+        self.variations = variations
         self.histogram_config = processor_config.histogram_config
         self.axis_opt = {
             "StrCategory": hist.axis.StrCategory,
@@ -11,18 +24,27 @@ class HistBuilder:
             "Regular": hist.axis.Regular,
             "Variable": hist.axis.Variable,
         }
+        self._axes = None
 
     def build_histogram(self):
+        """return a dictionary with new empty histograms"""
+        if self._axes is None:
+            self._axes = self.build_axes()
+        # hist.Hist copies the axes, so the cached ones are never modified
+        return {hist_name: hist.Hist(*axes) for hist_name, axes in self._axes.items()}
+
+    def build_axes(self):
+        """return the axes (and storage) of each histogram"""
         if self.histogram_config.stack:
-            histograms = {}
+            histogram_axes = {}
             for hist_name, axes_names in self.histogram_config.layout.items():
-                histograms[hist_name] = self.build_stacked_histogram(axes_names)
+                histogram_axes[hist_name] = self.build_stacked_axes(axes_names)
         else:
-            histograms = self.build_individual_histogram()
-        return histograms
+            histogram_axes = self.build_individual_axes()
+        return histogram_axes
 
-    def build_individual_histogram(self):
-        histograms = {}
+    def build_individual_axes(self):
+        histogram_axes = {}
         for axis in self.histogram_config.axes:
             axes = [self.build_axis(axis)]
             axes.append(self.get_category_axis())
@@ -30,10 +52,10 @@ class HistBuilder:
                 axes.append(self.get_syst_axis())
             if self.histogram_config.add_weight:
                 axes.append(hist.storage.Weight())
-            histograms[axis] = hist.Hist(*axes)
-        return histograms
+            histogram_axes[axis] = axes
+        return histogram_axes
 
-    def build_stacked_histogram(self, axes_names):
+    def build_stacked_axes(self, axes_names):
         axes = [self.get_category_axis()]
         for axis in axes_names:
             axes.append(self.build_axis(axis))
@@ -41,7 +63,7 @@ class HistBuilder:
             axes.append(self.get_syst_axis())
         if self.histogram_config.add_weight:
             axes.append(hist.storage.Weight())
-        return hist.Hist(*axes)
+        return axes
 
     def build_axis(self, axis_name: dict):
         """build a hist axis object from an axis config"""
@@ -50,7 +72,9 @@ class HistBuilder:
         return self.axis_opt[hist_type](**axis_args)
 
     def get_syst_axis(self):
-        return hist.axis.StrCategory(name="variation", categories=[], growth=True)
+        if self.variations is None:
+            return hist.axis.StrCategory(name="variation", categories=[], growth=True)
+        return hist.axis.StrCategory(name="variation", categories=self.variations)
 
     def get_category_axis(self):
         categories = list(self.processor_config.event_selection["categories"].keys())
@@ -1,3 +1,4 @@
+import hist
 import numpy as np
 import awkward as ak
 
@@ -75,3 +76,171 @@ def fill_histogram(
                 }
             )
             histograms[key].fill(**fill_args)
+
+
+def get_counts(array: ak.Array):
+    """number of entries per event of an object-level (2D) array"""
+    return ak.to_numpy(ak.fill_none(ak.num(array, axis=1), 0))
+
+
+def is_dense(histogram) -> bool:
+    """check if every axis of 'histogram' has a fixed set of bins (no growth)"""
+    return not any(axis.traits.growth for axis in histogram.axes)
+
+
+def get_category_indices(axis, values):
+    """
+    integer indices of 'values' along a category axis. Values not in the axis go to the
+    overflow bin, or get index -1 (dropped) if the axis has no overflow, as in hist.Hist.fill
+    """
+    categories = np.asarray(list(axis))
+    values = np.atleast_1d(np.asarray(values))
+    order = np.argsort(categories)
+    positions = np.minimum(
+        np.searchsorted(categories[order], values), len(categories) - 1
+    )
+    found = categories[order][positions] == values
+    unknown_index = len(categories) if axis.traits.overflow else -1
+    return np.where(found, order[positions], unknown_index)
+
+
+def get_flow_indices(axis, values):
+    """
+    integer indices of 'values' along 'axis' in the flow=True view (underflow bin is 0)
+    """
+    if isinstance(axis, (hist.axis.IntCategory, hist.axis.StrCategory)):
+        return get_category_indices(axis, values)
+    return np.asarray(axis.index(values)) + int(axis.traits.underflow)
+
+
+def fill_dense(histogram, fill_values, category, variations, weight_matrix):
+    """
+    fill a histogram with fixed axes by accumulating weights at integer bin indices
+
+    The bin index of each entry is computed once and offset for each variation, so
+    the values of the variables are not repeated per variation
+
+    Parameters:
+    -----------
+        histogram:
+            hist.Hist object without growth axes
+        fill_values:
+            dictionary with the entry values of each variable axis
+        category:
+            category name
+        variations:
+            variation names (rows of 'weight_matrix')
+        weight_matrix:
+            array of shape (number of variations, number of entries). Histograms
+            without a 'variation' axis take a single row
+    """
+    view = histogram.view(flow=True)
+    strides = np.cumprod((1,) + view.shape[:0:-1])[::-1]
+
+    # histograms without a 'variation' axis are filled with a single row of weights
+    variation_offset = np.zeros(1, dtype=np.intp)
+    if "variation" not in histogram.axes.name and weight_matrix.shape[0] != 1:
+        raise ValueError(
+            f"histograms without a 'variation' axis take a single row of weights, got {weight_matrix.shape[0]}"
+        )
+    n_entries = weight_matrix.shape[1]
+    flat_index = np.zeros(n_entries, dtype=np.intp)
+    valid = np.ones(n_entries, dtype=bool)
+    for axis, stride in zip(histogram.axes, strides):
+        if axis.name == "variation":
+            declared = list(axis)
+            unknown = [variation for variation in variations if variation not in declared]
+            if unknown:
+                raise KeyError(
+                    f"variations {unknown} are not declared in the 'variation' axis"
+                )
+            variation_offset = (
+                np.array([declared.index(v) for v in variations], dtype=np.intp) * stride
+            )
+        elif axis.name == "category":
+            indices = get_flow_indices(axis, category)
+            # unknown categories of an axis without overflow are dropped, as in hist.Hist.fill
+            valid &= indices >= 0
+            flat_index += indices * stride
+        else:
+            indices = get_flow_indices(axis, fill_values[axis.name])
+            # entries outside the flow view are dropped, as in hist.Hist.fill
+            valid &= (indices >= 0) & (indices < axis.extent)
+            flat_index += indices * stride
+
+    flat_index = (variation_offset[:, None] + flat_index[valid]).ravel()
+    entry_weights = weight_matrix[:, valid].ravel()
+    if histogram.storage_type is hist.storage.Weight:
+        view["value"] += np.bincount(
+            flat_index, weights=entry_weights, minlength=view.size
+        ).reshape(view.shape)
+        view["variance"] += np.bincount(
+            flat_index, weights=entry_weights**2, minlength=view.size
+        ).reshape(view.shape)
+    else:
+        view += np.bincount(
+            flat_index, weights=entry_weights, minlength=view.size
+        ).reshape(view.shape)
+
+
+def fill_histograms(
+    histograms, histogram_config, variables_map, category, weights, flow=True
+):
+    """
+    fill histograms for several variations at once
+
+    The variable arrays (flattening, flow clipping, casting) are prepared once per
+    histogram. Histograms with a pre-declared variation axis are filled through
+    integer bin indices (see 'fill_dense'); otherwise the values are repeated for
+    each variation and filled in a single call with the variation label of each entry
+
+    Parameters:
+    -----------
+        histograms:
+            dictionary with hist.Hist objects
+        histogram_config:
+            HistogramConfig object
+        variables_map:
+            dictionary with the variable arrays of the category
+        category:
+            category name
+        weights:
+            dictionary with the event weights of each variation {variation: weights}
+        flow:
+            whether to include underflow/overflow to first/last bin
+    """
+    variations = list(weights)
+    weight_matrix = np.stack([np.asarray(weights[variation]) for variation in variations])
+    if histogram_config.layout == "individual":
+        layout = {variable: [variable] for variable in histograms}
+    else:
+        layout = histogram_config.layout
+    for key, variables in layout.items():
+        fill_values = {}
+        for variable in variables:
+            fill_values[variable] = np.asarray(
+                get_variable_array(
+                    histograms[key], histogram_config, variable, variables_map, flow
+                )
+            )
+        # object-level variables: broadcast event weights to each object
+        if variables_map[variable].ndim == 2:
+            counts = get_counts(variables_map[variable])
+            entry_weights = np.repeat(weight_matrix, counts, axis=1)
+        else:
+            entry_weights = weight_matrix
+        if is_dense(histograms[key]):
+            fill_dense(histograms[key], fill_values, category, variations, entry_weights)
+            continue
+        fill_args = {
+            variable: np.tile(values, len(variations))
+            for variable, values in fill_values.items()
+        }
+        fill_args.update(
+            {
+                "variation": np.repeat(variations, entry_weights.shape[1]),
+                "category": category,
+                "weight": entry_weights.ravel(),
+            }
+        )
+        histograms[key].fill(**fill_args)
@@ -0,0 +1,136 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+
+def get_variation_values(projection, variations: Optional[List[str]] = None):
+    """
+    return the variation names and the values of a (variation, variable) projection as a
+    dense (variation, bin) array, with the rows in the order of 'variations'
+
+    Parameters:
+    -----------
+        projection:
+            histogram with 'variation' and variable axes
+        variations:
+            order of the variations (default the variation axis order)
+    """
+    variation_axis = projection.axes["variation"]
+    if variations is None:
+        variations = list(variation_axis)
+    rows = [variation_axis.index(variation) for variation in variations]
+    return variations, projection.values()[rows]
+
+
+def get_variation_array(histograms, axis: str, category: str):
+    """
+    return the variation names and the values of the variation axis of each histogram as
+    a dense (process, variation, bin) array, using a single projection per histogram
+
+    Parameters:
+    -----------
+        histograms:
+            histograms of each process (with 'variation' and 'category' axes)
+        axis:
+            variable axis to project on
+        category:
+            category of the values
+    """
+    variations, values = None, []
+    for histogram in histograms:
+        projection = histogram[{"category": category}].project("variation", axis)
+        variations, process_values = get_variation_values(projection, variations)
+        values.append(process_values)
+    return variations, np.stack(values)
+
+
+def get_variation_pairs(variations: List[str]) -> Tuple[List[str], List[int], List[int]]:
+    """return the names of the Up/Down variation pairs and the indices of their Up and Down variations"""
+    keys, up_index, down_index = [], [], []
+    for index, variation in enumerate(variations):
+        if not variation.endswith("Up"):
+            continue
+        key = variation[: -len("Up")]
+        if f"{key}Down" in variations:
+            keys.append(key)
+            up_index.append(index)
+            down_index.append(variations.index(f"{key}Down"))
+    return keys, up_index, down_index
+
+
+def combine_variations(
+    nominal: np.ndarray, variation_values: np.ndarray, variations: List[str]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    return the squared up/down systematic errors of each bin, summing in quadrature the
+    errors of every Up/Down variation pair (one- and two-sided). All pairs are combined at
+    once, so the leading dimensions (e.g. process) are kept
+
+    Parameters:
+    -----------
+        nominal:
+            nominal values with shape (..., bin)
+        variation_values:
+            variation values with shape (..., variation, bin)
+        variations:
+            variation names (in the order of 'variation_values')
+    """
+    _, up_index, down_index = get_variation_pairs(variations)
+    nominal = np.asarray(nominal)[..., None, :]
+    # Compute the uncertainties corresponding to the up/down variations
+    err_up = variation_values[..., up_index, :] - nominal
+    err_down = variation_values[..., down_index, :] - nominal
+    # Compute the flags to check which of the two variations (up and down) are pushing the nominal value up and down
+    up_is_up = err_up > 0
+    down_is_down = err_down < 0
+    # Compute the flag to check if the uncertainty is one-sided, i.e. when both variations are up or down
+    is_onesided = up_is_up ^ down_is_down
+    # Sum in quadrature of the systematic uncertainties taking into account if the uncertainty is one- or double-sided
+    err2_up_twosided = np.where(up_is_up, err_up**2, err_down**2)
+    err2_down_twosided = np.where(up_is_up, err_down**2, err_up**2)
+    err2_max = np.maximum(err2_up_twosided, err2_down_twosided)
+    err2_up_onesided = np.where(is_onesided & up_is_up, err2_max, 0)
+    err2_down_onesided = np.where(is_onesided & down_is_down, err2_max, 0)
+    err2_up = np.where(is_onesided, err2_up_onesided, err2_up_twosided)
+    err2_down = np.where(is_onesided, err2_down_onesided, err2_down_twosided)
+    return err2_up.sum(axis=-2), err2_down.sum(axis=-2)
+
+
+def get_bands(
+    nominal: np.ndarray,
+    variation_values: np.ndarray,
+    variations: List[str],
+    stat_err2: Optional[np.ndarray] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    return the up/down errors of each bin ('up', 'down') and of the integrated yield
+    ('integrated_up', 'integrated_down'). The integrated errors combine the integrated
+    variations, so each variation is correlated across bins
+
+    Parameters:
+    -----------
+        nominal:
+            nominal values with shape (..., bin)
+        variation_values:
+            variation values with shape (..., variation, bin)
+        variations:
+            variation names (in the order of 'variation_values')
+        stat_err2:
+            squared statistical errors with shape (..., bin), added in quadrature (optional)
+    """
+    nominal = np.asarray(nominal)
+    variation_values = np.asarray(variation_values)
+    if stat_err2 is None:
+        stat_err2 = np.zeros_like(nominal, dtype=float)
+    err2_up, err2_down = combine_variations(nominal, variation_values, variations)
+    integrated_err2_up, integrated_err2_down = combine_variations(
+        nominal.sum(axis=-1, keepdims=True),
+        variation_values.sum(axis=-1, keepdims=True),
+        variations,
+    )
+    integrated_stat_err2 = np.sum(stat_err2, axis=-1, keepdims=True)
+    return {
+        "up": np.sqrt(err2_up + stat_err2),
+        "down": np.sqrt(err2_down + stat_err2),
+        "integrated_up": np.sqrt(integrated_err2_up + integrated_stat_err2)[..., 0],
+        "integrated_down": np.sqrt(integrated_err2_down + integrated_stat_err2)[..., 0],
+    }
@@ -0,0 +1,158 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+from coffea.util import load, save
+from typing import Any, Dict, List, Optional, Tuple
+
+# bump when the manifest or the cached outputs change: older caches are rebuilt
+MANIFEST_VERSION = 2
+
+
+def file_checksum(path: str) -> str:
+    """sha256 checksum of a file"""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+class MergeCache:
+    """
+    Cache of the merged (accumulated) outputs of each sample, with a manifest of the
+    size, modification time and checksum of the output files merged into them.
+
+    Samples whose files are unchanged are read from the cache, and new files are merged
+    into the cached sums. Samples with a changed (different checksum) or removed file are
+    rebuilt, since a partition can not be removed from a sum. Everything is rebuilt when
+    the manifest is missing or invalid
+
+    Parameters:
+    -----------
+        cache_dir:
+            cache directory (created if it does not exist)
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.cache_dir / "manifest.json"
+
+    def load_manifest(self) -> Optional[Dict[str, Any]]:
+        """return the manifest, or None if it is missing or invalid"""
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if manifest.get("version") != MANIFEST_VERSION:
+            return None
+        return manifest
+
+    def get_sample_path(self, sample: str) -> Path:
+        return self.cache_dir / f"{sample}.coffea"
+
+    def get_file_states(
+        self, output_files: List[str], cached_states: Dict[str, Dict[str, Any]]
+    ) -> Tuple[Dict[str, Dict[str, Any]], List[str], bool]:
+        """
+        compare the output files of a sample with their cached states. Checksums are only
+        computed for new files and for files whose size or modification time changed.
+        Returns the current file states, the new files and whether any file changed
+
+        Parameters:
+        -----------
+            output_files:
+                output files of the sample
+            cached_states:
+                file states of the manifest {file name: {size, mtime, checksum}}
+        """
+        states, new_files, changed = {}, [], False
+        for output_file in output_files:
+            name = Path(output_file).name
+            stat = os.stat(output_file)
+            state = {"size": stat.st_size, "mtime": stat.st_mtime}
+            cached = cached_states.get(name)
+            if cached is None:
+                new_files.append(output_file)
+                state["checksum"] = file_checksum(output_file)
+            elif (cached["size"], cached["mtime"]) == (state["size"], state["mtime"]):
+                state["checksum"] = cached["checksum"]
+            else:
+                state["checksum"] = file_checksum(output_file)
+                changed |= state["checksum"] != cached["checksum"]
+            states[name] = state
+        # removed files
+        changed |= not set(cached_states) <= set(states)
+        return states, new_files, changed
+
+    def plan(self, grouped_outputs: Dict[str, List[str]], rebuild: bool = False):
+        """
+        return the files to load of each sample {sample: [files]}, the cached merged
+        output of each sample to merge them into {sample: output or None}, and the new
+        file states of each sample
+
+        Parameters:
+        -----------
+            grouped_outputs:
+                output files of each sample {sample: [output files]}
+            rebuild:
+                if True, ignore the cache and rebuild every sample
+        """
+        manifest = None if rebuild else self.load_manifest()
+        cached_samples = manifest["samples"] if manifest else {}
+        to_load, bases, states = {}, {}, {}
+        counts = {"cached": 0, "updated": 0, "rebuilt": 0}
+        for sample, output_files in grouped_outputs.items():
+            cached_states = cached_samples.get(sample)
+            sample_path = self.get_sample_path(sample)
+            if cached_states is None or not sample_path.exists():
+                states[sample], _, _ = self.get_file_states(output_files, {})
+                to_load[sample], bases[sample] = output_files, None
+                counts["rebuilt"] += 1
+                continue
+            states[sample], new_files, changed = self.get_file_states(
+                output_files, cached_states
+            )
+            if changed:
+                to_load[sample], bases[sample] = output_files, None
+                counts["rebuilt"] += 1
+            else:
+                to_load[sample], bases[sample] = new_files, load(str(sample_path))
+                counts["updated" if new_files else "cached"] += 1
+        logging.info(
+            f"merged outputs cache: {counts['cached']} samples cached, "
+            f"{counts['updated']} updated with new files, {counts['rebuilt']} rebuilt"
+        )
+        return to_load, bases, states
+
+    def update(
+        self,
+        merged: Dict[str, Any],
+        states: Dict[str, Dict[str, Any]],
+        updated_samples: List[str],
+    ) -> None:
+        """
+        save the merged outputs of the updated samples and the manifest
+
+        Parameters:
+        -----------
+            merged:
+                merged output of each sample
+            states:
+                file states of each sample (see 'plan')
+            updated_samples:
+                samples whose merged output changed
+        """
+        for sample in updated_samples:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            os.close(fd)
+            save(merged[sample], tmp_path)
+            os.replace(tmp_path, self.get_sample_path(sample))
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "samples": states}, f)
+        os.replace(tmp_path, self.manifest_path)
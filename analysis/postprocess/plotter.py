@@ -1,3 +1,4 @@
+import copy
 import yaml
 import logging
 import numpy as np
@@ -5,10 +6,12 @@ import mplhep as hep
 import matplotlib.pyplot as plt
 from pathlib import Path
 from matplotlib import ticker
+from concurrent.futures import ProcessPoolExecutor
 from coffea.processor import accumulate
 from hist.intervals import poisson_interval
 from analysis.histograms import VariableAxis
 from analysis.configs import ProcessorConfigBuilder
+from analysis.postprocess.bands import get_bands, get_variation_values
 from analysis.postprocess.utils import setup_logger, divide_by_binwidth
 
 
@@ -51,120 +54,44 @@ class Plotter:
         )
         self.color_map = {process: color for process, color in zip(processes, colors)}
 
-    def get_histogram(
-        self,
-        process,
-        variable,
-        variation,
-        category,
-        histogram_dict,
-    ):
-        """returns histogram by processes/variable/category"""
-        # get histogram from histogram dictionary
+    def find_histogram(self, variable, histogram_dict):
+        """return the histogram of the histogram dictionary with the variable axis"""
         if variable in histogram_dict:
-            histogram = histogram_dict[variable]
-        else:
-            for key in histogram_dict:
-                if variable in histogram_dict[key].axes.name:
-                    histogram = histogram_dict[key]
-                    break
-        # get variable histogram for nominal variation and category
-        histogram = histogram[{"variation": variation, "category": category}].project(
-            variable
-        )
-        # if axis type is variable divide by bin width
-        if isinstance(self.histogram_config.axes[variable], VariableAxis):
-            histogram = divide_by_binwidth(histogram)
-        return histogram
-
-    def get_variations_keys(self):
-        variations = {}
-        for process, histogram_dict in self.processed_histograms.items():
-            for feature in histogram_dict:
-                helper_histogram = histogram_dict[feature]
-                variations = [
-                    var
-                    for var in helper_histogram.axes["variation"]
-                    if var != "nominal"
-                ]
-                break
-            break
-        variations = list(
-            set([var.replace("Up", "").replace("Down", "") for var in variations])
-        )
-        return variations
-
-    def get_variations(
-        self,
-        process,
-        variable,
-        category,
-        variation,
-        histogram_dict,
-    ):
-        """returns variation histogram by processes/variable/category"""
-        # get histogram from histogram dictionary
-        if variable in histogram_dict:
-            histogram = histogram_dict[variable]
-        else:
-            for key in histogram_dict:
-                if variable in histogram_dict[key].axes.name:
-                    histogram = histogram_dict[key]
-                    break
-
-        # get variable histogram for nominal variation and category
-        histogram_up = histogram[
-            {"variation": f"{variation}Up", "category": category}
-        ].project(variable)
-        histogram_down = histogram[
-            {"variation": f"{variation}Down", "category": category}
-        ].project(variable)
-
-        # if axis type is variable divide by bin width
-        if isinstance(self.histogram_config.axes[variable], VariableAxis):
-            histogram_up = divide_by_binwidth(histogram_up)
-            histogram_down = divide_by_binwidth(histogram_down)
-
-        return histogram_up, histogram_down
+            return histogram_dict[variable]
+        for key in histogram_dict:
+            if variable in histogram_dict[key].axes.name:
+                return histogram_dict[key]
 
     def get_histogram_config(self, variable, category):
-        histogram_info = {"nominal": {}, "variations": {}}
+        """
+        project the histograms of a variable/category once per process: a single
+        (variation, variable) projection gives the nominal histogram and the values of
+        every variation. Returns the nominal MC histograms by process, the Data histogram,
+        the variation names and the MC variation values with shape (process, variation, bin)
+        """
+        histogram_info = {"nominal": {}, "variations": None, "variation_values": []}
+        divide = isinstance(self.histogram_config.axes[variable], VariableAxis)
         for process, histogram_dict in self.processed_histograms.items():
+            histogram = self.find_histogram(variable, histogram_dict)
             if process == "Data":
-                histogram_info["data"] = self.get_histogram(
-                    process=process,
-                    variable=variable,
-                    category=category,
-                    variation="nominal",
-                    histogram_dict=histogram_dict,
+                data_histogram = histogram[
+                    {"variation": "nominal", "category": category}
+                ].project(variable)
+                histogram_info["data"] = (
+                    divide_by_binwidth(data_histogram) if divide else data_histogram
                 )
-            else:
-                # save nominal histogram
-                histogram = self.get_histogram(
-                    process=process,
-                    variable=variable,
-                    category=category,
-                    variation="nominal",
-                    histogram_dict=histogram_dict,
-                )
-                histogram_info["nominal"][process] = histogram
-
-                # save variations histograms
-                for variation in self.get_variations_keys():
-                    up, down = self.get_variations(
-                        process=process,
-                        variable=variable,
-                        category=category,
-                        variation=variation,
-                        histogram_dict=histogram_dict,
-                    )
-                    if f"{variation}Up" in histogram_info["variations"]:
-                        histogram_info["variations"][f"{variation}Up"] += up
-                        histogram_info["variations"][f"{variation}Down"] += up
-                    else:
-                        histogram_info["variations"][f"{variation}Up"] = up
-                        histogram_info["variations"][f"{variation}Down"] = down
-
+                continue
+            projection = histogram[{"category": category}].project("variation", variable)
+            histogram_info["variations"], values = get_variation_values(
+                projection, histogram_info["variations"]
+            )
+            nominal = projection[{"variation": "nominal"}]
+            if divide:
+                values = values / projection.axes[variable].widths
+                nominal = divide_by_binwidth(nominal)
+            histogram_info["nominal"][process] = nominal
+            histogram_info["variation_values"].append(values)
+        histogram_info["variation_values"] = np.stack(histogram_info["variation_values"])
         return histogram_info
 
     def get_colors_and_labels(self, histogram_info):
@@ -175,38 +102,15 @@ class Plotter:
         return labels, colors
 
     def plot_uncert_band(self, histogram_info, ax):
-        # initialize up/down errors with statisticall error
-        mcstat_err2 = self.nominal_variances
-        err2_up = mcstat_err2
-        err2_down = mcstat_err2
-        for variation in self.get_variations_keys():
-            # Up/down variations for a single MC sample
-            var_up = histogram_info["variations"][f"{variation}Up"].values()
-            var_down = histogram_info["variations"][f"{variation}Down"].values()
-            # Compute the uncertainties corresponding to the up/down variations
-            err_up = var_up - self.nominal_values
-            err_down = var_down - self.nominal_values
-            # Compute the flags to check which of the two variations (up and down) are pushing the nominal value up and down
-            up_is_up = err_up > 0
-            down_is_down = err_down < 0
-            # Compute the flag to check if the uncertainty is one-sided, i.e. when both variations are up or down
-            is_onesided = up_is_up ^ down_is_down
-            # Sum in quadrature of the systematic uncertainties taking into account if the uncertainty is one- or double-sided
-            err2_up_twosided = np.where(up_is_up, err_up**2, err_down**2)
-            err2_down_twosided = np.where(up_is_up, err_down**2, err_up**2)
-            err2_max = np.maximum(err2_up_twosided, err2_down_twosided)
-            err2_up_onesided = np.where(is_onesided & up_is_up, err2_max, 0)
-            err2_down_onesided = np.where(is_onesided & down_is_down, err2_max, 0)
-            err2_up_combined = np.where(is_onesided, err2_up_onesided, err2_up_twosided)
-            err2_down_combined = np.where(
-                is_onesided, err2_down_onesided, err2_down_twosided
-            )
-            # Sum in quadrature of the systematic uncertainty corresponding to a MC sample
-            err2_up += err2_up_combined
-            err2_down += err2_down_combined
-
-        self.band_up = self.nominal_values + np.sqrt(err2_up)
-        self.band_down = self.nominal_values - np.sqrt(err2_down)
+        # stat + syst errors, with the variation values summed over MC processes
+        bands = get_bands(
+            nominal=self.nominal_values,
+            variation_values=histogram_info["variation_values"].sum(axis=0),
+            variations=histogram_info["variations"],
+            stat_err2=self.nominal_variances,
+        )
+        self.band_up = self.nominal_values + bands["up"]
+        self.band_down = self.nominal_values - bands["down"]
         # plot stat + syst uncertainty band
         ax.bar(
             x=self.centers,
@@ -258,13 +162,15 @@ class Plotter:
         log_scale: bool = False,
         savefig: bool = True,
         extension: str = "png",
+        histogram_info: dict = None,
     ):
         setup_logger(self.output_dir)
         # set plot params
         hep.style.use(hep.style.CMS)
         plt.rcParams.update(self.style["rcParams"])
-        # get nominal MC histograms
-        histogram_info = self.get_histogram_config(variable, category)
+        # get nominal MC histograms (unless precomputed by 'plot_all')
+        if histogram_info is None:
+            histogram_info = self.get_histogram_config(variable, category)
         nominal_mc_hists = list(histogram_info["nominal"].values())
         mc_histogram = accumulate(nominal_mc_hists)
         self.nominal_values = mc_histogram.values()
@@ -273,8 +179,6 @@ class Plotter:
         self.centers = mc_histogram.axes.centers[0]
         self.widths = mc_histogram.axes.widths[0]
         labels, colors = self.get_colors_and_labels(histogram_info)
-        # get variation histograms
-        variation_histograms = histogram_info["variations"]
         # get Data histogram
         data_histogram = histogram_info["data"]
         self.data_values = data_histogram.values()
@@ -353,3 +257,60 @@ class Plotter:
                 f"{str(output_path)}/{self.processor}_{variable}_{category}_{self.year}.{extension}"
             )
         plt.close()
+
+    def plot_all(self, categories, variables, workers: int = 1, **plot_kwargs):
+        """
+        plot every variable of every category. The projections of all plots are computed
+        first, then the figures are rendered by 'workers' processes (which do not receive
+        the full histograms)
+
+        Parameters:
+        -----------
+            categories:
+                categories to plot
+            variables:
+                variables to plot
+            workers:
+                number of rendering processes
+            plot_kwargs:
+                'plot_histograms' arguments (yratio_limits, log_scale, savefig, extension)
+        """
+        plots = [(variable, category) for category in categories for variable in variables]
+        histogram_infos = [
+            self.get_histogram_config(variable, category) for variable, category in plots
+        ]
+        if workers <= 1:
+            for (variable, category), histogram_info in zip(plots, histogram_infos):
+                logging.info(f"{category}: {variable}")
+                self.plot_histograms(
+                    variable, category, histogram_info=histogram_info, **plot_kwargs
+                )
+            return
+        # renderers do not need the full histograms
+        renderer = copy.copy(self)
+        renderer.processed_histograms = None
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=set_renderer, initargs=(renderer,)
+        ) as pool:
+            futures = [
+                pool.submit(render_plot, variable, category, histogram_info, plot_kwargs)
+                for (variable, category), histogram_info in zip(plots, histogram_infos)
+            ]
+            for (variable, category), future in zip(plots, futures):
+                future.result()
+                logging.info(f"{category}: {variable}")
+
+
+# plotter used by the rendering processes (set once per process)
+_renderer = None
+
+
+def set_renderer(renderer):
+    global _renderer
+    _renderer = renderer
+
+
+def render_plot(variable, category, histogram_info, plot_kwargs):
+    _renderer.plot_histograms(
+        variable, category, histogram_info=histogram_info, **plot_kwargs
+    )
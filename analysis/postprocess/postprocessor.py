@@ -4,11 +4,114 @@ import logging
 import numpy as np
 import pandas as pd
 from pathlib import Path
-from coffea.util import load
+from coffea.util import load, save
+from collections import deque
 from coffea.processor import accumulate
+from concurrent.futures import ProcessPoolExecutor
 from analysis.configs import ProcessorConfigBuilder
+from analysis.postprocess.merge_cache import MergeCache
+from analysis.postprocess.bands import get_bands, get_variation_array
 from analysis.postprocess.utils import print_header, df_to_latex
 
+# file with the processed (scaled and grouped by process) results, read by the plot-only mode.
+# It is saved in a subdirectory, so it is not read back as a sample output by 'group_outputs'
+PROCESSED_FILE = "processed/processed.coffea"
+
+
+def load_processed(output_dir: str) -> dict:
+    """
+    load the processed results saved by the Postprocessor: lumi-scaled histograms grouped
+    by process, cutflow and results tables by category, categories and luminosity
+
+    Parameters:
+    -----------
+        output_dir:
+            postprocessing output directory
+    """
+    processed_file = Path(f"{output_dir}/{PROCESSED_FILE}")
+    if not processed_file.exists():
+        raise FileNotFoundError(
+            f"{processed_file} not found, run the postprocessing without '--plot_only' first"
+        )
+    return load(str(processed_file))
+
+
+def load_and_merge(output_files):
+    """
+    load a list of output files and merge them one at a time, so at most two outputs
+    are held in memory. Returns {"histograms": ..., "metadata": ...} (None if all outputs are empty)
+    """
+    merged = None
+    for output_file in output_files:
+        output = load(output_file)
+        if not output:
+            continue
+        metadata = dict(output["metadata"])
+        # count the outputs with the 'genEventSumw' of the 'Runs' tree, so samples where
+        # only some outputs have it are detected (see 'Postprocessor.set_lumixsec_weights')
+        metadata["noutputs"] = 1
+        metadata["noutputs_gen_event_sumw"] = int("genEventSumw" in metadata)
+        output = {"histograms": output["histograms"], "metadata": metadata}
+        # the first output is the accumulator, the next ones are added in place
+        merged = output if merged is None else accumulate([output], merged)
+    return merged
+
+
+def split_batches(items, nbatches):
+    """split a list into (at most) 'nbatches' contiguous batches of similar size"""
+    nbatches = max(min(nbatches, len(items)), 1)
+    bounds = [round(i * len(items) / nbatches) for i in range(nbatches + 1)]
+    return [items[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def reduce_outputs(grouped_outputs, workers=1):
+    """
+    load and accumulate the outputs of each sample in a tree reduction: each worker
+    merges a contiguous batch of files one at a time, and the batch results are merged
+    in file order as they are collected. At most 2 x 'workers' batch results are pending,
+    so the peak memory scales with the number of workers rather than the number of files.
+    The merge order is fixed, so results do not depend on the worker scheduling
+
+    Parameters:
+    -----------
+        grouped_outputs:
+            output files of each sample {sample: [output files]}
+        workers:
+            number of worker processes. With 1 worker, outputs are merged in this process
+    """
+    merged = {sample: None for sample in grouped_outputs}
+    if workers <= 1:
+        for sample, output_files in grouped_outputs.items():
+            logging.info(f"{sample}...")
+            merged[sample] = load_and_merge(output_files)
+        return merged
+
+    tasks, remaining = [], {}
+    for sample, output_files in grouped_outputs.items():
+        batches = split_batches(output_files, workers)
+        remaining[sample] = len(batches)
+        tasks.extend((sample, batch) for batch in batches)
+
+    def collect(sample, future):
+        result = future.result()
+        if result is not None:
+            merged[sample] = (
+                result if merged[sample] is None else accumulate([result], merged[sample])
+            )
+        remaining[sample] -= 1
+        if remaining[sample] == 0:
+            logging.info(f"{sample}...")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for sample, batch in tasks:
+            pending.append((sample, pool.submit(load_and_merge, batch)))
+            if len(pending) >= 2 * workers:
+                collect(*pending.popleft())
+        while pending:
+            collect(*pending.popleft())
+    return merged
+
 
 class Postprocessor:
     def __init__(
@@ -16,10 +119,17 @@ class Postprocessor:
         processor: str,
         year: str,
         output_dir: str,
+        workers: int = 1,
+        use_cache: bool = True,
+        rebuild: bool = False,
     ):
         self.processor = processor
         self.year = year
         self.output_dir = output_dir
+        self.workers = workers
+        # merged outputs cache (only new or changed outputs are read again)
+        self.use_cache = use_cache
+        self.rebuild = rebuild
 
         # get datasets configs
         main_dir = Path.cwd()
@@ -49,6 +159,7 @@ class Postprocessor:
         )
 
         print_header(f"Cutflow")
+        self.cutflow_tables = {}
         for category in self.categories:
             output_path = Path(f"{self.output_dir}/{category}")
             if not output_path.exists():
@@ -73,8 +184,10 @@ class Postprocessor:
                 f'{self.cutflow_df.applymap(lambda x: f"{x:.3f}" if pd.notnull(x) else "")}\n'
             )
             self.cutflow_df.to_csv(f"{output_path}/cutflow_{category}.csv")
+            self.cutflow_tables[category] = self.cutflow_df
 
         print_header(f"Results")
+        self.results_tables = {}
         for category in self.categories:
             output_path = Path(f"{self.output_dir}/{category}")
             logging.info(f"category: {category}")
@@ -87,14 +200,34 @@ class Postprocessor:
             latex_table = df_to_latex(results_df)
             with open(f"{output_path}/results_latex_{category}.txt", "w") as f:
                 f.write(latex_table)
+            self.results_tables[category] = results_df
+
+        self.save_processed()
+
+    def save_processed(self):
+        """save the processed histograms, cutflow and results tables to a single file"""
+        processed = {
+            "histograms": self.histograms,
+            "cutflow": self.cutflow_tables,
+            "results": self.results_tables,
+            "categories": list(self.categories),
+            "lumi": self.luminosities[self.year],
+        }
+        processed_file = Path(f"{self.output_dir}/{PROCESSED_FILE}")
+        processed_file.parent.mkdir(parents=True, exist_ok=True)
+        save(processed, str(processed_file))
+        logging.info(f"processed results saved to {self.output_dir}/{PROCESSED_FILE}")
 
     def group_outputs(self):
         """
-        group and accumulate output files by sample
+        group and accumulate output files by sample. Outputs are loaded and merged by
+        'self.workers' processes (see 'reduce_outputs'). With 'use_cache', the merged
+        outputs of each sample are cached, and only new or changed outputs are loaded
         """
         logging.info(f"reading outputs from {self.output_dir}")
         extension = ".coffea"
-        output_files = glob.glob(f"{self.output_dir}/*{extension}", recursive=True)
+        # sorted, so outputs are always merged in the same order
+        output_files = sorted(glob.glob(f"{self.output_dir}/*{extension}", recursive=True))
         n_output_files = len(output_files)
         assert n_output_files != 0, "No output files found"
 
@@ -111,42 +244,33 @@ class Postprocessor:
                 grouped_outputs[sample_name] = [output_file]
 
         logging.info(f"{n_output_files} output files were found:")
-        n_grouped_outputs = {}
 
         # open output dictionaries with layout:
         #      {<sample>_<i-th>: {"histograms": {"pt": Hist(...), ...}, "metadata": {"sumw": x, ...}}})
         # group and accumulate histograms and metadata by <sample>
+        print_header("Reading and accumulating outputs by sample")
+        if self.use_cache:
+            merge_cache = MergeCache(f"{self.output_dir}/merge_cache")
+            to_load, bases, states = merge_cache.plan(grouped_outputs, self.rebuild)
+        else:
+            to_load, bases = grouped_outputs, {sample: None for sample in grouped_outputs}
+        loaded = reduce_outputs(
+            {sample: files for sample, files in to_load.items() if files}, self.workers
+        )
+        # merge the new outputs into the cached ones
+        merged = {
+            sample: accumulate([loaded.get(sample)], bases[sample])
+            for sample in grouped_outputs
+        }
+        if self.use_cache:
+            merge_cache.update(
+                merged, states, [sample for sample in grouped_outputs if to_load[sample]]
+            )
         self.metadata = {}
         self.histograms = {}
-        grouped_metadata = {}
-        grouped_histograms = {}
-        print_header("Reading and accumulating outputs by sample")
         for sample in grouped_outputs:
-            logging.info(f"{sample}...")
-            grouped_histograms[sample] = []
-            grouped_metadata[sample] = {}
-            for fname in grouped_outputs[sample]:
-                output = load(fname)
-                if output:
-                    # group histograms by sample
-                    grouped_histograms[sample].append(output["histograms"])
-                    # group metadata by sample
-                    for meta_key in output["metadata"]:
-                        if meta_key in grouped_metadata[sample]:
-                            grouped_metadata[sample][meta_key].append(
-                                output["metadata"][meta_key]
-                            )
-                        else:
-                            grouped_metadata[sample][meta_key] = [
-                                output["metadata"][meta_key]
-                            ]
-            # accumulate histograms and metadata by sample
-            self.histograms[sample] = accumulate(grouped_histograms[sample])
-            self.metadata[sample] = {}
-            for meta_key in grouped_metadata[sample]:
-                self.metadata[sample][meta_key] = accumulate(
-                    grouped_metadata[sample][meta_key]
-                )
+            self.histograms[sample] = merged[sample]["histograms"] if merged[sample] else None
+            self.metadata[sample] = merged[sample]["metadata"] if merged[sample] else {}
 
     def set_lumixsec_weights(self):
         """compute luminosity and xsec-lumi weights"""
@@ -165,8 +289,18 @@ class Postprocessor:
         for sample, metadata in self.metadata.items():
             self.weights[sample] = 1
             self.xsecs[sample] = self.dataset_config[sample]["xsec"]
-            self.sumw[sample] = self.metadata[sample]["sumw"]
+            self.sumw[sample] = metadata["sumw"]
             if self.dataset_config[sample]["is_mc"]:
+                # sum of generator weights from the 'Runs' tree, if every output of the sample has it
+                noutputs_gen_event_sumw = metadata.get("noutputs_gen_event_sumw", 0)
+                if 0 < noutputs_gen_event_sumw < metadata["noutputs"]:
+                    raise ValueError(
+                        f"only {noutputs_gen_event_sumw} of the {metadata['noutputs']} outputs of "
+                        f"'{sample}' have the 'genEventSumw' of the 'Runs' tree. Index the files "
+                        "of the sample (scan_files.py) and re-run its jobs, so all or none of them have it"
+                    )
+                if noutputs_gen_event_sumw:
+                    self.sumw[sample] = metadata["genEventSumw"]
                 self.weights[sample] = (
                     self.luminosities[self.year] * self.xsecs[sample]
                 ) / self.sumw[sample]
@@ -192,16 +326,27 @@ class Postprocessor:
                 )
 
     def scale_cutflow(self):
-        """scale cutflow to lumi-xsec"""
+        """
+        scale cutflow to lumi-xsec. The preselection steps, computed before the skim with
+        the generator weights only, come first and are labelled '<cut> (gen weights)'
+        """
         self.scaled_cutflow = {}
         for category in self.categories:
             self.scaled_cutflow[category] = {}
             for sample, variables in self.histograms.items():
                 self.scaled_cutflow[category][sample] = {}
                 if category in self.metadata[sample]:
-                    for cut, nevents in self.metadata[sample][category][
-                        "cutflow"
-                    ].items():
+                    category_metadata = self.metadata[sample][category]
+                    cutflow = {
+                        f"{cut} (gen weights)": nevents
+                        for cut, nevents in category_metadata.get(
+                            "preselection_cutflow", {}
+                        ).items()
+                        # the last preselection cut is also in the full-weight cutflow
+                        if cut not in category_metadata["cutflow"]
+                    }
+                    cutflow.update(category_metadata["cutflow"])
+                    for cut, nevents in cutflow.items():
                         self.scaled_cutflow[category][sample][cut] = (
                             nevents * self.weights[sample]
                         )
@@ -277,111 +422,35 @@ class Postprocessor:
         ]
         results_df = results_df.sort_values(by="percentage", ascending=False)
 
-        # compute systematic uncertainty
-        nominal, syst = {}, {}
-        for process, hist_dict in self.histograms.items():
-            if process == "Data":
-                continue
-            syst[process] = {}
-            # get some helper histogram to extract nominal and variations values
-            for histo_key, histo in hist_dict.items():
-                axis_names = [
+        # compute systematic uncertainty from some helper histogram of each MC process
+        mc_processes = [process for process in self.histograms if process != "Data"]
+        helper_histograms = []
+        for process in mc_processes:
+            for histo in self.histograms[process].values():
+                helper_axis = [
                     axis
                     for axis in histo.axes.name
                     if axis not in ["variation", "category"]
-                ]
-                helper_histo_key = histo_key
-                helper_axis = axis_names[0]
+                ][0]
+                helper_histograms.append(histo)
                 break
-            # get nominal values by process
-            nominal[process] = (
-                self.histograms[process][helper_histo_key][
-                    {"variation": "nominal", "category": category}
-                ]
-                .project(helper_axis)
-                .values()
-            )
-            # get variations values by process
-            variations_keys = []
-            for variation in self.histograms[process][helper_histo_key].axes[
-                "variation"
-            ]:
-                if variation == "nominal":
-                    continue
-                # get variation key
-                variation_key = variation.replace("Up", "").replace("Down", "")
-                if variation_key not in variations_keys:
-                    variations_keys.append(variation_key)
-                # get variation hist
-                variation_hist = self.histograms[process][helper_histo_key][
-                    {"variation": variation, "category": category}
-                ].project(helper_axis)
-                if variation in syst:
-                    syst[process][variation].append(variation_hist)
-                else:
-                    syst[process][variation] = [variation_hist]
-        # accumulate variations
-        syst_variations = {}
-        for process in syst:
-            syst_variations[process] = {}
-            for variation in syst[process]:
-                syst_variations[process][variation] = accumulate(
-                    syst[process][variation]
-                )
-        # compute up/down variations
-        bin_error_up, bin_error_down = {}, {}
-        band_up, band_down = {}, {}
-        for process in syst_variations:
-            bin_error_up[process] = 0
-            bin_error_down[process] = 0
-            for variation in variations_keys:
-                # Up/down variations for a single MC sample
-                var_up = syst_variations[process][f"{variation}Up"].values()
-                var_down = syst_variations[process][f"{variation}Down"].values()
-                # Compute the uncertainties corresponding to the up/down variations
-                err_up = var_up - nominal[process]
-                err_down = var_down - nominal[process]
-                # Compute the flags to check which of the two variations (up and down) are pushing the nominal value up and down
-                up_is_up = err_up > 0
-                down_is_down = err_down < 0
-                # Compute the flag to check if the uncertainty is one-sided, i.e. when both variations are up or down
-                is_onesided = up_is_up ^ down_is_down
-                # Sum in quadrature of the systematic uncertainties taking into account if the uncertainty is one- or double-sided
-                err2_up_twosided = np.where(up_is_up, err_up**2, err_down**2)
-                err2_down_twosided = np.where(up_is_up, err_down**2, err_up**2)
-                err2_max = np.maximum(err2_up_twosided, err2_down_twosided)
-                err2_up_onesided = np.where(is_onesided & up_is_up, err2_max, 0)
-                err2_down_onesided = np.where(is_onesided & down_is_down, err2_max, 0)
-                err2_up_combined = np.where(
-                    is_onesided, err2_up_onesided, err2_up_twosided
-                )
-                err2_down_combined = np.where(
-                    is_onesided, err2_down_onesided, err2_down_twosided
-                )
-                # Sum in quadrature of the systematic uncertainty corresponding to a MC sample
-                err2_up = err2_up_combined
-                err2_down = err2_down_combined
-
-            band_up[process] = np.sum(np.sqrt(err2_up))
-            band_down[process] = np.sum(np.sqrt(err2_down))
-
-        # add sys uncertainties to results table
-        results_df.loc["Total Background", "syst unc up"] = 0
-        results_df.loc["Total Background", "syst unc down"] = 0
-        for process in syst_variations:
-            error_up = band_up[process]
-            error_down = band_down[process]
-            results_df.loc[process, "syst unc up"] = error_up
-            results_df.loc[process, "syst unc down"] = error_down
-            results_df.loc["Total Background", "syst unc up"] += error_up**2
-            results_df.loc["Total Background", "syst unc down"] += error_down**2
-
-        results_df.loc["Total Background", "syst unc up"] = np.sqrt(
-            results_df.loc["Total Background", "syst unc up"]
+        variations, variation_values = get_variation_array(
+            helper_histograms, helper_axis, category
         )
-        results_df.loc["Total Background", "syst unc down"] = np.sqrt(
-            results_df.loc["Total Background", "syst unc down"]
+        nominal = variation_values[:, variations.index("nominal")]
+        # integrated up/down errors by process and for the total background
+        process_bands = get_bands(nominal, variation_values, variations)
+        total_bands = get_bands(
+            nominal.sum(axis=0), variation_values.sum(axis=0), variations
         )
+        # add sys uncertainties to results table
+        for i, process in enumerate(mc_processes):
+            results_df.loc[process, "syst unc up"] = process_bands["integrated_up"][i]
+            results_df.loc[process, "syst unc down"] = process_bands["integrated_down"][i]
+        results_df.loc["Total Background", "syst unc up"] = total_bands["integrated_up"]
+        results_df.loc["Total Background", "syst unc down"] = total_bands[
+            "integrated_down"
+        ]
 
         results_df = results_df.loc[
             :, ["events", "percentage", "stat unc", "syst unc up", "syst unc down"]
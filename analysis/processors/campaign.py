@@ -0,0 +1,38 @@
+import resource
+from coffea import processor
+
+
+class CampaignProcessor(processor.ProcessorABC):
+    """
+    Wrap a processor to run several datasets in a single job. The output of each chunk
+    is stored under its dataset name, so chunks of every dataset can share one work
+    queue while their outputs are accumulated separately
+
+    Parameters:
+    -----------
+        processor_instance:
+            processor run on each chunk
+    """
+
+    def __init__(self, processor_instance):
+        self.processor_instance = processor_instance
+
+    def process(self, events):
+        return {events.metadata["dataset"]: self.processor_instance.process(events)}
+
+    def postprocess(self, accumulator):
+        return accumulator
+
+
+def set_memory_limit(memory_limit: float) -> None:
+    """
+    limit the address space of the current (worker) process. Allocations beyond the
+    limit raise a MemoryError in the worker instead of exhausting the node memory
+
+    Parameters:
+    -----------
+        memory_limit:
+            memory limit in GB
+    """
+    limit = int(memory_limit * 1024**3)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import tempfile
+from pathlib import Path
+from coffea import processor
+from coffea.util import load, save
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+ANALYSIS_PATH = Path(__file__).parent.parent
+# files that do not change the processor outputs (file lists, indexes and generated caches)
+CODE_VERSION_EXCLUDE = ["__pycache__", "filesets", "jer_cache"]
+CODE_VERSION_EXCLUDE_SUFFIXES = [".md", ".npz", ".db"]
+
+
+def get_code_version(path: Path = ANALYSIS_PATH) -> str:
+    """
+    hash of the analysis code and data: content of every file of 'path', except file lists,
+    indexes and generated caches
+
+    Parameters:
+    -----------
+        path:
+            analysis directory
+    """
+    sha256 = hashlib.sha256()
+    for file in sorted(Path(path).rglob("*")):
+        relative_path = file.relative_to(path)
+        if (
+            not file.is_file()
+            or any(part in CODE_VERSION_EXCLUDE for part in relative_path.parts)
+            or file.suffix in CODE_VERSION_EXCLUDE_SUFFIXES
+        ):
+            continue
+        sha256.update(str(relative_path).encode())
+        sha256.update(file.read_bytes())
+    return sha256.hexdigest()
+
+
+def get_config_hash(processor_config, options: Optional[Dict[str, Any]] = None) -> str:
+    """
+    hash of a processor config (from 'ProcessorConfig.to_dict') and of the processor options
+    not included in it (year, flow, systematics, ...)
+
+    Parameters:
+    -----------
+        processor_config:
+            ProcessorConfig object
+        options:
+            processor options
+    """
+    config = {"config": processor_config.to_dict(), "options": options or {}}
+    return hashlib.sha256(
+        json.dumps(config, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def get_chunk_key(
+    dataset: str, fileuuid: str, entrystart: int, entrystop: int, version: str
+) -> str:
+    """
+    cache key of a chunk
+
+    Parameters:
+    -----------
+        dataset:
+            dataset name of the chunk
+        fileuuid:
+            UUID (hex) of the chunk file
+        entrystart, entrystop:
+            entry range of the chunk
+        version:
+            config and code version of the processor (see 'ChunkCache.get_version')
+    """
+    key = f"{dataset}:{fileuuid}:{entrystart}:{entrystop}:{version}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class ChunkCache:
+    """
+    On-disk cache of processor outputs by chunk. Each chunk output is stored under a key
+    built from its dataset, file UUID, entry range, processor config hash and analysis code
+    version, so re-runs only process the chunks whose key changed. Cache hits update the
+    file modification time, used to evict the least recently used outputs
+
+    Parameters:
+    -----------
+        cache_dir:
+            cache directory (created if it does not exist)
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.stats_dir = self.cache_dir / "stats"
+
+    @staticmethod
+    def get_version(
+        processor_config,
+        options: Optional[Dict[str, Any]] = None,
+        code_version: Optional[str] = None,
+    ) -> str:
+        """
+        config and code version of a processor
+
+        Parameters:
+        -----------
+            processor_config:
+                ProcessorConfig object
+            options:
+                processor options
+            code_version:
+                hash of the analysis code (see 'get_code_version'). Condor jobs get it from
+                their submission, so the analysis directory is not hashed by every job.
+                Computed if not provided
+        """
+        if code_version is None:
+            code_version = get_code_version()
+        return f"{get_config_hash(processor_config, options)}:{code_version}"
+
+    def get_path(self, key: str) -> Path:
+        """path of the output of a chunk"""
+        return self.cache_dir / key[:2] / f"{key}.coffea"
+
+    def get_item_key(self, item, version: str) -> str:
+        """cache key of a coffea WorkItem"""
+        return get_chunk_key(
+            item.dataset,
+            uuid.UUID(bytes=item.fileuuid).hex,
+            item.entrystart,
+            item.entrystop,
+            version,
+        )
+
+    def get_events_key(self, metadata: Dict[str, Any], version: str) -> str:
+        """cache key of a chunk from its events metadata"""
+        return get_chunk_key(
+            metadata["dataset"],
+            uuid.UUID(metadata["fileuuid"]).hex,
+            metadata["entrystart"],
+            metadata["entrystop"],
+            version,
+        )
+
+    def load(self, key: str) -> Optional[Any]:
+        """return the output of a chunk, or None if it is not cached"""
+        path = self.get_path(key)
+        try:
+            output = load(str(path))
+        except (FileNotFoundError, EOFError):
+            return None
+        os.utime(path)
+        return output
+
+    def store(self, key: str, output: Any) -> None:
+        """store the output of a chunk (written atomically)"""
+        path = self.get_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        os.close(fd)
+        save(output, tmp_path)
+        os.replace(tmp_path, path)
+
+    def split(self, work_items: Iterable, version: str) -> Tuple[List, List[Any]]:
+        """
+        split work items into the items to be processed and the cached outputs
+
+        Parameters:
+        -----------
+            work_items:
+                coffea WorkItems
+            version:
+                config and code version of the processor (see 'get_version')
+        """
+        to_process, cached_outputs = [], []
+        for item in work_items:
+            output = self.load(self.get_item_key(item, version))
+            if output is None:
+                to_process.append(item)
+            else:
+                cached_outputs.append((item.dataset, output))
+        return to_process, cached_outputs
+
+    def record_stats(self, hits: int, misses: int) -> None:
+        """save the cache hits and misses of a run (one file per run, so jobs never share a file)"""
+        self.stats_dir.mkdir(parents=True, exist_ok=True)
+        stats_file = self.stats_dir / f"{time.time_ns()}_{os.getpid()}.json"
+        with open(stats_file, "w") as f:
+            json.dump({"time": time.time(), "hits": hits, "misses": misses}, f)
+
+    def get_entries(self) -> List[Path]:
+        """return the cached chunk outputs"""
+        return [
+            path for path in self.cache_dir.glob("*/*.coffea") if path.parent != self.stats_dir
+        ]
+
+    def get_stats(self, since: Optional[float] = None) -> Dict[str, float]:
+        """
+        return the number and size of the cached outputs, and the hits and misses recorded
+        by the runs
+
+        Parameters:
+        -----------
+            since:
+                only count the runs after this time (seconds since epoch)
+        """
+        entries = self.get_entries()
+        stats = {
+            "entries": len(entries),
+            "size": sum(path.stat().st_size for path in entries),
+            "runs": 0,
+            "hits": 0,
+            "misses": 0,
+        }
+        for stats_file in self.stats_dir.glob("*.json"):
+            with open(stats_file, "r") as f:
+                run = json.load(f)
+            if since is not None and run["time"] < since:
+                continue
+            stats["runs"] += 1
+            stats["hits"] += run["hits"]
+            stats["misses"] += run["misses"]
+        nchunks = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / nchunks if nchunks else 0.0
+        return stats
+
+    def evict(
+        self, max_age: Optional[float] = None, max_size: Optional[float] = None
+    ) -> Dict[str, int]:
+        """
+        remove outputs not used for more than 'max_age' seconds, then the least recently
+        used outputs until the cache size is below 'max_size' bytes. Returns the number and
+        size of the removed outputs
+
+        Parameters:
+        -----------
+            max_age:
+                maximum time (in seconds) since the last use of an output
+            max_size:
+                maximum cache size (in bytes)
+        """
+        entries = sorted(
+            ((path, path.stat()) for path in self.get_entries()),
+            key=lambda entry: entry[1].st_mtime,
+        )
+        size = sum(stat.st_size for _, stat in entries)
+        removed = {"entries": 0, "size": 0}
+        now = time.time()
+        for path, stat in entries:
+            too_old = max_age is not None and now - stat.st_mtime > max_age
+            too_large = max_size is not None and size > max_size
+            if not (too_old or too_large):
+                continue
+            path.unlink()
+            size -= stat.st_size
+            removed["entries"] += 1
+            removed["size"] += stat.st_size
+        return removed
+
+
+class CachedProcessor(processor.ProcessorABC):
+    """
+    Wrap a processor to store the output of each chunk in a ChunkCache
+
+    Parameters:
+    -----------
+        processor_instance:
+            processor run on each chunk
+        cache_dir:
+            cache directory
+        version:
+            config and code version of the processor (see 'ChunkCache.get_version')
+    """
+
+    def __init__(self, processor_instance, cache_dir, version: str):
+        self.processor_instance = processor_instance
+        self.cache_dir = str(cache_dir)
+        self.version = version
+
+    def process(self, events):
+        output = self.processor_instance.process(events)
+        cache = ChunkCache(self.cache_dir)
+        cache.store(cache.get_events_key(events.metadata, self.version), output)
+        return output
+
+    def postprocess(self, accumulator):
+        return accumulator
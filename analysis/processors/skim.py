@@ -0,0 +1,274 @@
+import os
+import json
+import uuid
+import tempfile
+import numpy as np
+import awkward as ak
+import pyarrow.parquet as pq
+from pathlib import Path
+from typing import Any, Dict, List
+from coffea.nanoevents.methods import candidate
+from analysis.configs import ProcessorConfigBuilder
+from analysis.configs.expressions import ExpressionNamespace
+from analysis.histograms import HistBuilder, fill_histograms
+
+# kinematic quantities stored for each selected object (and its sub-records, e.g. dimuons.p4)
+SKIM_OBJECT_FIELDS = ["pt", "eta", "phi", "mass", "charge"]
+# names that expressions evaluated on the skims can read
+SKIM_NAMES = {"objects", "np", "ak"}
+# skim files written by the last run of each dataset (<skim_dir>/<dataset>/manifest.json)
+SKIM_MANIFEST = "manifest.json"
+
+
+def get_object_columns(array, depth: int = 1):
+    """
+    return the kinematic columns of a selected object: a record with its (behavior
+    computed) pt, eta, phi, mass and charge. Composite objects without their own mass
+    (e.g. dimuons) also keep the kinematics of their sub-records (mu1, mu2, p4) up to
+    'depth' levels. Arrays without fields (e.g. 'max_dijet_mass') are stored as they are
+    """
+    fields = ak.fields(array)
+    if not fields:
+        return array
+    columns = {}
+    for field in SKIM_OBJECT_FIELDS:
+        try:
+            columns[field] = getattr(array, field)
+        except AttributeError:
+            continue
+    if depth > 0 and "mass" not in columns:
+        for field in fields:
+            if field not in columns and ak.fields(array[field]):
+                columns[field] = get_object_columns(array[field], depth - 1)
+    return ak.zip(columns, depth_limit=1)
+
+
+def restore_object(array):
+    """rebuild the candidate behavior of a skimmed object (so e.g. 'dimuons.p4.mass' works)"""
+    fields = ak.fields(array)
+    if not fields:
+        return array
+    columns = {
+        field: restore_object(array[field]) if ak.fields(array[field]) else array[field]
+        for field in fields
+    }
+    if {"pt", "eta", "phi", "mass"} <= set(fields):
+        return ak.zip(
+            columns,
+            depth_limit=1,
+            with_name="PtEtaPhiMCandidate",
+            behavior=candidate.behavior,
+        )
+    return ak.zip(columns, depth_limit=1)
+
+
+def get_skim_path(skim_dir: str, metadata: Dict[str, Any], category: str, shift_name: str) -> Path:
+    """path of the skim of a chunk: <skim_dir>/<dataset>/<category>/<shift>/<file uuid>_<start>_<stop>.parquet"""
+    chunk = (
+        f"{uuid.UUID(metadata['fileuuid']).hex}"
+        f"_{metadata['entrystart']}_{metadata['entrystop']}.parquet"
+    )
+    return Path(skim_dir) / metadata["dataset"] / category / shift_name / chunk
+
+
+def write_skim(
+    path: Path,
+    variables_map: Dict[str, Any],
+    weights: Dict[str, Any],
+    objects: Dict[str, Any],
+) -> None:
+    """
+    write the selected events of a category to Parquet (written atomically)
+
+    Parameters:
+    -----------
+        path:
+            skim path (see 'get_skim_path')
+        variables_map:
+            histogram variables of the selected events {variable: column}
+        weights:
+            event weights of each variation {variation: weights}
+        objects:
+            selected objects of the selected events {object name: array}
+    """
+    skim = ak.zip(
+        {
+            "variables": ak.zip(variables_map, depth_limit=1),
+            "weights": ak.zip(
+                {variation: np.asarray(weight) for variation, weight in weights.items()},
+                depth_limit=1,
+            ),
+            "objects": ak.zip(
+                {name: get_object_columns(array) for name, array in objects.items()},
+                depth_limit=1,
+            ),
+        },
+        depth_limit=1,
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    os.close(fd)
+    ak.to_parquet(skim, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def get_skim_variations(path: Path) -> List[str]:
+    """return the weight variations of a skim, read from its Parquet schema"""
+    weights = pq.read_schema(str(path)).field("weights").type
+    return [weights.field(i).name for i in range(weights.num_fields)]
+
+
+def write_expressions(skim_dir: str, dataset: str, histogram_config) -> None:
+    """
+    save the source of the histogram expressions used to compute the skimmed variables.
+    The file is only written if it is missing or its expressions changed
+    """
+    path = Path(skim_dir) / dataset / "expressions.json"
+    expressions = {
+        name: axis.expression.source for name, axis in histogram_config.axes.items()
+    }
+    try:
+        with open(path, "r") as f:
+            if json.load(f) == expressions:
+                return
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(expressions, f)
+    os.replace(tmp_path, path)
+
+
+def write_skim_manifest(
+    skim_dir: str, dataset: str, skim_files: Dict[str, List[str]]
+) -> None:
+    """
+    save the skim files written by a run of a dataset, so the histograms are only rebuilt
+    from them and not from the stale skims of previous runs (written atomically)
+
+    Parameters:
+    -----------
+        skim_dir:
+            skim directory
+        dataset:
+            dataset (key) of the skims
+        skim_files:
+            skim files of each category, relative to the category directory {category: [paths]}
+    """
+    path = Path(skim_dir) / dataset / SKIM_MANIFEST
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(
+            {category: sorted(paths) for category, paths in skim_files.items()}, f
+        )
+    os.replace(tmp_path, path)
+
+
+class SkimProcessor:
+    """
+    Rebuild the HistBuilder histograms of a processor from its skims, without reading
+    NanoAOD. Stored variables are reused when their expression did not change; new or
+    modified variables reading only 'objects' are evaluated on the skimmed objects, so
+    binning and object-level variables can be changed freely
+
+    Parameters:
+    -----------
+        processor:
+            processor name {ztojets}
+        year:
+            year of the data {2016preVFP, 2016postVFP, 2017, 2018}
+        flow:
+            whether to include underflow/overflow to first/last bin
+    """
+
+    def __init__(self, processor: str = "ztojets", year: str = "2017", flow: bool = True):
+        self.year = year
+        self.flow = flow
+        config_builder = ProcessorConfigBuilder(processor=processor, year=year)
+        self.processor_config = config_builder.build_processor_config()
+        self.histogram_config = self.processor_config.histogram_config
+
+    def get_skim_files(self, dataset_dir: Path) -> Dict[str, List[Path]]:
+        """
+        return the skim files of each category {category: [paths]}, as listed in the
+        manifest of the last run of the dataset
+        """
+        manifest = dataset_dir / SKIM_MANIFEST
+        if not manifest.exists():
+            raise FileNotFoundError(
+                f"{manifest} not found: the skims of {dataset_dir} have no manifest of the "
+                "files written by their run. Re-run the jobs of the dataset with '--skim_dir'"
+            )
+        with open(manifest, "r") as f:
+            skim_files = json.load(f)
+        return {
+            category: [dataset_dir / category / path for path in skim_files.get(category, [])]
+            for category in self.processor_config.event_selection["categories"]
+        }
+
+    def get_variables_map(self, skim, stored_expressions: Dict[str, str]) -> Dict[str, Any]:
+        """return the histogram variables of a skim, evaluating the new or modified ones"""
+        namespace = None
+        variables_map = {}
+        for variable, axis in self.histogram_config.axes.items():
+            if stored_expressions.get(variable) == axis.expression.source:
+                variables_map[variable] = skim["variables", variable]
+                continue
+            if not axis.expression.names <= SKIM_NAMES:
+                raise KeyError(
+                    f"variable '{variable}' ({axis.expression.source}) is not in the skims "
+                    "and reads more than the skimmed objects"
+                )
+            if namespace is None:
+                objects = {
+                    name: restore_object(skim["objects", name])
+                    for name in ak.fields(skim["objects"])
+                }
+                namespace = ExpressionNamespace(objects=objects, np=np, ak=ak)
+            variables_map[variable] = axis.expression.evaluate(namespace)
+        return variables_map
+
+    def process(self, dataset_dir) -> Dict[str, Any]:
+        """
+        return the histograms of a dataset, filled from its skims
+
+        Parameters:
+        -----------
+            dataset_dir:
+                skim directory of the dataset (<skim_dir>/<dataset>)
+        """
+        dataset_dir = Path(dataset_dir)
+        with open(dataset_dir / "expressions.json", "r") as f:
+            stored_expressions = json.load(f)
+        skim_files = self.get_skim_files(dataset_dir)
+        # fixed variation axis with every variation found in the skims (read from the
+        # Parquet schemas, so no skim is loaded)
+        variations = ["nominal"]
+        for paths in skim_files.values():
+            for path in paths:
+                variations += [
+                    variation
+                    for variation in get_skim_variations(path)
+                    if variation not in variations
+                ]
+        histograms = HistBuilder(self.processor_config, variations).build_histogram()
+        # skims are loaded and filled one at a time
+        for category, paths in skim_files.items():
+            for path in paths:
+                skim = ak.from_parquet(str(path))
+                if len(skim) == 0:
+                    continue
+                fill_histograms(
+                    histograms=histograms,
+                    histogram_config=self.histogram_config,
+                    variables_map=self.get_variables_map(skim, stored_expressions),
+                    weights={
+                        variation: skim["weights", variation]
+                        for variation in ak.fields(skim["weights"])
+                    },
+                    category=category,
+                    flow=self.flow,
+                )
+        return histograms
@@ -1,9 +1,10 @@
-import copy
+import numpy as np
 import awkward as ak
 from coffea import processor
 from coffea.analysis_tools import PackedSelection, Weights
 from analysis.configs import ProcessorConfigBuilder
-from analysis.histograms import HistBuilder, fill_histogram
+from analysis.configs.expressions import ExpressionNamespace, get_event_fields
+from analysis.histograms import HistBuilder, ColumnCache, fill_histograms
 from analysis.selections import (
     ObjectSelector,
     get_lumi_mask,
@@ -13,6 +14,7 @@ from analysis.selections import (
     get_stitching_mask,
     get_hemcleaning_mask,
 )
+from analysis.selections.object_selections import delta_r_mask
 from analysis.corrections import (
     TauCorrector,
     BTagCorrector,
@@ -27,7 +29,45 @@ from analysis.corrections import (
     apply_met_phi_corrections,
     apply_rochester_corrections,
     apply_tau_energy_scale_corrections,
+    propagate_object_corrections_to_met,
+    warm_correction_sets,
+    get_weight_variations,
+    JET_MET_SHIFTS,
 )
+from analysis.corrections.jetvetomaps import jetvetomaps_mask
+from analysis.processors.skim import get_skim_path, write_skim, write_expressions
+
+
+# functions that config expressions can call
+NAMESPACE_FUNCTIONS = {
+    "delta_r_mask": delta_r_mask,
+    "jetvetomaps_mask": jetvetomaps_mask,
+    "get_lumi_mask": get_lumi_mask,
+    "get_trigger_mask": get_trigger_mask,
+    "get_trigger_match_mask": get_trigger_match_mask,
+    "get_metfilters_mask": get_metfilters_mask,
+    "get_stitching_mask": get_stitching_mask,
+    "get_hemcleaning_mask": get_hemcleaning_mask,
+}
+# event fields modified by the Jet/MET shifts (JEC/JER, unclustered energy)
+SHIFTED_FIELDS = {"Jet": {"pt", "mass"}, "MET": {"pt", "phi"}}
+# event fields modified by any correction (Jet/MET shifts, MET phi, rochester and tau energy scale)
+CORRECTED_FIELDS = {**SHIFTED_FIELDS, "Muon": {"pt"}, "Tau": {"pt", "mass"}}
+
+
+def reads_fields(mask, fields) -> bool:
+    """
+    check if an event selection expression may read any of 'fields' {collection: fields}.
+    Expressions reading the selected objects, or whose event fields are unknown, may read any
+    """
+    event_fields = get_event_fields(mask, NAMESPACE_FUNCTIONS)
+    if "objects" in mask.names or event_fields is None:
+        return True
+    for event_field in event_fields:
+        collection, _, field = event_field.partition(".")
+        if collection in fields and (not field or field in fields[collection]):
+            return True
+    return False
 
 
 def update(events, collections):
@@ -43,29 +83,204 @@ class ZToJets(processor.ProcessorABC):
         self,
         year: str = "2017",
         flow: str = "True",
-        do_systematics: bool = False
+        do_systematics: bool = False,
+        skim_dir: str = None,
     ):
         self.year = year
         self.flow = flow
         self.do_systematics = do_systematics
+        # if given, the selected events of each category are also written to Parquet
+        self.skim_dir = skim_dir
+        # datasets whose skim expressions were already written by this worker
+        self.skim_datasets = set()
 
         config_builder = ProcessorConfigBuilder(processor="ztojets", year=year)
         self.processor_config = config_builder.build_processor_config()
         self.histogram_config = self.processor_config.histogram_config
-        self.histograms = HistBuilder(self.processor_config).build_histogram()
-        
+        # empty histograms are built per chunk from the (cached) axes
+        self.histogram_factory = HistBuilder(
+            self.processor_config, variations=self.get_variations()
+        )
+
+        # leading correction-invariant cuts of each category, applied before any correction
+        self.preselection = self.get_preselection()
+        # first cutflow step of each category computed with the full event weight: every
+        # event passing the last preselection cut of the category survives the skim
+        self.cutflow_start = {
+            category: max(len(cuts) - 1, 0) for category, cuts in self.preselection.items()
+        }
+
+        # parse the POG correction files once per process. Worker processes
+        # forked after this point inherit the loaded evaluators
+        warm_correction_sets(self.get_correction_jsons(), year)
+
+    def get_correction_jsons(self):
+        """return the POG json files used by the correctors of this processor"""
+        object_selection = self.processor_config.object_selection
+        muon_json = (
+            "muon_highpt"
+            if object_selection["muons"]["cuts"]["muons_id"] == "highpt"
+            else "muon"
+        )
+        jsons = [muon_json, "electron", "tau", "pileup", "btag", "met", "pujetid"]
+        if "jetsvetomaps" in object_selection["jets"]["cuts"]:
+            jsons.append("jetvetomaps")
+        return jsons
+
+    def get_variations(self):
+        """return the names of every variation filled by this processor"""
+        variations = ["nominal"]
+        variations += get_weight_variations(
+            self.processor_config.object_selection, self.year
+        )
+        if self.do_systematics:
+            variations += JET_MET_SHIFTS
+        return variations
+
+    def check_weight_variations(self, weights_container):
+        """
+        check that the weight variations added by the correctors are the ones declared in
+        the variation axis (see 'get_weight_variations'), before any histogram is filled
+        """
+        declared = set(
+            get_weight_variations(self.processor_config.object_selection, self.year)
+        )
+        added = set(weights_container.variations)
+        if added != declared:
+            raise ValueError(
+                "weight variations of the correctors do not match 'get_weight_variations': "
+                f"not declared {sorted(added - declared)}, not added {sorted(declared - added)}"
+            )
+
+    def get_preselection(self):
+        """
+        return the leading cuts of each category that do not depend on any correction.
+        Events failing them in every category can be dropped before the corrections run
+        """
+        event_selection = self.processor_config.event_selection
+        preselection = {}
+        for category, category_cuts in event_selection["categories"].items():
+            preselection[category] = []
+            for cut_name in category_cuts:
+                if not self.is_correction_invariant(
+                    event_selection["selections"][cut_name]
+                ):
+                    break
+                preselection[category].append(cut_name)
+        return preselection
+
+    def apply_preselection(self, events, output):
+        """
+        skim events with the correction-invariant preselection of the categories.
+        'sumw' and the preselection cutflow ('preselection_cutflow') are computed before
+        the skim, using the generator weights (MC) or unit weights (Data), since scale
+        factors are not computed for the skimmed-away events
+        """
+        nevents = len(events)
+        preselection_weight = (
+            events.genWeight if self.is_mc else np.ones(nevents)
+        )
+        output["metadata"].update(
+            {"raw_initial_nevents": nevents, "sumw": ak.sum(preselection_weight)}
+        )
+        namespace = self.get_namespace(events, objects={})
+        selections = self.processor_config.event_selection["selections"]
+        preselection_masks = {
+            cut_name: np.asarray(selections[cut_name].evaluate(namespace))
+            for cut_name in set().union(*self.preselection.values())
+        }
+        skim_mask = np.zeros(nevents, dtype=bool)
+        for category, category_cuts in self.preselection.items():
+            output["metadata"][category] = {"cutflow": {}, "preselection_cutflow": {}}
+            category_mask = np.ones(nevents, dtype=bool)
+            for cut_name in category_cuts:
+                category_mask = category_mask & preselection_masks[cut_name]
+                output["metadata"][category]["preselection_cutflow"][cut_name] = ak.sum(
+                    preselection_weight[category_mask]
+                )
+            skim_mask = skim_mask | category_mask
+        output["metadata"].update({"raw_skim_nevents": ak.sum(skim_mask)})
+        # preselection masks of the surviving events are reused by the event selection
+        skimmed_masks = {
+            cut_name: mask[skim_mask] for cut_name, mask in preselection_masks.items()
+        }
+        return events[skim_mask], skimmed_masks
+
     def process(self, events):
         # check if sample is MC
         self.is_mc = hasattr(events, "genWeight")
-        if not self.is_mc:
-            # nominal JEC are already applied in data
-            return self.process_shift(events, shift_name="nominal")
+        output = {
+            "metadata": {"variables_timing": {}},
+            "histograms": self.histogram_factory.build_histogram(),
+        }
+        # -------------------------------------------------------------
+        # preselection skim (before any correction)
+        # -------------------------------------------------------------
+        events, preselection_masks = self.apply_preselection(events, output)
+        if self.skim_dir and events.metadata["dataset"] not in self.skim_datasets:
+            write_expressions(
+                self.skim_dir, events.metadata["dataset"], self.histogram_config
+            )
+            self.skim_datasets.add(events.metadata["dataset"])
+        if len(events) == 0:
+            self.add_empty_metadata(output)
+            return output
+
+        if self.is_mc:
+            # apply JEC/JER corrections to jets (in data, the corrections are already applied)
+            apply_jet_corrections(events, self.year)
+        # define Jet/MET shifts (before any lepton correction is propagated to MET)
+        shifts = self.get_shifts(events)
 
-        # apply JEC/JER corrections to jets (in data, the corrections are already applied)
-        apply_jet_corrections(events, self.year)
-        # define Jet/MET shifts
+        # -------------------------------------------------------------
+        # shift-invariant stage (run once per chunk)
+        # -------------------------------------------------------------
+        # lepton corrections do not depend on the Jet/MET shift
+        self.apply_lepton_corrections(events)
+        # lepton, pileup and prefiring weights
+        weights_container = Weights(len(events), storeIndividual=True)
+        if self.is_mc:
+            self.add_event_weights(events, weights_container)
+        # nominal weight without jet-dependent weights, used by the non-nominal shifts
+        invariant_weight = weights_container.weight()
+        # selections that only read shift-invariant quantities (trigger, lumi, MET filters, ...)
+        invariant_namespace = self.get_namespace(events, objects={})
+        invariant_masks = {
+            selection: (
+                preselection_masks[selection]
+                if selection in preselection_masks
+                else mask.evaluate(invariant_namespace)
+            )
+            for selection, mask in self.processor_config.event_selection[
+                "selections"
+            ].items()
+            if self.is_shift_invariant(mask)
+        }
+
+        # -------------------------------------------------------------
+        # shift-dependent stage (run once per Jet/MET shift)
+        # -------------------------------------------------------------
+        # every shift fills the same histograms, labeled by its variation name
+        for collections, shift_name in shifts:
+            shifted_events = update(events, collections)
+            if shift_name == "nominal":
+                shift_weights = weights_container
+            else:
+                shift_weights = Weights(len(events))
+                shift_weights.add("shift_invariant", invariant_weight)
+            self.process_shift(
+                events=shifted_events,
+                shift_name=shift_name,
+                weights_container=shift_weights,
+                invariant_masks=invariant_masks,
+                output=output,
+            )
+        return output
+
+    def get_shifts(self, events):
+        """return the Jet/MET collections of each shift"""
         shifts = [({"Jet": events.Jet, "MET": events.MET}, "nominal")]
-        if self.do_systematics:
+        if self.is_mc and self.do_systematics:
             shifts.extend([
                 ({"Jet": events.Jet.JES_jes.up, "MET": events.MET.JES_jes.up},"JESUp"),
                 ({"Jet": events.Jet.JES_jes.down, "MET": events.MET.JES_jes.down},"JESDown"),
@@ -74,156 +289,207 @@ class ZToJets(processor.ProcessorABC):
                 ({"Jet": events.Jet, "MET": events.MET.MET_UnclusteredEnergy.up}, "UESUp"),
                 ({"Jet": events.Jet,"MET": events.MET.MET_UnclusteredEnergy.down,},"UESDown"),
             ])
-        return processor.accumulate(
-            self.process_shift(update(events, collections), name)
-            for collections, name in shifts
+        return shifts
+
+    @staticmethod
+    def is_shift_invariant(mask):
+        """check if an event selection expression reads no Jet/MET shift dependent field"""
+        return not reads_fields(mask, SHIFTED_FIELDS)
+
+    @staticmethod
+    def is_correction_invariant(mask):
+        """
+        check if an event selection expression reads no field modified by the corrections
+        (JEC/JER, MET, rochester and tau energy scale corrections)
+        """
+        return not reads_fields(mask, CORRECTED_FIELDS)
+
+    def add_empty_metadata(self, output):
+        """fill the post-preselection bookkeeping of a chunk with no events left"""
+        for category, category_cuts in self.processor_config.event_selection[
+            "categories"
+        ].items():
+            cutflow = output["metadata"][category]["cutflow"]
+            for cut_name in category_cuts[self.cutflow_start[category] :]:
+                cutflow[cut_name] = 0
+            output["metadata"][category].update(
+                {"weighted_final_nevents": 0, "raw_final_nevents": 0}
+            )
+
+    def get_namespace(self, events, objects):
+        """namespace used to evaluate event selection and histogram expressions"""
+        return ExpressionNamespace(
+            events=events,
+            objects=objects,
+            np=np,
+            ak=ak,
+            year=self.year,
+            dataset=events.metadata["dataset"],
+            goldenjson=self.processor_config.goldenjson,
+            hlt_paths=self.processor_config.hlt_paths,
+            **NAMESPACE_FUNCTIONS,
         )
-                
-    def process_shift(self, events, shift_name):
-        year = self.year
-        is_mc = self.is_mc
-        # get number of events
-        nevents = len(events)
-        # get dataset name
-        dataset = events.metadata["dataset"]
-        # get golden json, HLT paths and selections
-        goldenjson = self.processor_config.goldenjson
-        hlt_paths = self.processor_config.hlt_paths
-        object_selection = self.processor_config.object_selection
-        event_selection = self.processor_config.event_selection
-        # create copies of histogram objects
-        hist_dict = copy.deepcopy(self.histograms)
-        # initialize output dictionary
-        output = {}
-        output["metadata"] = {}
-        if shift_name == "nominal":
-            output["metadata"].update({"raw_initial_nevents": nevents})
 
-        # -------------------------------------------------------------
-        # object corrections
-        # -------------------------------------------------------------
-        if is_mc:
+    def apply_lepton_corrections(self, events):
+        """apply tau energy scale (only MC) and rochester corrections"""
+        if self.is_mc:
             # apply energy corrections to taus (only to MC)
             apply_tau_energy_scale_corrections(
-                events=events, year=year, variation=shift_name
+                events=events, year=self.year, variation="nominal"
             )
         # apply rochester corretions to muons
         apply_rochester_corrections(
-            events=events, is_mc=is_mc, year=year, variation=shift_name
+            events=events, is_mc=self.is_mc, year=self.year, variation="nominal"
         )
+
+    def apply_met_corrections(self, events):
+        """propagate lepton corrections and jet veto maps to (shifted) MET and apply MET phi corrections"""
+        # propagate lepton corrections to MET
+        propagate_object_corrections_to_met(events, collections=("Tau", "Muon"))
         # apply MET phi modulation corrections
         apply_met_phi_corrections(
             events=events,
-            is_mc=is_mc,
-            year=year,
+            is_mc=self.is_mc,
+            year=self.year,
         )
         # propagate jet_veto maps to MET
-        if "jetsvetomaps" in object_selection["jets"]["cuts"]:
-            update_met_jet_veto(events, year)
+        if "jetsvetomaps" in self.processor_config.object_selection["jets"]["cuts"]:
+            update_met_jet_veto(events, self.year)
+
+    def add_event_weights(self, events, weights_container):
+        """add shift-invariant weights (generator, prefiring, pileup and lepton weights)"""
+        year = self.year
+        hlt_paths = self.processor_config.hlt_paths
+        object_selection = self.processor_config.object_selection
+        # add gen weigths
+        weights_container.add("genweight", events.genWeight)
+        # add l1prefiring weigths
+        add_l1prefiring_weight(events, weights_container, year, "nominal")
+        # add pileup weigths
+        add_pileup_weight(events, weights_container, year, "nominal")
+        # electron corrector
+        electron_corrector = ElectronCorrector(
+            electrons=events.Electron,
+            weights=weights_container,
+            year=year,
+        )
+        # add electron ID weights
+        electron_corrector.add_id_weight(
+            id_working_point=object_selection["electrons"]["cuts"][
+                "electrons_id"
+            ],
+        )
+        # add electron reco weights
+        electron_corrector.add_reco_weight("RecoAbove20")
+        electron_corrector.add_reco_weight("RecoBelow20")
+
+        # muon corrector
+        muon_corrector_args = {
+            "events": events,
+            "weights": weights_container,
+            "year": year,
+            "variation": "nominal",
+            "id_wp": object_selection["muons"]["cuts"]["muons_id"],
+            "iso_wp": object_selection["muons"]["cuts"]["muons_iso"],
+        }
+        muon_corrector = (
+            MuonHighPtCorrector(**muon_corrector_args)
+            if object_selection["muons"]["cuts"]["muons_id"] == "highpt"
+            else MuonCorrector(**muon_corrector_args)
+        )
+        # add muon RECO weights
+        muon_corrector.add_reco_weight()
+        # add muon ID weights
+        muon_corrector.add_id_weight()
+        # add muon iso weights
+        muon_corrector.add_iso_weight()
+        # add trigger weights
+        muon_corrector.add_triggeriso_weight(hlt_paths)
+
+        # add tau weights
+        tau_corrector = TauCorrector(
+            events=events,
+            weights=weights_container,
+            year=year,
+            tau_vs_jet=object_selection["taus"]["cuts"]["taus_vs_jet"],
+            tau_vs_ele=object_selection["taus"]["cuts"]["taus_vs_ele"],
+            tau_vs_mu=object_selection["taus"]["cuts"]["taus_vs_mu"],
+            variation="nominal",
+        )
+        tau_corrector.add_id_weight_deeptauvse()
+        tau_corrector.add_id_weight_deeptauvsmu()
+        tau_corrector.add_id_weight_deeptauvsjet()
+
+    def add_jet_weights(self, events, weights_container, shift_name):
+        """add jet-dependent weights (pileup jet ID and b-tagging)"""
+        object_selection = self.processor_config.object_selection
+        # add pujetid weigths
+        add_pujetid_weight(
+            jets=events.Jet,
+            weights=weights_container,
+            year=self.year,
+            working_point=object_selection["jets"]["cuts"]["jets_pileup_id"],
+            variation=shift_name,
+        )
+        # b-tagging corrector
+        btag_corrector = BTagCorrector(
+            events=events,
+            weights=weights_container,
+            sf_type="comb",
+            worging_point=object_selection["bjets"]["cuts"]["jets_deepjet_b"],
+            year=self.year,
+            full_run=False,
+            variation=shift_name,
+        )
+        # add b-tagging weights
+        btag_corrector.add_btag_weights(flavor="bc")
+        btag_corrector.add_btag_weights(flavor="light")
+
+    def process_shift(
+        self, events, shift_name, weights_container, invariant_masks, output
+    ):
+        year = self.year
+        is_mc = self.is_mc
+        # get selections
+        object_selection = self.processor_config.object_selection
+        event_selection = self.processor_config.event_selection
+        # histograms shared by all shifts of the chunk
+        hist_dict = output["histograms"]
 
         # -------------------------------------------------------------
-        # event SF/weights computation
+        # MET corrections
+        # -------------------------------------------------------------
+        self.apply_met_corrections(events)
+
+        # -------------------------------------------------------------
+        # jet-dependent SF/weights computation
         # -------------------------------------------------------------
-        # set weights container
-        weights_container = Weights(len(events), storeIndividual=True)
         if is_mc:
-            # add gen weigths
-            weights_container.add("genweight", events.genWeight)
-            # add l1prefiring weigths
-            add_l1prefiring_weight(events, weights_container, year, shift_name)
-            # add pileup weigths
-            add_pileup_weight(events, weights_container, year, shift_name)
-            # add pujetid weigths
-            add_pujetid_weight(
-                jets=events.Jet,
-                weights=weights_container,
-                year=year,
-                working_point=object_selection["jets"]["cuts"]["jets_pileup_id"],
-                variation=shift_name,
-            )
-            # b-tagging corrector
-            btag_corrector = BTagCorrector(
-                events=events,
-                weights=weights_container,
-                sf_type="comb",
-                worging_point=object_selection["bjets"]["cuts"]["jets_deepjet_b"],
-                year=year,
-                full_run=False,
-                variation=shift_name,
-            )
-            # add b-tagging weights
-            btag_corrector.add_btag_weights(flavor="bc")
-            btag_corrector.add_btag_weights(flavor="light")
-            # electron corrector
-            electron_corrector = ElectronCorrector(
-                electrons=events.Electron,
-                weights=weights_container,
-                year=year,
-            )
-            # add electron ID weights
-            electron_corrector.add_id_weight(
-                id_working_point=object_selection["electrons"]["cuts"][
-                    "electrons_id"
-                ],
-            )
-            # add electron reco weights
-            electron_corrector.add_reco_weight("RecoAbove20")
-            electron_corrector.add_reco_weight("RecoBelow20")
-
-            # muon corrector
-            muon_corrector_args = {
-                "events": events,
-                "weights": weights_container,
-                "year": year,
-                "variation": shift_name,
-                "id_wp": object_selection["muons"]["cuts"]["muons_id"],
-                "iso_wp": object_selection["muons"]["cuts"]["muons_iso"],
-            }
-            muon_corrector = (
-                MuonHighPtCorrector(**muon_corrector_args)
-                if object_selection["muons"]["cuts"]["muons_id"] == "highpt"
-                else MuonCorrector(**muon_corrector_args)
-            )
-            # add muon RECO weights
-            muon_corrector.add_reco_weight()
-            # add muon ID weights
-            muon_corrector.add_id_weight()
-            # add muon iso weights
-            muon_corrector.add_iso_weight()
-            # add trigger weights
-            muon_corrector.add_triggeriso_weight(hlt_paths)
-
-            # add tau weights
-            tau_corrector = TauCorrector(
-                events=events,
-                weights=weights_container,
-                year=year,
-                tau_vs_jet=object_selection["taus"]["cuts"]["taus_vs_jet"],
-                tau_vs_ele=object_selection["taus"]["cuts"]["taus_vs_ele"],
-                tau_vs_mu=object_selection["taus"]["cuts"]["taus_vs_mu"],
-                variation=shift_name,
-            )
-            tau_corrector.add_id_weight_deeptauvse()
-            tau_corrector.add_id_weight_deeptauvsmu()
-            tau_corrector.add_id_weight_deeptauvsjet()
-                
-        if shift_name == "nominal":
-            # save sum of weights before object_selection
-            output["metadata"].update({"sumw": ak.sum(weights_container.weight())})
-                
+            self.add_jet_weights(events, weights_container, shift_name)
+            if shift_name == "nominal":
+                self.check_weight_variations(weights_container)
+
         # -------------------------------------------------------------
         # object selection
         # -------------------------------------------------------------
         object_selector = ObjectSelector(object_selection, year)
         objects = object_selector.select_objects(events)
+        # namespace for event selection and histogram expressions
+        namespace = self.get_namespace(events, objects)
         # -------------------------------------------------------------
         # event selection
         # -------------------------------------------------------------
         # itinialize selection manager
         selection_manager = PackedSelection()
-        # add all selections to selector manager
+        # add all selections to selector manager (shift-invariant masks are computed once per chunk)
         for selection, mask in event_selection["selections"].items():
-            selection_manager.add(selection, eval(mask))
+            if selection in invariant_masks:
+                selection_manager.add(selection, invariant_masks[selection])
+            else:
+                selection_manager.add(selection, mask.evaluate(namespace))
+
+        # histogram variables are evaluated once per shift and shared by all categories
+        column_cache = ColumnCache(self.histogram_config, namespace)
 
         categories = event_selection["categories"]
         for category, category_cuts in categories.items():
@@ -232,12 +498,11 @@ class ZToJets(processor.ProcessorABC):
             nevents_after = ak.sum(category_mask)
 
             if shift_name == "nominal":
-                # save cutflow to metadata
-                output["metadata"][category] = {"cutflow": {}}
-                selections = []
-                for cut_name in category_cuts:
-                    selections.append(cut_name)
-                    current_selection = selection_manager.all(*selections)
+                # save cutflow to metadata, with the full event weight (the previous
+                # preselection steps are only in 'preselection_cutflow')
+                for i in range(self.cutflow_start[category], len(category_cuts)):
+                    cut_name = category_cuts[i]
+                    current_selection = selection_manager.all(*category_cuts[: i + 1])
                     output["metadata"][category]["cutflow"][cut_name] = ak.sum(
                         weights_container.weight()[current_selection]
                     )
@@ -256,9 +521,7 @@ class ZToJets(processor.ProcessorABC):
             # check that there are events left after selection
             if nevents_after > 0:
                 # build analysis variables map
-                variables_map = {}
-                for variable, axis in self.histogram_config.axes.items():
-                    variables_map[variable] = eval(axis.expression)[category_mask]
+                variables_map = column_cache.masked(category_mask)
                 # -------------------------------------------------------------
                 # histogram filling
                 # -------------------------------------------------------------
@@ -267,39 +530,51 @@ class ZToJets(processor.ProcessorABC):
                 if is_mc and shift_name == "nominal":
                     # get event weight systematic variations for MC samples
                     variations = ["nominal"] + list(weights_container.variations)
+                    category_weights = {}
                     for variation in variations:
                         if variation == "nominal":
-                            category_weight = weights_container.weight()[
+                            category_weights[variation] = weights_container.weight()[
                                 category_mask
                             ]
                         else:
-                            category_weight = weights_container.weight(
+                            category_weights[variation] = weights_container.weight(
                                 modifier=variation
                             )[category_mask]
-                        fill_histogram(
-                            histograms=hist_dict,
-                            histogram_config=self.histogram_config,
-                            variables_map=variables_map,
-                            weights=category_weight,
-                            variation=variation,
-                            category=category,
-                            flow=self.flow,
-                        )
                 else:
                     # fill Data/object-wise variations for MC samples
-                    category_weight = weights_container.weight()[category_mask]
-                    fill_histogram(
-                        histograms=hist_dict,
-                        histogram_config=self.histogram_config,
+                    category_weights = {
+                        shift_name: weights_container.weight()[category_mask]
+                    }
+                # fill all variations at once
+                fill_histograms(
+                    histograms=hist_dict,
+                    histogram_config=self.histogram_config,
+                    variables_map=variables_map,
+                    weights=category_weights,
+                    category=category,
+                    flow=self.flow,
+                )
+                if self.skim_dir:
+                    # save the selected events, so histograms can be rebuilt without NanoAOD
+                    skim_path = get_skim_path(
+                        self.skim_dir, events.metadata, category, shift_name
+                    )
+                    write_skim(
+                        path=skim_path,
                         variables_map=variables_map,
-                        weights=category_weight,
-                        variation=shift_name,
-                        category=category,
-                        flow=self.flow,
+                        weights=category_weights,
+                        objects={
+                            name: array[category_mask] for name, array in objects.items()
+                        },
                     )
-        # define output dictionary accumulator
-        output["histograms"] = hist_dict
-        return output
+                    # skim files of the run, saved to the dataset manifest by the job
+                    output["metadata"].setdefault("skim_files", {}).setdefault(
+                        category, []
+                    ).append(f"{shift_name}/{skim_path.name}")
+        # save the time spent computing each histogram variable (summed over shifts)
+        variables_timing = output["metadata"]["variables_timing"]
+        for variable, timing in column_cache.timings.items():
+            variables_timing[variable] = variables_timing.get(variable, 0) + timing
 
     def postprocess(self, accumulator):
         return accumulator
\ No newline at end of file
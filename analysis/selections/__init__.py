@@ -1,4 +1,4 @@
-from analysis.selections.utils import trigger_match
+from analysis.selections.utils import trigger_match, reads_event_fields
 from analysis.selections.object_selections import ObjectSelector
 import analysis.selections.event_selections as event_selections
 get_lumi_mask = event_selections.get_lumi_mask
@@ -3,10 +3,11 @@ import numpy as np
 import awkward as ak
 import importlib.resources
 from coffea.lumi_tools import LumiMask
-from analysis.selections import trigger_match
+from analysis.selections import trigger_match, reads_event_fields
 from coffea.analysis_tools import PackedSelection
 
 
+@reads_event_fields("Flag", "genWeight")
 def get_metfilters_mask(events, year):
     with importlib.resources.path("analysis.data", "metfilters.json") as path:
         with open(path, "r") as handle:
@@ -19,6 +20,7 @@ def get_metfilters_mask(events, year):
     return metfilters_mask
 
 
+@reads_event_fields("run", "luminosityBlock", "genWeight")
 def get_lumi_mask(events, goldenjson):
     if hasattr(events, "genWeight"):
         lumi_mask = np.ones(len(events), dtype="bool")
@@ -28,6 +30,7 @@ def get_lumi_mask(events, goldenjson):
     return lumi_mask
 
 
+@reads_event_fields("HLT")
 def get_trigger_mask(events, hlt_paths):
     trigger_mask = np.zeros(len(events), dtype="bool")
     
@@ -37,6 +40,8 @@ def get_trigger_mask(events, hlt_paths):
     return trigger_mask
 
 
+# trigger matching only reads the lepton direction
+@reads_event_fields("TrigObj", "Muon.eta", "Muon.phi", "Electron.eta", "Electron.phi")
 def get_trigger_match_mask(events, hlt_paths, lepton="Muon"):
     trigger_match_mask = np.zeros(len(events), dtype="bool")
     for hlt_path in hlt_paths:
@@ -49,6 +54,7 @@ def get_trigger_match_mask(events, hlt_paths, lepton="Muon"):
     return ak.sum(trigger_match_mask, axis=-1) > 0
 
 
+@reads_event_fields("LHE.HT")
 def get_stitching_mask(events, dataset, dataset_key, ht_value):
     stitching_mask = np.ones(len(events), dtype="bool")
     if dataset.startswith(dataset_key):
@@ -56,6 +62,9 @@ def get_stitching_mask(events, dataset, dataset_key, ht_value):
     return stitching_mask
 
 
+@reads_event_fields(
+    "Jet.eta", "Jet.phi", "Electron.pt", "Electron.eta", "Electron.phi", "run", "genWeight"
+)
 def get_hemcleaning_mask(events):
     # hem-cleaning selection
     # https://hypernews.cern.ch/HyperNews/CMS/get/JetMET/2000.html
@@ -4,6 +4,7 @@ import numpy as np
 import awkward as ak
 from analysis.working_points import working_points
 from analysis.corrections.jetvetomaps import jetvetomaps_mask
+from analysis.configs.expressions import Expression, ExpressionNamespace
 
 
 def delta_r_mask(first, second, threshold=0.4):
@@ -22,9 +23,11 @@ class ObjectSelector:
         self.objects = {}
         self.events = events
         for obj_name, obj_config in self.object_selection_config.items():
+            # the field and cuts of each object are evaluated against the current 'objects'
+            self.namespace = self.get_namespace()
             # check if object field is read from events or from user defined function
-            if "events" in obj_config["field"]:
-                self.objects[obj_name] = eval(obj_config["field"])
+            if isinstance(obj_config["field"], Expression):
+                self.objects[obj_name] = obj_config["field"].evaluate(self.namespace)
             else:
                 selection_function = getattr(self, obj_config["field"])
                 parameters = inspect.signature(selection_function).parameters.keys()
@@ -40,22 +43,31 @@ class ObjectSelector:
                 self.objects[obj_name] = self.objects[obj_name][selection_mask]
         return self.objects
 
+    def get_namespace(self):
+        """namespace used to evaluate the config expressions"""
+        return ExpressionNamespace(
+            events=self.events,
+            objects=self.objects,
+            np=np,
+            ak=ak,
+            delta_r_mask=delta_r_mask,
+            jetvetomaps_mask=jetvetomaps_mask,
+        )
+
     def get_selection_mask(self, events, obj_name, cuts):
-        # bring 'objects' and to local scope
-        objects = self.objects
         # initialize selection mask
         selection_mask = ak.ones_like(self.objects[obj_name].pt, dtype=bool)
         # iterate over all cuts
         for selection, str_mask in cuts.items():
-            # cast 'str_mask' to str if needed
-            # for instance: 'taus_decaymode: 13'
-            if not isinstance(str_mask, str):
-                str_mask = str(str_mask)
-            # check if 'str_mask' contains 'events' or 'objects'
-            if "events" in str_mask or "objects" in str_mask:
-                # evaluate string expression for the mask
-                mask = eval(str_mask)
+            # check if 'str_mask' is a (compiled) expression
+            if isinstance(str_mask, Expression):
+                # evaluate expression for the mask
+                mask = str_mask.evaluate(self.namespace)
             else:
+                # cast 'str_mask' to str if needed
+                # for instance: 'taus_decaymode: 13'
+                if not isinstance(str_mask, str):
+                    str_mask = str(str_mask)
                 # load working point function
                 wp_function = getattr(working_points, selection)
                 # get working point function parameters
@@ -1,6 +1,20 @@
 import awkward as ak
 
 
+def reads_event_fields(*event_fields):
+    """
+    declare the event fields read by a function that receives the events array, as
+    '<collection>' (every field) or '<collection>.<field>'. Config expressions use them to
+    find which corrections a selection depends on (see 'analysis.configs.expressions.get_event_fields')
+    """
+
+    def decorator(function):
+        function.event_fields = frozenset(event_fields)
+        return function
+
+    return decorator
+
+
 def trigger_match(leptons: ak.Array, trigobjs: ak.Array, trigger_path: str):
     """
     Returns DeltaR matched trigger objects 
@@ -0,0 +1,86 @@
+"""
+Measure the bytes read per chunk by the ZToJets processor when every NanoAOD branch
+is exposed vs when only the statically required branches are.
+
+usage: python -m benchmarks.column_reading --file <nanoaod.root> --year 2017
+"""
+import argparse
+from coffea import processor
+from humanfriendly import format_size
+from benchmarks.utils import timed
+from analysis.processors.ztojets import ZToJets
+from analysis.helpers import get_required_columns, RequiredColumnsNanoAODSchema
+
+
+def measure(processor_instance, schema, args):
+    (_, metrics), elapsed = timed(
+        processor.run_uproot_job,
+        {args.dataset: [args.file]},
+        treename="Events",
+        processor_instance=processor_instance,
+        executor=processor.iterative_executor,
+        executor_args={"schema": schema, "savemetrics": True},
+        chunksize=args.chunksize,
+        maxchunks=args.maxchunks,
+    )
+    nchunks = metrics.get("chunks", args.maxchunks)
+    return metrics["bytesread"] / nchunks, len(metrics["columns"]), elapsed
+
+
+def main(args):
+    processor_instance = ZToJets(year=args.year)
+    required_columns = get_required_columns(processor_instance.processor_config)
+    RequiredColumnsNanoAODSchema.required_columns = required_columns
+
+    results = {
+        "all": measure(processor_instance, processor.NanoAODSchema, args),
+        "required": measure(processor_instance, RequiredColumnsNanoAODSchema, args),
+    }
+    print(f"required collections: {required_columns['collections']}")
+    print(f"required branches: {required_columns['branches']}")
+    for mode, (bytes_per_chunk, ncolumns, elapsed) in results.items():
+        print(
+            f"{mode} branches: {format_size(bytes_per_chunk)} per chunk, "
+            f"{ncolumns} columns accessed, {elapsed:.2f} s"
+        )
+    print(f"bytes read ratio: {results['required'][0] / results['all'][0]:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--file",
+        dest="file",
+        type=str,
+        help="path to a NanoAOD (MC) root file",
+    )
+    parser.add_argument(
+        "--dataset",
+        dest="dataset",
+        type=str,
+        default="DYJetsToLL_inclusive",
+        help="dataset name passed to the processor (default DYJetsToLL_inclusive)",
+    )
+    parser.add_argument(
+        "--year",
+        dest="year",
+        type=str,
+        default="2017",
+        help="year of the data {2016preVFP, 2016postVFP, 2017, 2018} (default 2017)",
+    )
+    parser.add_argument(
+        "--chunksize",
+        dest="chunksize",
+        type=int,
+        default=50000,
+        help="number of events per chunk (default 50000)",
+    )
+    parser.add_argument(
+        "--maxchunks",
+        dest="maxchunks",
+        type=int,
+        default=2,
+        help="number of chunks to process (default 2)",
+    )
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,65 @@
+"""
+Compare cold and warm latency of the JEC/JER step on a fixed NanoAOD chunk.
+
+The cold measurement empties the correction registry before each call, which
+reproduces the previous behaviour of deserializing the jet/MET factories on
+every chunk. The warm measurement reuses the factories cached by the first call.
+
+usage: python -m benchmarks.jec_startup --file <nanoaod.root> --year 2017
+"""
+import argparse
+import numpy as np
+from benchmarks.utils import load_events, timed
+from analysis.corrections import correction_registry, apply_jet_corrections
+
+
+def main(args):
+    cold, warm = [], []
+    for _ in range(args.repeat):
+        correction_registry.clear()
+        events = load_events(args.file, args.entry_stop)
+        _, elapsed = timed(apply_jet_corrections, events, args.year)
+        cold.append(elapsed)
+    for _ in range(args.repeat):
+        events = load_events(args.file, args.entry_stop)
+        _, elapsed = timed(apply_jet_corrections, events, args.year)
+        warm.append(elapsed)
+
+    print(f"events per chunk: {args.entry_stop}")
+    print(f"cold chunk latency: {np.mean(cold):.3f} s (+/- {np.std(cold):.3f})")
+    print(f"warm chunk latency: {np.mean(warm):.3f} s (+/- {np.std(warm):.3f})")
+    print(f"speedup: {np.mean(cold) / np.mean(warm):.1f}x")
+    print(f"registry: {correction_registry.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--file",
+        dest="file",
+        type=str,
+        help="path to a NanoAOD (MC) root file",
+    )
+    parser.add_argument(
+        "--year",
+        dest="year",
+        type=str,
+        default="2017",
+        help="year of the data {2016preVFP, 2016postVFP, 2017, 2018} (default 2017)",
+    )
+    parser.add_argument(
+        "--entry_stop",
+        dest="entry_stop",
+        type=int,
+        default=10000,
+        help="number of events in the chunk (default 10000)",
+    )
+    parser.add_argument(
+        "--repeat",
+        dest="repeat",
+        type=int,
+        default=5,
+        help="number of measurements for each mode (default 5)",
+    )
+    args = parser.parse_args()
+    main(args)
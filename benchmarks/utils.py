@@ -0,0 +1,30 @@
+import time
+from coffea.nanoevents import NanoEventsFactory, NanoAODSchema
+
+
+def load_events(path: str, entry_stop: int, dataset: str = "benchmark"):
+    """
+    load a fixed chunk of a NanoAOD file as a NanoEvents array
+
+    Parameters:
+    -----------
+        path:
+            path (or xrootd url) to a NanoAOD root file
+        entry_stop:
+            number of events to read from the start of the file
+        dataset:
+            dataset name stored in the events metadata
+    """
+    return NanoEventsFactory.from_root(
+        path,
+        entry_stop=entry_stop,
+        schemaclass=NanoAODSchema,
+        metadata={"dataset": dataset},
+    ).events()
+
+
+def timed(function, *args, **kwargs):
+    """run a function and return its output and the elapsed wall time in seconds"""
+    t0 = time.perf_counter()
+    out = function(*args, **kwargs)
+    return out, time.perf_counter() - t0
@@ -0,0 +1,78 @@
+"""
+Measure the cost of the Jet/MET shifts in the ZToJets processor on a fixed NanoAOD chunk.
+
+The chunk is processed with and without systematics. Since shift-invariant work
+(lepton corrections, lepton/pileup weights, trigger/lumi/MET-filter masks) runs
+once per chunk, each extra shift only pays for the jet-dependent part of the
+pipeline. Re-running the full pipeline per shift would cost ~7x the nominal time.
+
+usage: python -m benchmarks.ztojets_shifts --file <nanoaod.root> --year 2017
+"""
+import argparse
+import numpy as np
+from benchmarks.utils import load_events, timed
+from analysis.processors.ztojets import ZToJets
+
+
+def measure(processor_instance, args):
+    # first call warms the correction caches
+    processor_instance.process(load_events(args.file, args.entry_stop, args.dataset))
+    elapsed = []
+    for _ in range(args.repeat):
+        events = load_events(args.file, args.entry_stop, args.dataset)
+        _, t = timed(processor_instance.process, events)
+        elapsed.append(t)
+    return np.mean(elapsed), np.std(elapsed)
+
+
+def main(args):
+    nominal, nominal_std = measure(ZToJets(year=args.year, do_systematics=False), args)
+    syst, syst_std = measure(ZToJets(year=args.year, do_systematics=True), args)
+    nshifts = 7
+
+    print(f"events per chunk: {args.entry_stop}")
+    print(f"nominal only: {nominal:.3f} s (+/- {nominal_std:.3f})")
+    print(f"nominal + 6 shifts: {syst:.3f} s (+/- {syst_std:.3f})")
+    print(f"cost of each extra shift: {(syst - nominal) / (nshifts - 1):.3f} s")
+    print(f"full pipeline per shift (estimate): {nshifts * nominal:.3f} s")
+    print(f"speedup: {nshifts * nominal / syst:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--file",
+        dest="file",
+        type=str,
+        help="path to a NanoAOD (MC) root file",
+    )
+    parser.add_argument(
+        "--dataset",
+        dest="dataset",
+        type=str,
+        default="DYJetsToLL_inclusive",
+        help="dataset name passed to the processor (default DYJetsToLL_inclusive)",
+    )
+    parser.add_argument(
+        "--year",
+        dest="year",
+        type=str,
+        default="2017",
+        help="year of the data {2016preVFP, 2016postVFP, 2017, 2018} (default 2017)",
+    )
+    parser.add_argument(
+        "--entry_stop",
+        dest="entry_stop",
+        type=int,
+        default=10000,
+        help="number of events in the chunk (default 10000)",
+    )
+    parser.add_argument(
+        "--repeat",
+        dest="repeat",
+        type=int,
+        default=3,
+        help="number of measurements for each mode (default 3)",
+    )
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,63 @@
+import time
+import argparse
+from humanfriendly import format_size
+from analysis.processors.chunk_cache import ChunkCache
+
+
+def print_stats(cache: ChunkCache, since: float = None) -> None:
+    stats = cache.get_stats(since=since)
+    print(f"cached chunks: {stats['entries']} ({format_size(stats['size'])})")
+    print(f"runs: {stats['runs']}")
+    print(f"hits: {stats['hits']}")
+    print(f"misses: {stats['misses']}")
+    print(f"hit rate: {stats['hit_rate']:.1%}")
+
+
+def main(args):
+    """Helper function to report the chunk cache hit rates and evict outputs"""
+    cache = ChunkCache(args.cache_dir)
+    since = time.time() - args.days * 86400 if args.days else None
+    print(f"Reading chunk cache from: {args.cache_dir}")
+    print_stats(cache, since)
+
+    if args.max_age is not None or args.max_size is not None:
+        removed = cache.evict(
+            max_age=args.max_age * 86400 if args.max_age is not None else None,
+            max_size=args.max_size * 1024**3 if args.max_size is not None else None,
+        )
+        print("")
+        print(f"evicted chunks: {removed['entries']} ({format_size(removed['size'])})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--cache_dir",
+        dest="cache_dir",
+        type=str,
+        required=True,
+        help="chunk output cache directory",
+    )
+    parser.add_argument(
+        "--days",
+        dest="days",
+        type=float,
+        default=None,
+        help="only report the hit rate of the runs of the last days (default all runs)",
+    )
+    parser.add_argument(
+        "--max_age",
+        dest="max_age",
+        type=float,
+        default=None,
+        help="evict the outputs not used in the last 'max_age' days",
+    )
+    parser.add_argument(
+        "--max_size",
+        dest="max_size",
+        type=float,
+        default=None,
+        help="evict the least recently used outputs until the cache is smaller than 'max_size' GB",
+    )
+    args = parser.parse_args()
+    main(args)
@@ -1 +1 @@
-from condor.utils import submit_condor
\ No newline at end of file
+from condor.utils import submit_condor, submit_condor_bulk, write_bulk_submit
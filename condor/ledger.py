@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional
+
+COLUMNS = [
+    "jobname",
+    "dataset",
+    "submit_file",
+    "partition",
+    "outputs",
+    "status",
+    "retries",
+    "submitted_at",
+    "started_at",
+    "finished_at",
+    "runtime",
+    "events",
+    "checksums",
+    "error",
+]
+# columns stored as json strings
+JSON_COLUMNS = {"partition", "outputs", "checksums"}
+
+
+def get_ledger_dir(processor: str, label: str, year: str) -> Path:
+    """directory of the job ledger of a processor/label/year run"""
+    return Path.cwd() / "condor" / "ledger" / processor / (label or "") / year
+
+
+def file_checksum(path: str) -> str:
+    """sha256 checksum of a file"""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def write_job_state(ledger_dir: str, jobname: str, **state) -> None:
+    """
+    report a job state update to the ledger. Jobs do not write to the SQLite database
+    (which does not support concurrent writers on network filesystems): each update is
+    written atomically as a json file to the ledger spool, and merged into the database
+    by 'JobLedger.ingest'
+
+    Parameters:
+    -----------
+        ledger_dir:
+            ledger directory
+        jobname:
+            name of the job
+        state:
+            columns to update (status, started_at, runtime, events, ...)
+    """
+    spool = Path(ledger_dir) / "spool"
+    spool.mkdir(parents=True, exist_ok=True)
+    state = dict(state, jobname=jobname, time=time.time())
+    fd, tmp_path = tempfile.mkstemp(dir=spool, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, spool / f"{jobname}.{time.time_ns()}.json")
+
+
+class JobLedger:
+    """
+    SQLite ledger with the state of the condor jobs of a run: partition, expected outputs,
+    status {created, submitted, running, done, failed}, retry count, runtime, number of
+    processed events and output checksums
+
+    Parameters:
+    -----------
+        ledger_dir:
+            ledger directory (created if it does not exist)
+    """
+
+    def __init__(self, ledger_dir):
+        self.ledger_dir = Path(ledger_dir)
+        self.ledger_dir.mkdir(parents=True, exist_ok=True)
+        self.spool = self.ledger_dir / "spool"
+        self.path = str(self.ledger_dir / "ledger.db")
+        with self.connect() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    jobname TEXT PRIMARY KEY,
+                    dataset TEXT,
+                    submit_file TEXT,
+                    partition TEXT,
+                    outputs TEXT,
+                    status TEXT,
+                    retries INTEGER DEFAULT 0,
+                    submitted_at REAL,
+                    started_at REAL,
+                    finished_at REAL,
+                    runtime REAL,
+                    events INTEGER,
+                    checksums TEXT,
+                    error TEXT
+                )
+                """
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS status_index ON jobs (status)")
+
+    @contextmanager
+    def connect(self):
+        """open a connection that commits on success and is always closed"""
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def register(self, jobname: str, dataset: str, submit_file: str, partition: dict) -> None:
+        """
+        add a job (or reset the files of an existing one, keeping its retry count)
+
+        Parameters:
+        -----------
+            jobname:
+                name of the job
+            dataset:
+                dataset (or 'shared') of the job
+            submit_file:
+                path to the condor submit file of the job
+            partition:
+                job fileset {dataset_key: [items]}. Each dataset key is an output of the job
+        """
+        with self.connect() as connection:
+            connection.execute(
+                """
+                INSERT INTO jobs (jobname, dataset, submit_file, partition, outputs, status)
+                VALUES (?, ?, ?, ?, ?, 'created')
+                ON CONFLICT(jobname) DO UPDATE SET
+                    dataset = excluded.dataset,
+                    submit_file = excluded.submit_file,
+                    partition = excluded.partition,
+                    outputs = excluded.outputs,
+                    status = 'created'
+                """,
+                (
+                    jobname,
+                    dataset,
+                    submit_file,
+                    json.dumps(partition),
+                    json.dumps(list(partition)),
+                ),
+            )
+
+    def mark_submitted(self, jobnames: Iterable[str]) -> None:
+        """set jobs as submitted, counting a retry for the jobs submitted before"""
+        now = time.time()
+        with self.connect() as connection:
+            connection.executemany(
+                """
+                UPDATE jobs SET
+                    retries = retries + (submitted_at IS NOT NULL),
+                    submitted_at = ?,
+                    status = 'submitted',
+                    error = NULL
+                WHERE jobname = ?
+                """,
+                [(now, jobname) for jobname in jobnames],
+            )
+
+    def ingest(self) -> int:
+        """merge the job state updates of the spool into the database. Returns their number"""
+        if not self.spool.exists():
+            return 0
+        update_files = list(self.spool.glob("*.json"))
+        updates = []
+        for update_file in update_files:
+            with open(update_file, "r") as f:
+                updates.append(json.load(f))
+        with self.connect() as connection:
+            for update in sorted(updates, key=lambda update: update.pop("time")):
+                jobname = update.pop("jobname")
+                columns = [column for column in update if column in COLUMNS]
+                values = [
+                    json.dumps(update[column]) if column in JSON_COLUMNS else update[column]
+                    for column in columns
+                ]
+                connection.execute(
+                    f"UPDATE jobs SET {', '.join(f'{column} = ?' for column in columns)} WHERE jobname = ?",
+                    values + [jobname],
+                )
+        for update_file in update_files:
+            update_file.unlink()
+        return len(updates)
+
+    def query(self, statuses: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        return the jobs (optionally only those with some status)
+
+        Parameters:
+        -----------
+            statuses:
+                job statuses to select {created, submitted, running, done, failed}
+        """
+        sql = f"SELECT {', '.join(COLUMNS)} FROM jobs"
+        params = []
+        if statuses is not None:
+            statuses = list(statuses)
+            sql += f" WHERE status IN ({', '.join('?' * len(statuses))})"
+            params = statuses
+        with self.connect() as connection:
+            rows = connection.execute(sql, params).fetchall()
+        jobs = []
+        for row in rows:
+            job = dict(zip(COLUMNS, row))
+            for column in JSON_COLUMNS:
+                if job[column] is not None:
+                    job[column] = json.loads(job[column])
+            jobs.append(job)
+        return jobs
+
+    def set_status(self, jobnames: Iterable[str], status: str, error: str = None) -> None:
+        """set the status of a list of jobs"""
+        with self.connect() as connection:
+            connection.executemany(
+                "UPDATE jobs SET status = ?, error = ? WHERE jobname = ?",
+                [(status, error, jobname) for jobname in jobnames],
+            )
+
+    def summary(self) -> Dict[str, int]:
+        """number of jobs by status"""
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return dict(rows)
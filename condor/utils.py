@@ -2,6 +2,8 @@ import os
 import json
 import subprocess
 from pathlib import Path
+from typing import List
+from condor.ledger import JobLedger, get_ledger_dir
 
 
 def move_X509() -> str:
@@ -35,9 +37,8 @@ def get_command(args: dict) -> str:
         if args[arg]:
             if arg in ["dataset", "nsample", "label"]:
                 continue
-            elif arg == "partition_fileset":
-                partition_fileset = args["partition_fileset"]
-                cmd += f" --partition_fileset '{json.dumps(partition_fileset)}' "
+            elif arg in ["partition_fileset", "file_metadata"]:
+                cmd += f" --{arg} '{json.dumps(args[arg])}' "
             else:
                 cmd += f" --{arg} {args[arg]}"
     return cmd
@@ -59,8 +60,31 @@ def get_jobname(args: dict) -> str:
     return jobname
 
 
-def submit_condor(args: dict, submit: bool) -> None:
-    """build condor and executable files, and submit condor job"""
+def get_condor_submit() -> str:
+    """condor_submit executable. Can be replaced (e.g. by a local fake) with the CONDOR_SUBMIT env variable"""
+    return os.environ.get("CONDOR_SUBMIT", "condor_submit")
+
+
+def run_condor_submit(submit_file: str) -> None:
+    """
+    submit a condor submit file. Raises subprocess.CalledProcessError if condor_submit
+    fails, so the jobs are only marked as submitted on success
+    """
+    subprocess.run([get_condor_submit(), submit_file], check=True)
+
+
+def make_job_files(args: dict, x509_path: str) -> dict:
+    """
+    build the executable file of a job, save its outputs and register it in the job ledger.
+    Returns the job {jobname, jobpath, ledger}
+
+    Parameters:
+    -----------
+        args:
+            job arguments passed to submit.py
+        x509_path:
+            path to the x509 proxy used by the job
+    """
     main_dir = Path.cwd()
     condor_dir = Path(f"{main_dir}/condor")
 
@@ -78,7 +102,22 @@ def submit_condor(args: dict, submit: bool) -> None:
         local_condor_path.mkdir(parents=True)
     local_condor = f"{local_condor_path}/{jobname}.sub"
 
-    # make condor file
+    # save the outputs written by the job (used to check which jobs are done)
+    with open(f"{local_condor_path}/{jobname}.json", "w") as f:
+        json.dump(list(args["partition_fileset"]), f)
+
+    # register the job in the ledger. The job reports its state to the ledger directory
+    ledger_dir = get_ledger_dir(args["processor"], args["label"], args["year"])
+    ledger = JobLedger(ledger_dir)
+    ledger.register(
+        jobname=jobname,
+        dataset=args["dataset"],
+        submit_file=local_condor,
+        partition=args["partition_fileset"],
+    )
+    args = dict(args, ledger=str(ledger_dir), jobname=jobname)
+
+    # make condor file (used to submit the job on its own)
     condor_template_file = open(f"{condor_dir}/submit.sub")
     condor_file = open(local_condor, "w")
     for line in condor_template_file:
@@ -93,7 +132,6 @@ def submit_condor(args: dict, submit: bool) -> None:
     condor_template_file.close()
 
     # make executable file
-    x509_path = move_X509()
     sh_template_file = open(f"{condor_dir}/submit.sh")
     local_sh = f"{local_condor_path}/{jobname}.sh"
     sh_file = open(local_sh, "w")
@@ -104,7 +142,71 @@ def submit_condor(args: dict, submit: bool) -> None:
         sh_file.write(line)
     sh_file.close()
     sh_template_file.close()
+    return {"jobname": jobname, "jobpath": jobpath, "ledger": ledger}
+
 
+def submit_condor(args: dict, submit: bool) -> None:
+    """build condor and executable files, and submit condor job"""
+    job = make_job_files(args, x509_path=move_X509())
     if submit:
         print(f"submitting condor job")
-        subprocess.run(["condor_submit", local_condor])
+        run_condor_submit(f"{Path.cwd()}/condor/{job['jobpath']}/{job['jobname']}.sub")
+        job["ledger"].mark_submitted([job["jobname"]])
+
+
+def write_bulk_submit(submit_path: str, jobs: List[dict]) -> str:
+    """
+    write a single condor submit file queueing several jobs from an args file
+    ('queue jobpath, jobname from <args file>'). Returns the submit file path
+
+    Parameters:
+    -----------
+        submit_path:
+            path of the submit file (without extension). The args file is '<submit_path>.args'
+        jobs:
+            jobs {jobname, jobpath} whose executable files were built by 'make_job_files'
+    """
+    condor_dir = Path(f"{Path.cwd()}/condor")
+    Path(submit_path).parent.mkdir(parents=True, exist_ok=True)
+    args_file = f"{submit_path}.args"
+    with open(args_file, "w") as f:
+        for job in jobs:
+            f.write(f"{job['jobpath']} {job['jobname']}\n")
+
+    local_condor = f"{submit_path}.sub"
+    condor_template_file = open(f"{condor_dir}/submit_bulk.sub")
+    condor_file = open(local_condor, "w")
+    for line in condor_template_file:
+        line = line.replace("DIRECTORY", str(condor_dir))
+        line = line.replace("ARGSFILE", args_file)
+        line = line.replace("JOBFLAVOR", f'"longlunch"')
+        condor_file.write(line)
+    condor_file.close()
+    condor_template_file.close()
+    return local_condor
+
+
+def submit_condor_bulk(jobs_args: List[dict], submit: bool) -> None:
+    """
+    build the executable files of several jobs and a single condor submit file queueing
+    all of them. The x509 proxy is moved once and condor_submit is called once
+
+    Parameters:
+    -----------
+        jobs_args:
+            job arguments passed to submit.py (all jobs must share processor, label and year)
+        submit:
+            if True submit the jobs
+    """
+    if not jobs_args:
+        return
+    x509_path = move_X509()
+    jobs = [make_job_files(args, x509_path) for args in jobs_args]
+    args = jobs_args[0]
+    submit_path = f"{Path.cwd()}/condor/{args['processor']}/{args['label']}/{args['year']}/bulk"
+    local_condor = write_bulk_submit(submit_path, jobs)
+    print(f"created bulk submit file {local_condor} with {len(jobs)} jobs")
+    if submit:
+        print(f"submitting {len(jobs)} condor jobs")
+        run_condor_submit(local_condor)
+        jobs[0]["ledger"].mark_submitted([job["jobname"] for job in jobs])
@@ -0,0 +1,121 @@
+import time
+import argparse
+from pathlib import Path
+from functools import partial
+from coffea.util import load, save
+from concurrent.futures import ProcessPoolExecutor
+from humanfriendly import format_timespan
+from analysis.helpers import get_output_directory
+from analysis.processors.skim import SkimProcessor
+
+
+def rebuild_output(dataset_dir, skim_processor, input_path, output_path):
+    """rebuild the histograms of an output from its skims, keeping its metadata"""
+    dataset_key = dataset_dir.name
+    input_file = Path(f"{input_path}/{dataset_key}.coffea")
+    if not input_file.exists():
+        return f"{dataset_key}: no output found in {input_path}, skipping"
+    output = load(str(input_file))
+    output["histograms"] = skim_processor.process(dataset_dir)
+    save(output, f"{output_path}/{dataset_key}.coffea")
+    return f"{dataset_key}: done"
+
+
+def main(args):
+    """Helper function to rebuild histograms from the Parquet skims"""
+    args_dict = vars(args)
+    input_path = get_output_directory(args_dict)
+    output_path = get_output_directory(dict(args_dict, label=args.output_label))
+    print(f"Reading skims from: {args.skim_dir}")
+    print(f"Reading output metadata from: {input_path}")
+    print(f"Saving rebuilt outputs to: {output_path}")
+
+    dataset_dirs = [
+        path
+        for path in sorted(Path(args.skim_dir).iterdir())
+        if path.is_dir() and (not args.datasets or path.name in args.datasets)
+    ]
+    skim_processor = SkimProcessor(
+        processor=args.processor, year=args.year, flow=eval(args.flow)
+    )
+    t0 = time.monotonic()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for message in pool.map(
+            partial(
+                rebuild_output,
+                skim_processor=skim_processor,
+                input_path=input_path,
+                output_path=output_path,
+            ),
+            dataset_dirs,
+        ):
+            print(message)
+    print(f"Execution time: {format_timespan(time.monotonic() - t0)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--processor",
+        dest="processor",
+        type=str,
+        default="ztojets",
+        help="processor to be used {ztojets} (default ztojets)",
+    )
+    parser.add_argument(
+        "--year",
+        dest="year",
+        type=str,
+        default="2017",
+        help="dataset year {2016preVFP, 2016postVFP, 2017, 2018} (default 2017)",
+    )
+    parser.add_argument(
+        "--label",
+        dest="label",
+        type=str,
+        default="ztojets_CR",
+        help="label of the run that wrote the skims (default ztojets_CR)",
+    )
+    parser.add_argument(
+        "--output_label",
+        dest="output_label",
+        type=str,
+        default="ztojets_CR_skim",
+        help="label of the rebuilt outputs (default ztojets_CR_skim)",
+    )
+    parser.add_argument(
+        "--skim_dir",
+        dest="skim_dir",
+        type=str,
+        required=True,
+        help="directory with the Parquet skims",
+    )
+    parser.add_argument(
+        "--datasets",
+        dest="datasets",
+        type=str,
+        nargs="*",
+        default=None,
+        help="dataset keys to be rebuilt (default all datasets in the skim directory)",
+    )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        default=4,
+        help="number of worker processes (default 4)",
+    )
+    parser.add_argument(
+        "--flow",
+        dest="flow",
+        type=str,
+        default="True",
+        help="whether to include underflow/overflow to first/last bin {True, False} (default True)",
+    )
+    parser.add_argument(
+        "--eos",
+        action="store_true",
+        help="Enable reading and saving outputs from /eos",
+    )
+    args = parser.parse_args()
+    main(args)
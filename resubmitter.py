@@ -1,13 +1,99 @@
+import re
 import glob
+import json
 import yaml
 import argparse
-import subprocess
 from pathlib import Path
+from typing import Optional
 from analysis.helpers import get_output_directory
+from analysis.processors.chunk_cache import get_code_version
+from condor.ledger import JobLedger, file_checksum, get_ledger_dir
+from condor.utils import run_condor_submit, write_bulk_submit
+
+
+def verify_outputs(ledger: JobLedger, output_dir: str) -> None:
+    """set as failed the done jobs whose outputs are missing or do not match their checksum"""
+    for job in ledger.query(["done"]):
+        checksums = job["checksums"] or {}
+        for output in job["outputs"]:
+            path = Path(f"{output_dir}/{output}.coffea")
+            if not path.exists():
+                error = f"missing output {path}"
+            elif output in checksums and file_checksum(path) != checksums[output]:
+                error = f"checksum mismatch of {path}"
+            else:
+                continue
+            ledger.set_status([job["jobname"]], "failed", error=error)
+            break
+
+
+def get_job_code_version(submit_file: str) -> Optional[str]:
+    """return the analysis code version passed to a job at submission (None without a chunk cache)"""
+    with open(Path(submit_file).with_suffix(".sh"), "r") as f:
+        match = re.search(r"--code_version (\w+)", f.read())
+    return match.group(1) if match else None
+
+
+def resubmit_from_ledger(args, ledger_dir: Path) -> None:
+    """resubmit the failed/missing jobs of the job ledger with a single submit file"""
+    ledger = JobLedger(ledger_dir)
+    nupdates = ledger.ingest()
+    print(f"Reading job ledger from: {ledger_dir} ({nupdates} new job updates)")
+    if args.verify:
+        verify_outputs(ledger, get_output_directory(vars(args)))
+
+    jobs = ledger.query(args.status)
+    for job in jobs:
+        print(
+            f"{job['jobname']}: {job['status']} (retries: {job['retries']})"
+            + (f" {job['error']}" if job["error"] else "")
+        )
+    print("")
+    for status, njobs in sorted(ledger.summary().items()):
+        print(f"{status} jobs: {njobs}")
+    print(f"jobs to resubmit: {len(jobs)}", "\n")
+
+    if args.resubmit and jobs:
+        # jobs keep the code version of their submission in their chunk cache keys
+        job_versions = {
+            job["jobname"]: get_job_code_version(job["submit_file"]) for job in jobs
+        }
+        outdated = []
+        if any(job_versions.values()):
+            code_version = get_code_version()
+            outdated = [
+                jobname
+                for jobname, version in job_versions.items()
+                if version not in [None, code_version]
+            ]
+        if outdated:
+            print(
+                f"WARNING: the analysis code changed since {len(outdated)} of the jobs were "
+                "submitted. They will reuse the chunk outputs cached by the previous code: "
+                "rebuild them with submit_condor.py to process the chunks again\n"
+            )
+        condor_dir = Path.cwd() / "condor"
+        local_condor = write_bulk_submit(
+            f"{ledger_dir}/resubmit",
+            [
+                {
+                    "jobname": Path(job["submit_file"]).stem,
+                    "jobpath": Path(job["submit_file"]).parent.relative_to(condor_dir),
+                }
+                for job in jobs
+            ],
+        )
+        run_condor_submit(local_condor)
+        ledger.mark_submitted([job["jobname"] for job in jobs])
 
 
 def main(args):
     """Helper function to resubmit condor jobs"""
+    ledger_dir = get_ledger_dir(args.processor, args.label, args.year)
+    if (ledger_dir / "ledger.db").exists():
+        resubmit_from_ledger(args, ledger_dir)
+        return
+    # jobs created before the job ledger: look for missing outputs
     # get outputs directory
     output_dir = get_output_directory(vars(args))
     print(f"Reading outputs from: {output_dir}")
@@ -44,12 +130,19 @@ def main(args):
         for f in condor_files
     ]
     for job, sub_file in zip(condor_files_keys, condor_files):
-        if job not in jobs_done:
+        # jobs can write several outputs (e.g. jobs shared by small datasets)
+        outputs_file = Path(sub_file.replace(".sub", ".json"))
+        if outputs_file.exists():
+            with open(outputs_file, "r") as f:
+                job_outputs = json.load(f)
+        else:
+            job_outputs = [job]
+        if not set(job_outputs) <= set(jobs_done):
             # missing job
             print(job)
             if args.resubmit:
                 # resubmit missing job
-                subprocess.run(["condor_submit", sub_file])
+                run_condor_submit(sub_file)
 
     print("")
     print(f"{n_jobs=}")
@@ -89,5 +182,18 @@ if __name__ == "__main__":
         action="store_true",
         help="Enable reading outputs from /eos",
     )
+    parser.add_argument(
+        "--status",
+        dest="status",
+        nargs="+",
+        default=["failed", "created"],
+        choices=["created", "submitted", "running", "done", "failed"],
+        help="job ledger statuses of the jobs to resubmit (default failed created). Jobs removed from the queue without reporting remain 'submitted' or 'running'",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="check that the outputs of done jobs exist and match their checksum (failed otherwise)",
+    )
     args = parser.parse_args()
     main(args)
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import argparse
+from pathlib import Path
+from functools import partial
+from coffea import processor
+from coffea.util import save
+from concurrent.futures import ProcessPoolExecutor
+from humanfriendly import format_size, format_timespan
+from runner import MC_SAMPLES, DATA_SAMPLES
+from analysis.filesets import FileIndex
+from analysis.helpers import (
+    get_output_directory,
+    get_required_columns,
+    RequiredColumnsNanoAODSchema,
+)
+from analysis.processors.ztojets import ZToJets
+from analysis.processors.campaign import CampaignProcessor, set_memory_limit
+from analysis.processors.skim import write_skim_manifest
+
+
+def main(args):
+    processors = {
+        "ztojets": ZToJets(
+            year=args.year,
+            flow=eval(args.flow),
+            do_systematics=args.do_systematics,
+            skim_dir=args.skim_dir,
+        ),
+    }
+    output_path = get_output_directory(vars(args))
+
+    # build the campaign fileset (MC + Data)
+    fileset_path = Path(f"{Path.cwd()}/analysis/filesets")
+    with open(f"{fileset_path}/fileset_{args.year}_NANO_lxplus.json", "r") as f:
+        root_files = json.load(f)
+    datasets = args.datasets or MC_SAMPLES + DATA_SAMPLES[args.processor][args.year]
+    fileset = {dataset: root_files[dataset] for dataset in datasets}
+
+    schema = processor.NanoAODSchema
+    if args.columns == "required":
+        # expose only the branches statically required by the processor
+        RequiredColumnsNanoAODSchema.required_columns = get_required_columns(
+            processors[args.processor].processor_config, args.processor
+        )
+        schema = RequiredColumnsNanoAODSchema
+
+    # one chunk-level work queue shared by all datasets
+    pool = ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=(
+            partial(set_memory_limit, args.memory_limit) if args.memory_limit else None
+        ),
+    )
+    t0 = time.monotonic()
+    out, metrics = processor.run_uproot_job(
+        fileset,
+        treename="Events",
+        processor_instance=CampaignProcessor(processors[args.processor]),
+        executor=processor.futures_executor,
+        executor_args={
+            "schema": schema,
+            "workers": args.workers,
+            "pool": pool,
+            "savemetrics": True,
+        },
+        chunksize=args.chunksize,
+    )
+    pool.shutdown()
+    exec_time = format_timespan(time.monotonic() - t0)
+
+    # save one output per dataset, as expected by the postprocessing
+    file_index = FileIndex()
+    for dataset, dataset_output in out.items():
+        runs = file_index.get_sumw(fileset[dataset])
+        if runs["genEventSumw"] is not None:
+            dataset_output["metadata"].update(runs)
+        skim_files = dataset_output["metadata"].pop("skim_files", {})
+        if args.skim_dir:
+            # histograms are only rebuilt from the skims written by this run
+            write_skim_manifest(args.skim_dir, dataset, skim_files)
+        save(dataset_output, f"{output_path}/{dataset}.coffea")
+
+    print(f"Execution time: {exec_time}")
+    # no chunks are processed when every dataset is empty
+    nchunks = max(metrics.get("chunks", 0), 1)
+    print(
+        f"Bytes read ({args.columns} columns): {format_size(metrics['bytesread'])} "
+        f"in {nchunks} chunks ({format_size(metrics['bytesread'] / nchunks)} per chunk)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--processor",
+        dest="processor",
+        type=str,
+        default="ztojets",
+        help="processor to be used {ztojets} (default ztojets)",
+    )
+    parser.add_argument(
+        "--year",
+        dest="year",
+        type=str,
+        default="2017",
+        help="dataset year {2016preVFP, 2016postVFP, 2017, 2018} (default 2017)",
+    )
+    parser.add_argument(
+        "--datasets",
+        dest="datasets",
+        nargs="*",
+        default=None,
+        help="datasets to be processed (default all MC and Data samples of the processor/year)",
+    )
+    parser.add_argument(
+        "--label",
+        dest="label",
+        type=str,
+        default="ztojets_CR",
+        help="Tag to label the run (default ztojets_CR)",
+    )
+    parser.add_argument(
+        "--eos",
+        action="store_true",
+        help="Enable saving outputs to /eos",
+    )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        default=os.cpu_count(),
+        help="number of worker processes (default number of cores)",
+    )
+    parser.add_argument(
+        "--chunksize",
+        dest="chunksize",
+        type=int,
+        default=100000,
+        help="number of events per chunk (default 100000)",
+    )
+    parser.add_argument(
+        "--memory_limit",
+        dest="memory_limit",
+        type=float,
+        default=None,
+        help="memory limit per worker in GB (default no limit)",
+    )
+    parser.add_argument(
+        "--flow",
+        dest="flow",
+        type=str,
+        default="True",
+        help="whether to include underflow/overflow to first/last bin {True, False} (default True)",
+    )
+    parser.add_argument(
+        "--columns",
+        dest="columns",
+        type=str,
+        default="all",
+        choices=["all", "required"],
+        help="NanoAOD branches exposed to the processor {all, required} (default all)",
+    )
+    parser.add_argument(
+        "--skim_dir",
+        dest="skim_dir",
+        type=str,
+        default=None,
+        help="if provided, the selected events of each category are also written to Parquet skims in this directory (default no skims)",
+    )
+    parser.add_argument(
+        "--do_systematics",
+        action="store_true",
+        help="Enable applying systematics",
+    )
+    args = parser.parse_args()
+    main(args)
@@ -6,7 +6,7 @@ import argparse
 from analysis.helpers import get_output_directory
 from analysis.configs import ProcessorConfigBuilder
 from analysis.postprocess.plotter import Plotter
-from analysis.postprocess.postprocessor import Postprocessor
+from analysis.postprocess.postprocessor import Postprocessor, load_processed
 from analysis.postprocess.utils import print_header, setup_logger
 
 
@@ -20,14 +20,24 @@ def main(args):
     processor_config = config_builder.build_processor_config()
     logging.info(processor_config.to_yaml())
 
-    # process (group and accumulate) outputs
-    postprocessor = Postprocessor(
-        processor=args.processor,
-        year=args.year,
-        output_dir=args.output_dir,
-    )
-    processed_histograms = postprocessor.histograms
-    lumi = postprocessor.luminosities[args.year]
+    if args.plot_only:
+        # reuse the processed histograms of a previous run
+        processed = load_processed(args.output_dir)
+        processed_histograms = processed["histograms"]
+        lumi = processed["lumi"]
+        categories = processed["categories"]
+    else:
+        # process (group and accumulate) outputs
+        postprocessor = Postprocessor(
+            processor=args.processor,
+            year=args.year,
+            output_dir=args.output_dir,
+            workers=args.workers,
+            rebuild=args.rebuild,
+        )
+        processed_histograms = postprocessor.histograms
+        lumi = postprocessor.luminosities[args.year]
+        categories = postprocessor.categories
 
     # plot processed histograms
     print_header("Plots")
@@ -38,18 +48,15 @@ def main(args):
         lumi=lumi,
         output_dir=args.output_dir,
     )
-    for category in postprocessor.categories:
-        logging.info(f"plotting histograms for category: {category}")
-        for variable in processor_config.histogram_config.variables:
-            logging.info(variable)
-            plotter.plot_histograms(
-                variable=variable,
-                category=category,
-                yratio_limits=args.yratio_limits,
-                log_scale=args.log_scale,
-                savefig=args.savefig,
-                extension=args.extension,
-            )
+    plotter.plot_all(
+        categories=categories,
+        variables=processor_config.histogram_config.variables,
+        workers=args.workers,
+        yratio_limits=args.yratio_limits,
+        log_scale=args.log_scale,
+        savefig=args.savefig,
+        extension=args.extension,
+    )
 
 
 if __name__ == "__main__":
@@ -99,6 +106,25 @@ if __name__ == "__main__":
         default="",
         help="Path to the outputs directory (optional)",
     )
+    parser.add_argument(
+        "--workers",
+        dest="workers",
+        type=int,
+        default=4,
+        help="number of processes used to load and merge the outputs, and to render the plots (default 4)",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Enable re-reading every output instead of only the new or changed ones",
+    )
+    parser.add_argument(
+        "--plot_only",
+        "--plot-only",
+        dest="plot_only",
+        action="store_true",
+        help="Enable plotting the processed histograms saved by a previous run, without reading the outputs",
+    )
     parser.add_argument(
         "--savefig",
         action="store_true",
@@ -84,8 +84,22 @@ MC_SAMPLES = [
 
 def main(args):
     datasets = MC_SAMPLES + DATA_SAMPLES[args.processor][args.year]
-    for dataset in datasets:
+    if args.events_per_job or args.bulk:
+        # build the jobs of the whole campaign at once: small datasets can share jobs
+        # and bulk mode submits all of them with a single submit file
+        dataset_groups = [" ".join(datasets)]
+    else:
+        dataset_groups = datasets
+    for dataset in dataset_groups:
         cmd = f"python3 submit_condor.py --processor {args.processor} --year {args.year} --dataset {dataset} --label {args.label} --nfiles {args.nfiles}"
+        if args.events_per_job:
+            cmd += f" --events_per_job {args.events_per_job}"
+        if args.skim_dir:
+            cmd += f" --skim_dir {args.skim_dir}"
+        if args.cache_dir:
+            cmd += f" --cache_dir {args.cache_dir}"
+        if args.bulk:
+            cmd += " --bulk"
         if args.submit:
             cmd += " --submit"
         if args.eos:
@@ -119,6 +133,13 @@ if __name__ == "__main__":
         default=20,
         help="number of root files to include in each dataset partition (default 20)",
     )
+    parser.add_argument(
+        "--events_per_job",
+        dest="events_per_job",
+        type=int,
+        default=None,
+        help="target number of events per job. If provided, jobs are built from the file entry counts instead of '--nfiles'",
+    )
     parser.add_argument(
         "--label",
         dest="label",
@@ -131,6 +152,25 @@ if __name__ == "__main__":
         action="store_true",
         help="Enable Condor job submission. If not provided, it just builds condor files",
     )
+    parser.add_argument(
+        "--skim_dir",
+        dest="skim_dir",
+        type=str,
+        default=None,
+        help="if provided, the jobs also write Parquet skims of the selected events to this directory (default no skims)",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        dest="cache_dir",
+        type=str,
+        default=None,
+        help="chunk output cache directory shared by the jobs (default no cache)",
+    )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="Enable bulk submission: a single submit file queueing all jobs, submitted with one condor_submit call",
+    )
     parser.add_argument(
         "--eos",
         action="store_true",
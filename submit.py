@@ -3,28 +3,132 @@ import time
 import argparse
 from coffea import processor
 from coffea.util import save
-from humanfriendly import format_timespan
+from coffea.processor import accumulate
+from humanfriendly import format_size, format_timespan
+from analysis.filesets import get_sumw, get_work_items
+from analysis.helpers import get_required_columns, RequiredColumnsNanoAODSchema
 from analysis.processors.ztojets import ZToJets
+from analysis.processors.campaign import CampaignProcessor
+from analysis.processors.skim import write_skim_manifest
+from analysis.processors.chunk_cache import ChunkCache, CachedProcessor
+from condor.ledger import file_checksum, write_job_state
 
 
-def main(args):
+def run_job(args):
+    """process the job fileset. Returns the saved outputs {dataset_key: path} and the metrics"""
     processors = {
         "ztojets": ZToJets(
-            year=args.year, flow=eval(args.flow), do_systematics=args.do_systematics
+            year=args.year,
+            flow=eval(args.flow),
+            do_systematics=args.do_systematics,
+            skim_dir=args.skim_dir,
         ),
     }
-    t0 = time.monotonic()
-    out = processor.run_uproot_job(
-        args.partition_fileset,
-        treename="Events",
-        processor_instance=processors[args.processor],
-        executor=processor.futures_executor,
-        executor_args={"schema": processor.NanoAODSchema, "workers": 4},
+    schema = processor.NanoAODSchema
+    if args.columns == "required":
+        # expose only the branches statically required by the processor
+        RequiredColumnsNanoAODSchema.required_columns = get_required_columns(
+            processors[args.processor].processor_config, args.processor
+        )
+        schema = RequiredColumnsNanoAODSchema
+    # the partition fileset can hold several datasets, with whole files or entry ranges.
+    # The file metadata is resolved at submit time: jobs do not open the file index
+    work_items = get_work_items(args.partition_fileset, args.file_metadata)
+
+    processor_instance = processors[args.processor]
+    cached_outputs = []
+    if args.cache_dir:
+        # only process the chunks whose output is not cached
+        cache = ChunkCache(args.cache_dir)
+        version = cache.get_version(
+            processor_instance.processor_config,
+            {
+                "processor": args.processor,
+                "year": args.year,
+                "flow": args.flow,
+                "do_systematics": args.do_systematics,
+                "skim_dir": args.skim_dir,
+            },
+            code_version=args.code_version,
+        )
+        work_items, cached_outputs = cache.split(work_items, version)
+        cache.record_stats(hits=len(cached_outputs), misses=len(work_items))
+        print(f"Chunk cache: {len(cached_outputs)} hits, {len(work_items)} misses")
+        processor_instance = CachedProcessor(processor_instance, args.cache_dir, version)
+
+    runner = processor.Runner(
+        executor=processor.FuturesExecutor(workers=4),
+        schema=schema,
+        savemetrics=True,
     )
+    t0 = time.monotonic()
+    if work_items:
+        out, metrics = runner(
+            work_items,
+            treename="Events",
+            processor_instance=CampaignProcessor(processor_instance),
+        )
+    else:
+        out, metrics = {}, {"bytesread": 0, "chunks": 0, "entries": 0}
+    for dataset_key, output in cached_outputs:
+        out[dataset_key] = (
+            accumulate([out[dataset_key], output]) if dataset_key in out else output
+        )
     exec_time = format_timespan(time.monotonic() - t0)
 
+    output_files = {}
+    for dataset_key, items in args.partition_fileset.items():
+        if dataset_key not in out:
+            print(f"No events were processed for {dataset_key}")
+            continue
+        # sum of generator weights of the processed files, read from their 'Runs' tree (MC only)
+        runs = get_sumw(items, args.file_metadata)
+        if runs["genEventSumw"] is not None:
+            out[dataset_key]["metadata"].update(runs)
+        skim_files = out[dataset_key]["metadata"].pop("skim_files", {})
+        if args.skim_dir:
+            # histograms are only rebuilt from the skims written by this run
+            write_skim_manifest(args.skim_dir, dataset_key, skim_files)
+        output_files[dataset_key] = f"{args.output_path}/{dataset_key}.coffea"
+        save(out[dataset_key], output_files[dataset_key])
+
     print(f"Execution time: {exec_time}")
-    save(out, f"{args.output_path}/{args.dataset_key}.coffea")
+    nchunks = metrics.get("chunks", 1) or 1
+    print(
+        f"Bytes read ({args.columns} columns): {format_size(metrics['bytesread'])} "
+        f"in {nchunks} chunks ({format_size(metrics['bytesread'] / nchunks)} per chunk)"
+    )
+    return output_files, metrics
+
+
+def main(args):
+    if not args.ledger:
+        run_job(args)
+        return
+    # report the job state to the condor job ledger
+    started_at = time.time()
+    write_job_state(args.ledger, args.jobname, status="running", started_at=started_at)
+    try:
+        output_files, metrics = run_job(args)
+    except Exception as err:
+        write_job_state(
+            args.ledger,
+            args.jobname,
+            status="failed",
+            finished_at=time.time(),
+            runtime=time.time() - started_at,
+            error=repr(err),
+        )
+        raise
+    write_job_state(
+        args.ledger,
+        args.jobname,
+        status="done",
+        finished_at=time.time(),
+        runtime=time.time() - started_at,
+        events=metrics["entries"],
+        checksums={key: file_checksum(path) for key, path in output_files.items()},
+    )
 
 
 if __name__ == "__main__":
@@ -49,6 +153,13 @@ if __name__ == "__main__":
         type=json.loads,
         help="partition_fileset needed to preprocess a fileset",
     )
+    parser.add_argument(
+        "--file_metadata",
+        dest="file_metadata",
+        type=json.loads,
+        required=True,
+        help="UUID, number of entries and generator weights of each file of the partition_fileset (set by submit_condor.py)",
+    )
     parser.add_argument(
         "--year",
         dest="year",
@@ -69,10 +180,53 @@ if __name__ == "__main__":
         default="True",
         help="whether to include underflow/overflow to first/last bin {True, False}",
     )
+    parser.add_argument(
+        "--columns",
+        dest="columns",
+        type=str,
+        default="all",
+        choices=["all", "required"],
+        help="NanoAOD branches exposed to the processor {all, required} (default all)",
+    )
+    parser.add_argument(
+        "--skim_dir",
+        dest="skim_dir",
+        type=str,
+        default=None,
+        help="if provided, the selected events of each category are also written to Parquet skims in this directory (default no skims)",
+    )
     parser.add_argument(
         "--do_systematics",
         action="store_true",
         help="Enable applying systematics",
     )
+    parser.add_argument(
+        "--cache_dir",
+        dest="cache_dir",
+        type=str,
+        default=None,
+        help="chunk output cache directory. If provided, only the chunks whose output is not cached are processed (default no cache)",
+    )
+    parser.add_argument(
+        "--code_version",
+        dest="code_version",
+        type=str,
+        default=None,
+        help="hash of the analysis code used in the chunk cache keys (set by submit_condor.py). Computed by the job if not provided",
+    )
+    parser.add_argument(
+        "--ledger",
+        dest="ledger",
+        type=str,
+        default=None,
+        help="job ledger directory where the job state is reported (set by condor jobs)",
+    )
+    parser.add_argument(
+        "--jobname",
+        dest="jobname",
+        type=str,
+        default=None,
+        help="name of the condor job in the job ledger",
+    )
     args = parser.parse_args()
     main(args)
@@ -2,9 +2,11 @@ import json
 import yaml
 import argparse
 from pathlib import Path
-from condor import submit_condor
-from analysis.filesets import divide_list
+from collections import Counter
+from condor import submit_condor, submit_condor_bulk
+from analysis.filesets import FileIndex, divide_list, get_file_metadata, partition_by_events
 from analysis.helpers import get_output_directory
+from analysis.processors.chunk_cache import get_code_version
 
 
 def main(args):
@@ -14,24 +16,92 @@ def main(args):
     del args["eos"]
     del args["submit"]
 
-    # split dataset into batches
+    bulk = args.pop("bulk")
+    datasets = args.pop("dataset")
+    nfiles = args.pop("nfiles")
+    events_per_job = args.pop("events_per_job")
+    if args["cache_dir"]:
+        # the analysis code is hashed once here instead of by every job
+        args["code_version"] = get_code_version()
     fileset_path = Path(f"{Path.cwd()}/analysis/filesets")
     with open(f"{fileset_path}/fileset_{args['year']}_NANO_lxplus.json", "r") as f:
-        root_files = json.load(f)[args["dataset"]]
-    root_files_list = divide_list(root_files, args["nfiles"])
-    del args["nfiles"]
+        root_files = json.load(f)
 
-    # submit job for each partition
-    for i, partition in enumerate(root_files_list, start=1):
-        if len(root_files_list) == 1:
-            args["dataset_key"] = args["dataset"]
-            args["partition_fileset"] = {args["dataset"]: partition}
+    file_index = FileIndex()
+    if events_per_job:
+        jobs = get_jobs_by_events(args, datasets, root_files, events_per_job, file_index)
+    else:
+        jobs = get_jobs_by_files(args, datasets, root_files, nfiles)
+    # the jobs get the metadata of their files in their arguments, so they do not
+    # open (or write to) the SQLite file index
+    for job_args in jobs:
+        job_args["file_metadata"] = get_file_metadata(
+            job_args["partition_fileset"], file_index
+        )
+
+    if bulk:
+        # single submit file queueing all jobs
+        submit_condor_bulk(jobs, submit=submit)
+    else:
+        for job_args in jobs:
+            submit_condor(job_args, submit=submit)
+
+
+def get_jobs_by_files(args, datasets, root_files, nfiles):
+    """return the arguments of jobs of 'nfiles' root files each"""
+    jobs = []
+    for dataset in datasets:
+        args["dataset"] = dataset
+        # split dataset into batches
+        root_files_list = divide_list(root_files[dataset], nfiles)
+
+        # submit job for each partition
+        for i, partition in enumerate(root_files_list, start=1):
+            if len(root_files_list) == 1:
+                args["dataset_key"] = dataset
+                args["partition_fileset"] = {dataset: partition}
+            else:
+                args["nsample"] = i
+                dataset_key = f"{dataset}_{i}"
+                args["dataset_key"] = dataset_key
+                args["partition_fileset"] = {dataset_key: partition}
+            jobs.append(dict(args))
+        args.pop("nsample", None)
+    return jobs
+
+
+def get_jobs_by_events(args, datasets, root_files, events_per_job, file_index):
+    """
+    return the arguments of jobs of roughly 'events_per_job' events. Large files are split
+    into entry ranges and small datasets are combined into shared jobs
+    """
+    entries = {dataset: file_index.get_entries(root_files[dataset]) for dataset in datasets}
+    partitions = partition_by_events(entries, events_per_job)
+
+    # a dataset split over several jobs gets one output per job (<dataset>_<i>)
+    njobs = Counter(dataset for partition in partitions for dataset in partition)
+    nsamples = Counter()
+    nshared = 0
+    jobs = []
+    for partition in partitions:
+        job_args = dict(args)
+        job_args["partition_fileset"] = {}
+        for dataset, items in partition.items():
+            nsamples[dataset] += 1
+            dataset_key = dataset if njobs[dataset] == 1 else f"{dataset}_{nsamples[dataset]}"
+            job_args["partition_fileset"][dataset_key] = items
+        if len(partition) == 1:
+            job_args["dataset"] = dataset
+            job_args["dataset_key"] = dataset_key
+            if njobs[dataset] > 1:
+                job_args["nsample"] = nsamples[dataset]
         else:
-            args["nsample"] = i
-            dataset_key = f'{args["dataset"]}_{i}'
-            args["dataset_key"] = dataset_key
-            args["partition_fileset"] = {dataset_key: partition}
-        submit_condor(args, submit=submit)
+            nshared += 1
+            job_args["dataset"] = "shared"
+            job_args["dataset_key"] = f"shared_{nshared}"
+            job_args["nsample"] = nshared
+        jobs.append(job_args)
+    return jobs
 
 
 if __name__ == "__main__":
@@ -47,8 +117,9 @@ if __name__ == "__main__":
         "--dataset",
         dest="dataset",
         type=str,
-        default="",
-        help="sample key to be processed",
+        nargs="+",
+        default=[],
+        help="sample keys to be processed",
     )
     parser.add_argument(
         "--year",
@@ -88,6 +159,40 @@ if __name__ == "__main__":
         default=20,
         help="number of root files to include in each dataset partition (default 20)",
     )
+    parser.add_argument(
+        "--events_per_job",
+        dest="events_per_job",
+        type=int,
+        default=None,
+        help="target number of events per job. If provided, jobs are built from the file entry counts instead of '--nfiles'",
+    )
+    parser.add_argument(
+        "--bulk",
+        action="store_true",
+        help="Enable bulk submission: a single submit file queueing all jobs, submitted with one condor_submit call",
+    )
+    parser.add_argument(
+        "--skim_dir",
+        dest="skim_dir",
+        type=str,
+        default=None,
+        help="if provided, the jobs also write Parquet skims of the selected events to this directory (default no skims)",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        dest="cache_dir",
+        type=str,
+        default=None,
+        help="chunk output cache directory shared by the jobs (default no cache)",
+    )
+    parser.add_argument(
+        "--columns",
+        dest="columns",
+        type=str,
+        default="all",
+        choices=["all", "required"],
+        help="NanoAOD branches read by the jobs {all, required} (default all)",
+    )
     parser.add_argument(
         "--do_systematics",
         action="store_true",
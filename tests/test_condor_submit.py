@@ -0,0 +1,54 @@
+import shutil
+import subprocess
+from argparse import Namespace
+from pathlib import Path
+import pytest
+
+from condor.ledger import JobLedger
+from resubmitter import resubmit_from_ledger
+
+REPO_PATH = Path(__file__).parent.parent
+
+
+def make_ledger(tmp_path, command="python submit.py"):
+    condor_dir = tmp_path / "condor"
+    job_dir = condor_dir / "ztojets" / "2017"
+    job_dir.mkdir(parents=True)
+    shutil.copy(REPO_PATH / "condor" / "submit_bulk.sub", condor_dir)
+    (job_dir / "ztojets_METB_1.sh").write_text(f"{command}\n")
+    ledger_dir = tmp_path / "ledger"
+    ledger = JobLedger(ledger_dir)
+    ledger.register(
+        jobname="ztojets_METB_1",
+        dataset="METB",
+        submit_file=str(job_dir / "ztojets_METB_1.sub"),
+        partition={"METB_1": ["file.root"]},
+    )
+    return ledger, ledger_dir
+
+
+@pytest.mark.parametrize(
+    "condor_submit, status", [("false", "created"), ("true", "submitted")]
+)
+def test_resubmit_condor_submit_failure(tmp_path, monkeypatch, condor_submit, status):
+    """jobs are only marked as submitted if condor_submit succeeds"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CONDOR_SUBMIT", condor_submit)
+    ledger, ledger_dir = make_ledger(tmp_path)
+    args = Namespace(resubmit=True, verify=False, status=["created"])
+    if status == "created":
+        with pytest.raises(subprocess.CalledProcessError):
+            resubmit_from_ledger(args, ledger_dir)
+    else:
+        resubmit_from_ledger(args, ledger_dir)
+    assert [job["status"] for job in ledger.query()] == [status]
+
+
+def test_resubmit_outdated_code_version(tmp_path, monkeypatch, capsys):
+    """resubmitting jobs submitted with another analysis code version prints a warning"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("CONDOR_SUBMIT", "true")
+    _, ledger_dir = make_ledger(tmp_path, "python submit.py --code_version abc123")
+    args = Namespace(resubmit=True, verify=False, status=["created"])
+    resubmit_from_ledger(args, ledger_dir)
+    assert "analysis code changed since 1 of the jobs" in capsys.readouterr().out
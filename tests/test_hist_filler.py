@@ -0,0 +1,68 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+hist = pytest.importorskip("hist")
+pytest.importorskip("awkward")
+
+from analysis.histograms.hist_filler import fill_dense
+
+
+def fill_both(axis, values):
+    """fill a histogram with 'fill_dense' and another one with 'hist.Hist.fill'"""
+    histograms = [
+        hist.Hist(
+            hist.axis.StrCategory(["nominal", "pileupUp"], name="variation"),
+            hist.axis.StrCategory(["central", "vbf"], name="category"),
+            axis,
+            storage=hist.storage.Weight(),
+        )
+        for _ in range(2)
+    ]
+    weights = np.array([[1.0, 2.0, 3.0, 4.0], [0.5, 1.5, 2.5, 3.5]])
+    fill_dense(
+        histograms[0], {axis.name: values}, "vbf", ["nominal", "pileupUp"], weights
+    )
+    for variation, variation_weights in zip(["nominal", "pileupUp"], weights):
+        histograms[1].fill(
+            variation=variation,
+            category="vbf",
+            weight=variation_weights,
+            **{axis.name: values},
+        )
+    return histograms
+
+
+@pytest.mark.parametrize(
+    "axis, values",
+    [
+        (hist.axis.IntCategory(list(range(16)), name="njets"), np.array([0, 17, 3, -1])),
+        (
+            hist.axis.IntCategory(list(range(16)), name="njets", overflow=False),
+            np.array([0, 17, 3, -1]),
+        ),
+        (hist.axis.StrCategory(["a", "b"], name="label"), np.array(["b", "ab", "a", "c"])),
+        (
+            hist.axis.StrCategory(["a", "b"], name="label", overflow=False),
+            np.array(["b", "ab", "a", "c"]),
+        ),
+        (hist.axis.Regular(4, 0, 4, name="x"), np.array([0.5, -1.0, 3.5, 7.0])),
+    ],
+)
+def test_fill_dense_matches_hist_fill(axis, values):
+    dense, reference = fill_both(axis, values)
+    assert np.allclose(dense.view(flow=True)["value"], reference.view(flow=True)["value"])
+    assert np.allclose(
+        dense.view(flow=True)["variance"], reference.view(flow=True)["variance"]
+    )
+
+
+def test_fill_dense_unknown_variation():
+    histogram = hist.Hist(
+        hist.axis.StrCategory(["nominal"], name="variation"),
+        hist.axis.StrCategory(["central"], name="category"),
+        hist.axis.Regular(4, 0, 4, name="x"),
+    )
+    with pytest.raises(KeyError, match="pileupUp"):
+        fill_dense(
+            histogram, {"x": np.array([0.5])}, "central", ["pileupUp"], np.ones((1, 1))
+        )
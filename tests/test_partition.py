@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("coffea")
+
+from analysis.filesets import get_sumw, get_work_items
+
+def make_metadata(uuid, entries, gen_event_sumw):
+    return {
+        "uuid": uuid * 32,
+        "entries": entries,
+        "gen_event_sumw": gen_event_sumw,
+        "gen_event_count": None if gen_event_sumw is None else float(entries),
+    }
+
+
+FILE_METADATA = {
+    "mc_1.root": make_metadata("0", 100, 10.0),
+    "mc_2.root": make_metadata("1", 50, 5.0),
+    "data.root": make_metadata("2", 100, None),
+}
+
+
+def test_get_sumw_split_files():
+    """split files are counted by the job holding their first entry range"""
+    assert get_sumw([["mc_1.root", 0, 50], "mc_2.root"], FILE_METADATA) == {
+        "genEventSumw": 15.0,
+        "genEventCount": 150.0,
+    }
+    assert get_sumw([["mc_1.root", 50, 100]], FILE_METADATA) == {
+        "genEventSumw": 0.0,
+        "genEventCount": 0.0,
+    }
+
+
+def test_get_sumw_data():
+    """Data jobs have no sum of generator weights, whatever their entry ranges"""
+    for items in [["data.root"], [["data.root", 50, 100]]]:
+        assert get_sumw(items, FILE_METADATA)["genEventSumw"] is None
+
+
+def test_get_work_items_missing_metadata():
+    """jobs fail if a file has no metadata in their arguments"""
+    partition_fileset = {"MC": [["mc_1.root", 20, 100], "mc_2.root"]}
+    work_items = get_work_items(partition_fileset, FILE_METADATA, chunksize=50)
+    assert [(item.entrystart, item.entrystop) for item in work_items] == [
+        (20, 60),
+        (60, 100),
+        (0, 50),
+    ]
+    with pytest.raises(KeyError, match="other.root"):
+        get_work_items({"MC": ["other.root"]}, FILE_METADATA)
@@ -0,0 +1,107 @@
+from pathlib import Path
+import pytest
+
+hist = pytest.importorskip("hist")
+pytest.importorskip("coffea")
+pytest.importorskip("pandas")
+
+from coffea.util import save
+from analysis.configs import ProcessorConfigBuilder
+from analysis.postprocess.postprocessor import PROCESSED_FILE, Postprocessor
+
+REPO_PATH = Path(__file__).parent.parent
+SAMPLES = {"DYJetsToLL_M-50_HT-100to200": True, "METB": False}
+
+
+def make_output(categories, nevents):
+    histogram = hist.Hist(
+        hist.axis.StrCategory(["nominal", "pileupUp", "pileupDown"], name="variation"),
+        hist.axis.StrCategory(categories, name="category"),
+        hist.axis.Regular(5, 0, 5, name="x"),
+        storage=hist.storage.Weight(),
+    )
+    for variation, scale in [("nominal", 1.0), ("pileupUp", 1.1), ("pileupDown", 0.9)]:
+        for category in categories:
+            histogram.fill(
+                variation=variation,
+                category=category,
+                x=[0.5] * nevents,
+                weight=[scale] * nevents,
+            )
+    metadata = {"sumw": float(nevents), "raw_initial_nevents": nevents}
+    for category in categories:
+        metadata[category] = {
+            "cutflow": {"initial": float(nevents)},
+            "weighted_final_nevents": float(nevents),
+            "raw_final_nevents": nevents,
+        }
+    return {"histograms": {"x": histogram}, "metadata": metadata}
+
+
+def test_postprocessor_rerun(tmp_path, monkeypatch):
+    """a second run on the same directory must not read the processed file as a sample"""
+    monkeypatch.chdir(REPO_PATH)
+    processor_config = ProcessorConfigBuilder("ztojets", "2017").build_processor_config()
+    categories = list(processor_config.event_selection["categories"])
+    for sample in SAMPLES:
+        save(make_output(categories, 10), str(tmp_path / f"2017_{sample}_1.coffea"))
+
+    for _ in range(2):
+        postprocessor = Postprocessor(
+            processor="ztojets", year="2017", output_dir=str(tmp_path)
+        )
+        assert set(postprocessor.metadata) == set(SAMPLES)
+        assert (tmp_path / PROCESSED_FILE).exists()
+
+
+def test_postprocessor_partial_gen_event_sumw(tmp_path, monkeypatch):
+    """samples where only some outputs have the 'genEventSumw' must not be normalized"""
+    monkeypatch.chdir(REPO_PATH)
+    processor_config = ProcessorConfigBuilder("ztojets", "2017").build_processor_config()
+    categories = list(processor_config.event_selection["categories"])
+    for sample in SAMPLES:
+        save(make_output(categories, 10), str(tmp_path / f"2017_{sample}_1.coffea"))
+    output = make_output(categories, 10)
+    output["metadata"].update({"genEventSumw": 20.0, "genEventCount": 20.0})
+    save(output, str(tmp_path / f"2017_{next(iter(SAMPLES))}_2.coffea"))
+
+    with pytest.raises(ValueError, match="genEventSumw"):
+        Postprocessor(processor="ztojets", year="2017", output_dir=str(tmp_path))
+
+
+def test_postprocessor_data_gen_event_sumw(tmp_path, monkeypatch):
+    """Data samples are not checked for the 'genEventSumw' of their outputs"""
+    monkeypatch.chdir(REPO_PATH)
+    processor_config = ProcessorConfigBuilder("ztojets", "2017").build_processor_config()
+    categories = list(processor_config.event_selection["categories"])
+    for sample in SAMPLES:
+        save(make_output(categories, 10), str(tmp_path / f"2017_{sample}_1.coffea"))
+    output = make_output(categories, 10)
+    output["metadata"].update({"genEventSumw": 0.0, "genEventCount": 0.0})
+    save(output, str(tmp_path / "2017_METB_2.coffea"))
+
+    postprocessor = Postprocessor(processor="ztojets", year="2017", output_dir=str(tmp_path))
+    assert postprocessor.sumw["METB"] == 20.0
+    assert postprocessor.weights["METB"] == 1
+
+
+def test_postprocessor_preselection_cutflow(tmp_path, monkeypatch):
+    """the preselection steps come first in the cutflow tables, labelled by their weights"""
+    monkeypatch.chdir(REPO_PATH)
+    processor_config = ProcessorConfigBuilder("ztojets", "2017").build_processor_config()
+    categories = list(processor_config.event_selection["categories"])
+    for sample in SAMPLES:
+        output = make_output(categories, 10)
+        for category in categories:
+            output["metadata"][category]["preselection_cutflow"] = {
+                "trigger": 30.0,
+                "initial": 20.0,
+            }
+        save(output, str(tmp_path / f"2017_{sample}_1.coffea"))
+
+    postprocessor = Postprocessor(processor="ztojets", year="2017", output_dir=str(tmp_path))
+    for category in categories:
+        cutflow_df = postprocessor.cutflow_tables[category]
+        assert list(cutflow_df.index) == ["trigger (gen weights)", "initial"]
+        assert cutflow_df.loc["trigger (gen weights)", "Data"] == 30.0
+        assert cutflow_df.loc["initial", "Data"] == 10.0
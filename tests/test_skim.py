@@ -0,0 +1,30 @@
+from pathlib import Path
+import pytest
+
+pytest.importorskip("coffea")
+pytest.importorskip("pyarrow")
+
+from analysis.processors.skim import SkimProcessor, write_skim_manifest
+
+REPO_PATH = Path(__file__).parent.parent
+
+
+def test_skim_files_from_manifest(tmp_path, monkeypatch):
+    """only the skim files of the last run are rebuilt, not the stale ones of previous runs"""
+    monkeypatch.chdir(REPO_PATH)
+    skim_processor = SkimProcessor(processor="ztojets", year="2017")
+    category = next(iter(skim_processor.processor_config.event_selection["categories"]))
+    shift_dir = tmp_path / "METB" / category / "nominal"
+    shift_dir.mkdir(parents=True)
+    for chunk in ["0" * 32 + "_0_100", "0" * 32 + "_0_50", "0" * 32 + "_50_100"]:
+        (shift_dir / f"{chunk}.parquet").touch()
+
+    with pytest.raises(FileNotFoundError, match="manifest"):
+        skim_processor.get_skim_files(tmp_path / "METB")
+
+    write_skim_manifest(
+        str(tmp_path), "METB", {category: ["nominal/" + "0" * 32 + "_0_100.parquet"]}
+    )
+    skim_files = skim_processor.get_skim_files(tmp_path / "METB")
+    assert skim_files[category] == [shift_dir / ("0" * 32 + "_0_100.parquet")]
+    assert all(not paths for key, paths in skim_files.items() if key != category)